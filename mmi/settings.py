@@ -43,6 +43,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its latency covers the rest of the stack
+    'mmi_app.instrumentation.RequestMetricsMiddleware',
+    # Before anything that queries, so reads are routed for the whole request
+    'mmi_app.routers.ReplicaPinMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -57,7 +61,8 @@ ROOT_URLCONF = 'mmi.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates plus render timing for the request metrics
+        'BACKEND': 'mmi_app.instrumentation.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -73,6 +78,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'mmi.wsgi.application'
 
+# Request metrics: fraction of requests timed, Server-Timing header, bearer token for /metrics
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', '1.0'))
+METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', '1') == '1'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
@@ -86,9 +96,10 @@ if os.getenv('DB_ENGINE'):
             'PASSWORD': os.getenv('DB_PASSWORD'),
             'HOST': os.getenv('DB_HOST', '127.0.0.1'),
             'PORT': os.getenv('DB_PORT', '3306'),
+            # MySQL only; DB_ENGINE=django.db.backends.sqlite3 works for local runs
             'OPTIONS': {
                 'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
-            },
+            } if 'mysql' in os.getenv('DB_ENGINE') else {},
         }
     }
 else:
@@ -107,6 +118,68 @@ else:
         }
     }
 
+# Connection reuse. Without the pool, DB_CONN_MAX_AGE keeps each thread's
+# connection open between requests (keep it 0 under ASGI).
+DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '0'))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = os.getenv('DB_CONN_HEALTH_CHECKS', '1') == '1'
+# DB_POOL=1 swaps the MySQL backend for mmi_app.pooled_mysql, which hands
+# out connections from a per-process pool (see mmi_app/dbpool.py). Size the
+# pool so max size x processes stays below the server's max_connections.
+if os.getenv('DB_POOL', '0') == '1' and DATABASES['default']['ENGINE'] == 'django.db.backends.mysql':
+    DATABASES['default'].update(ENGINE='mmi_app.pooled_mysql', CONN_MAX_AGE=0)
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        # Seconds a request waits for a free connection before failing
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '5')),
+        # Recycle connections well before MySQL's wait_timeout
+        'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+        'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+        # Ping connections that sat idle longer than this before reuse
+        'check_after': float(os.getenv('DB_POOL_CHECK_AFTER', '30')),
+    }
+
+# Read replicas: DB_REPLICA_HOSTS lists host[:port] entries that share the
+# primary's other settings; DB_REPLICA_NAMES lists database names instead
+# (for example SQLite files standing in for replicas locally).
+# mmi_app.routers sends request reads there and writes to the primary.
+# Replicas need a cache shared between workers (see CACHE_BACKEND below),
+# which remembers the bearer-token clients that must read from the primary.
+DATABASE_REPLICAS = []
+for _i, (_field, _value) in enumerate(
+    [('HOST', h) for h in os.getenv('DB_REPLICA_HOSTS', '').split(',') if h.strip()]
+    + [('NAME', n) for n in os.getenv('DB_REPLICA_NAMES', '').split(',') if n.strip()],
+    start=1,
+):
+    _db = {**DATABASES['default'], 'OPTIONS': dict(DATABASES['default']['OPTIONS']), 'TEST': {'MIRROR': 'default'}}
+    if _field == 'HOST':
+        _db['HOST'], _, _port = _value.strip().partition(':')
+        _db['PORT'] = _port or _db['PORT']
+    else:
+        _db['NAME'] = _value.strip()
+    _db['USER'] = os.getenv('DB_REPLICA_USER', _db['USER'])
+    _db['PASSWORD'] = os.getenv('DB_REPLICA_PASSWORD', _db['PASSWORD'])
+    DATABASES[f'replica{_i}'] = _db
+    DATABASE_REPLICAS.append(f'replica{_i}')
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['mmi_app.routers.ReplicaRouter']
+# Seconds a client's reads stay on the primary after it writes; keep it above the replication lag
+REPLICA_PIN_SECONDS = float(os.getenv('DB_REPLICA_PIN_SECONDS', '5'))
+
+
+# Cache
+# Local memory by default; point CACHE_BACKEND at
+# django.core.cache.backends.filebased.FileBasedCache (with CACHE_LOCATION set
+# to a directory) to share the page cache between worker processes.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'mmi'),
+    }
+}
+# Seconds an anonymous page response stays cached
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', '300'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -148,6 +221,12 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Hand resource downloads to the front proxy: '' (serve from Django), 'nginx' (X-Accel-Redirect) or 'apache' (X-Sendfile)
+RESOURCE_SENDFILE = os.getenv('RESOURCE_SENDFILE', '')
+# nginx `internal` location aliased to MEDIA_ROOT
+RESOURCE_ACCEL_PREFIX = os.getenv('RESOURCE_ACCEL_PREFIX', '/protected-media/')
+# Square avatar variants (px) rendered by `manage.py process_avatars`
+AVATAR_SIZES = (40, 96, 256)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -155,18 +234,34 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # DRF & JWT
+# Build API users from signed JWT claims instead of loading the User row per request
+JWT_STATELESS_USER = os.getenv('JWT_STATELESS_USER', '0') == '1'
+JWT_USER_CACHE_SIZE = int(os.getenv('JWT_USER_CACHE_SIZE', '1024'))
+JWT_USER_CACHE_TIMEOUT = float(os.getenv('JWT_USER_CACHE_TIMEOUT', '60'))
+# Seconds before other workers notice a new token revocation
+JWT_REVOCATION_CHECK_INTERVAL = float(os.getenv('JWT_REVOCATION_CHECK_INTERVAL', '5'))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'mmi_app.authentication.StatelessJWTAuthentication' if JWT_STATELESS_USER
+        else 'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'mmi_app.pagination.IdCursorPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', '50')),
 }
+# Upper bound for the ?page_size= query parameter on API list endpoints
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '200'))
+# Course search without MySQL FULLTEXT returns at most this many ranked matches
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', '250'))
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    # Adds the username/is_staff/auth_time claims used by JWT_STATELESS_USER
+    'TOKEN_OBTAIN_SERIALIZER': 'mmi_app.authentication.ClaimsTokenObtainPairSerializer',
 }
 
 # CORS
@@ -176,6 +271,34 @@ CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', '').split(',') if os.ge
 # Stripe placeholders
 STRIPE_API_KEY = os.getenv('STRIPE_API_KEY', '')
 STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET', '')
+# Webhook events that fail are retried after 1x, 2x, 4x, ... this many seconds (capped)
+WEBHOOK_RETRY_BASE_SECONDS = float(os.getenv('WEBHOOK_RETRY_BASE_SECONDS', '30'))
+WEBHOOK_RETRY_MAX_SECONDS = float(os.getenv('WEBHOOK_RETRY_MAX_SECONDS', '3600'))
+# Stripe HTTP client: pooled keep-alive connections with strict timeouts
+STRIPE_API_BASE = os.getenv('STRIPE_API_BASE', '')  # e.g. the local stub from `manage.py stripe_stub`
+STRIPE_CONNECT_TIMEOUT = float(os.getenv('STRIPE_CONNECT_TIMEOUT', '3'))
+STRIPE_READ_TIMEOUT = float(os.getenv('STRIPE_READ_TIMEOUT', '10'))
+STRIPE_MAX_RETRIES = int(os.getenv('STRIPE_MAX_RETRIES', '2'))
+STRIPE_POOL_SIZE = int(os.getenv('STRIPE_POOL_SIZE', '20'))
+# Seconds a worker trusts its in-memory SiteSetting before rechecking the version stamp
+SITE_SETTINGS_CHECK_INTERVAL = float(os.getenv('SITE_SETTINGS_CHECK_INTERVAL', '5'))
+
+# Admin dashboard metrics: 'counters' (exact, maintained on write) or
+# 'approximate' (MySQL table statistics)
+ADMIN_METRICS_MODE = os.getenv('ADMIN_METRICS_MODE', 'counters')
+
+# Scheduling: interval length caps keep overlap queries index-bounded
+SCHEDULING_MAX_SESSION_HOURS = int(os.getenv('SCHEDULING_MAX_SESSION_HOURS', '12'))
+SCHEDULING_MAX_AVAILABILITY_HOURS = int(os.getenv('SCHEDULING_MAX_AVAILABILITY_HOURS', str(24 * 7)))
+# Off by default: turn on once tutors have entered their Availability
+SCHEDULING_REQUIRE_AVAILABILITY = os.getenv('SCHEDULING_REQUIRE_AVAILABILITY', '0') == '1'
+
+# Booking admission: queue booking requests for `manage.py process_booking_queue`
+# instead of claiming the seat inside the request (for high-demand openings)
+BOOKING_QUEUE = os.getenv('BOOKING_QUEUE', '0') == '1'
+
+# Conditional GET: part of every ETag; bump when a deploy changes response bodies
+ETAG_VERSION = os.getenv('ETAG_VERSION', '1')
 
 # Auth redirects
 LOGIN_URL = '/auth/login/'
@@ -50,6 +50,9 @@ urlpatterns = [
     path('book/<int:session_id>/', page_views.book_session_action, name='book-session'),
     path('pay/<int:enrollment_id>/', page_views.pay_enrollment_action, name='pay-enrollment'),
     path('cancel-booking/<int:booking_id>/', page_views.cancel_booking_action, name='cancel-booking'),
+    path('resources/<int:resource_id>/download/', page_views.resource_download, name='download-resource'),
+    path('webhooks/stripe/', page_views.stripe_webhook, name='stripe-webhook'),
+    path('metrics', page_views.metrics_endpoint, name='metrics'),
     path('admin/', admin.site.urls),
     path('api/', include('mmi_app.urls')),
 ]
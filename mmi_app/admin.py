@@ -1,7 +1,8 @@
 from django.contrib import admin
-from .models import Role, UserProfile, Tutor, Course, Session, Availability, Enrollment, Booking, Resource, Payment, SiteSetting, ActionRequest
+from .models import Role, UserProfile, Tutor, Course, Session, Availability, Enrollment, Booking, BookingRequest, Resource, Payment, SiteSetting, ActionRequest, WebhookEvent, ImportJob
 from django.contrib import messages
-from django.utils import timezone
+from .seats import cancel_bookings
+from . import approvals
 
 
 @admin.register(Role)
@@ -46,6 +47,19 @@ class EnrollmentAdmin(admin.ModelAdmin):
 class BookingAdmin(admin.ModelAdmin):
     list_display = ('id', 'student', 'session', 'created_at')
 
+    def delete_model(self, request, obj):
+        cancel_bookings([obj.id])
+
+    def delete_queryset(self, request, queryset):
+        cancel_bookings(queryset.values_list('id', flat=True))
+
+
+@admin.register(BookingRequest)
+class BookingRequestAdmin(admin.ModelAdmin):
+    list_display = ('id', 'student', 'session', 'status', 'created_at', 'processed_at')
+    list_filter = ('status',)
+    raw_id_fields = ('student', 'session')
+
 
 @admin.register(Resource)
 class ResourceAdmin(admin.ModelAdmin):
@@ -80,31 +94,39 @@ class ActionRequestAdmin(admin.ModelAdmin):
 
     @admin.action(description='Approve selected requests')
     def approve_requests(self, request, queryset):
-        approved = 0
-        for ar in queryset.only('id', 'status', 'request_type', 'booking_id'):
-            if ar.status != 'pending':
-                continue
-            if ar.request_type == 'cancel_booking' and ar.booking_id:
-                try:
-                    # Delete booking by ID to avoid touching unsaved related instances
-                    from .models import Booking
-                    Booking.objects.filter(id=ar.booking_id).delete()
-                except Exception:
-                    pass
-            # Update the ActionRequest row directly
-            type(self).model.objects.filter(id=ar.id).update(
-                status='approved', reviewed_by=request.user.id, reviewed_at=timezone.now()
-            )
-            approved += 1
-        self.message_user(request, f"Approved {approved} request(s).", level=messages.SUCCESS)
+        result = approvals.approve_requests(queryset, request.user)
+        self.message_user(request, f"Approved {len(result.processed)} request(s).", level=messages.SUCCESS)
+        self._report_failures(request, result)
 
     @admin.action(description='Reject selected requests')
     def reject_requests(self, request, queryset):
-        pending_ids = list(queryset.filter(status='pending').values_list('id', flat=True))
-        if pending_ids:
-            type(self).model.objects.filter(id__in=pending_ids).update(
-                status='rejected', reviewed_by=request.user.id, reviewed_at=timezone.now()
-            )
-        self.message_user(request, f"Rejected {len(pending_ids)} request(s).", level=messages.WARNING)
+        result = approvals.reject_requests(queryset, request.user)
+        self.message_user(request, f"Rejected {len(result.processed)} request(s).", level=messages.WARNING)
+        self._report_failures(request, result)
+
+    def _report_failures(self, request, result, limit=10):
+        if not result.failed:
+            return
+        details = '; '.join(f"#{pk}: {reason}" for pk, reason in list(result.failed.items())[:limit])
+        more = len(result.failed) - limit
+        if more > 0:
+            details += f" (and {more} more)"
+        self.message_user(request, f"{len(result.failed)} request(s) failed: {details}", level=messages.ERROR)
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'event_type', 'event_id', 'status', 'attempts', 'received_at', 'processed_at', 'next_attempt_at')
+    list_filter = ('status', 'event_type')
+    search_fields = ('event_id',)
+    readonly_fields = ('event_id', 'event_type', 'payload', 'received_at', 'processed_at', 'attempts', 'last_error')
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'kind', 'rows_done', 'rows_created', 'rows_rejected', 'finished', 'updated_at')
+    list_filter = ('kind', 'finished')
+    search_fields = ('name',)
+
 
 # Register your models here.
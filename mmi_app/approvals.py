@@ -0,0 +1,106 @@
+"""
+Bulk review of ActionRequests.
+
+Requests are processed in chunks of ids. Each chunk is one transaction:
+the pending rows are locked, the bookings of approvable cancellations are
+deleted with one DELETE (releasing their seats), and the reviewed requests
+are marked with one UPDATE. Items that cannot be processed are reported
+back with a reason instead of being skipped silently; a chunk that fails
+as a whole reports each of its items.
+"""
+
+from typing import Dict, Iterable, List
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .models import ActionRequest
+from .seats import cancel_bookings
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class ReviewResult:
+    def __init__(self):
+        self.processed: List[int] = []
+        self.skipped: List[int] = []
+        self.failed: Dict[int, str] = {}
+
+    def as_dict(self) -> dict:
+        return {
+            'processed': len(self.processed),
+            'skipped': self.skipped,
+            'failed': {str(pk): reason for pk, reason in self.failed.items()},
+        }
+
+
+def _chunks(ids: List[int], size: int):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _pending_ids(requests) -> List[int]:
+    if hasattr(requests, 'values_list'):
+        return list(requests.filter(status=ActionRequest.STATUS_PENDING).order_by('id').values_list('id', flat=True))
+    return sorted(set(int(pk) for pk in requests))
+
+
+def _approve_chunk(ids: List[int], reviewer, result: ReviewResult) -> None:
+    with transaction.atomic():
+        rows = list(
+            ActionRequest.objects.select_for_update()
+            .filter(id__in=ids, status=ActionRequest.STATUS_PENDING)
+            .values_list('id', 'request_type', 'booking_id')
+        )
+        approvable, booking_ids = [], []
+        for pk, request_type, booking_id in rows:
+            if request_type != ActionRequest.REQUEST_CANCEL_BOOKING:
+                result.failed[pk] = f'Unsupported request type {request_type!r}.'
+            elif booking_id is None:
+                result.failed[pk] = 'Booking no longer exists.'
+            else:
+                approvable.append(pk)
+                booking_ids.append(booking_id)
+        cancel_bookings(booking_ids)
+        ActionRequest.objects.filter(id__in=approvable).update(
+            status=ActionRequest.STATUS_APPROVED, reviewed_by=reviewer, reviewed_at=timezone.now()
+        )
+    found = {row[0] for row in rows}
+    result.skipped.extend(pk for pk in ids if pk not in found)
+    result.processed.extend(approvable)
+
+
+def _reject_chunk(ids: List[int], reviewer, result: ReviewResult) -> None:
+    with transaction.atomic():
+        pending = list(
+            ActionRequest.objects.select_for_update()
+            .filter(id__in=ids, status=ActionRequest.STATUS_PENDING)
+            .values_list('id', flat=True)
+        )
+        ActionRequest.objects.filter(id__in=pending).update(
+            status=ActionRequest.STATUS_REJECTED, reviewed_by=reviewer, reviewed_at=timezone.now()
+        )
+    found = set(pending)
+    result.skipped.extend(pk for pk in ids if pk not in found)
+    result.processed.extend(pending)
+
+
+def _review(process_chunk, requests, reviewer, chunk_size: int) -> ReviewResult:
+    result = ReviewResult()
+    for chunk in _chunks(_pending_ids(requests), max(1, chunk_size)):
+        try:
+            process_chunk(chunk, reviewer, result)
+        except DatabaseError as exc:
+            for pk in chunk:
+                result.failed[pk] = f'Chunk rolled back: {exc}'
+    return result
+
+
+def approve_requests(requests: Iterable, reviewer, chunk_size: int = DEFAULT_CHUNK_SIZE) -> ReviewResult:
+    """Approve pending requests given as a queryset or an iterable of ids."""
+    return _review(_approve_chunk, requests, reviewer, chunk_size)
+
+
+def reject_requests(requests: Iterable, reviewer, chunk_size: int = DEFAULT_CHUNK_SIZE) -> ReviewResult:
+    """Reject pending requests given as a queryset or an iterable of ids."""
+    return _review(_reject_chunk, requests, reviewer, chunk_size)
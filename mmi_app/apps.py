@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MmiAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mmi_app'
+
+    def ready(self):
+        from . import instrumentation, signals  # noqa: F401
@@ -0,0 +1,106 @@
+"""
+Stateless JWT users.
+
+Tokens from /api/auth/token/ carry `username`, `is_staff`, `is_superuser`
+and `auth_time` claims. With JWT_STATELESS_USER enabled,
+`StatelessJWTAuthentication` turns them into a `TokenUser` without loading
+the User row. Views that need the real row call `full_user()`, which keeps
+recently used rows in a small per-process cache.
+
+Because claims can outlive a change to the account, deactivation, privilege
+and password changes record a `TokenRevocation` (see signals.py). Every
+process keeps the recent revocations in memory as a `VersionedValue` and
+rejects tokens authenticated before them; entries older than the refresh
+token lifetime can no longer match a live token and are not loaded. The
+copy is revalidated against the newest `revoked_at` in the database, not a
+cache stamp, so every worker sees a revocation within
+JWT_REVOCATION_CHECK_INTERVAL seconds whatever the cache backend.
+"""
+
+import time
+from typing import Dict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from .caching import BoundedCache, VersionedValue
+from .models import TokenRevocation
+
+AUTH_TIME_CLAIM = 'auth_time'
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['username'] = user.get_username()
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        # Copied into every access token minted from this refresh token
+        token[AUTH_TIME_CLAIM] = time.time()
+        return token
+
+
+def _load_revocations() -> Dict[int, float]:
+    since = timezone.now() - api_settings.REFRESH_TOKEN_LIFETIME
+    return {
+        user_id: revoked_at.timestamp()
+        for user_id, revoked_at in TokenRevocation.objects.filter(revoked_at__gte=since).values_list('user_id', 'revoked_at')
+    }
+
+
+def _latest_revocation():
+    return TokenRevocation.objects.aggregate(latest=Max('revoked_at'))['latest']
+
+
+# Invalidated locally by the User receivers in signals.py
+revocations = VersionedValue(
+    'jwt-revocations', _load_revocations,
+    check_interval=getattr(settings, 'JWT_REVOCATION_CHECK_INTERVAL', 5.0), version=_latest_revocation,
+)
+
+user_cache = BoundedCache(
+    max_size=getattr(settings, 'JWT_USER_CACHE_SIZE', 1024),
+    timeout=getattr(settings, 'JWT_USER_CACHE_TIMEOUT', 60.0),
+)
+
+
+def revoke_user(user_id: int) -> None:
+    """Reject `user_id`'s existing tokens; call from inside the changing transaction."""
+    TokenRevocation.objects.update_or_create(user_id=user_id, defaults={'revoked_at': timezone.now()})
+    user_cache.discard(user_id)
+
+
+def is_revoked(user_id, auth_time: float) -> bool:
+    revoked_at = revocations.get().get(user_id)
+    return revoked_at is not None and auth_time <= revoked_at
+
+
+def full_user(user):
+    """The User row behind `user`, which may be a stateless `TokenUser`."""
+    if not isinstance(user, TokenUser):
+        return user
+    found = user_cache.get(user.id, lambda: get_user_model().objects.filter(pk=user.id).first())
+    if found is None or not found.is_active:
+        raise AuthenticationFailed('User not found or inactive.', code='user_not_found')
+    return found
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication without the per-request User query, for tokens that carry the claims."""
+
+    def get_user(self, validated_token):
+        if AUTH_TIME_CLAIM not in validated_token or api_settings.USER_ID_CLAIM not in validated_token:
+            # Issued before the claims existed: look the user up as usual
+            return super().get_user(validated_token)
+        user = TokenUser(validated_token)
+        if is_revoked(user.id, validated_token[AUTH_TIME_CLAIM]):
+            raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+        return user
@@ -0,0 +1,109 @@
+"""
+Avatar variants.
+
+Uploads are stored as-is by the profile form; `manage.py process_avatars`
+renders a fixed set of square JPEG and WebP variants outside the request.
+Variant names include a hash of the source file, so they never change once
+written and can be cached indefinitely. A profile is pending while
+`avatar_processed` differs from the current `avatar` name, which also
+makes every avatar uploaded before this existed pending once.
+"""
+
+import hashlib
+import io
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from PIL import Image, ImageOps, features
+
+from .models import UserProfile
+
+AVATAR_SIZES = tuple(sorted(getattr(settings, 'AVATAR_SIZES', (40, 96, 256))))
+VARIANT_DIR = 'avatars/variants'
+JPEG_QUALITY = 82
+WEBP_QUALITY = 78
+
+
+def formats() -> List[str]:
+    return ['webp', 'jpeg'] if features.check('webp') else ['jpeg']
+
+
+def pending_profiles():
+    return UserProfile.objects.exclude(avatar='').exclude(avatar__isnull=True).exclude(avatar=F('avatar_processed'))
+
+
+def variant_key(size: int, fmt: str) -> str:
+    return f'{size}.{fmt}'
+
+
+def _encode(image: Image.Image, fmt: str) -> bytes:
+    out = io.BytesIO()
+    if fmt == 'webp':
+        image.save(out, 'WEBP', quality=WEBP_QUALITY, method=4)
+    else:
+        if image.mode == 'RGBA':
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        image.save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def render_variants(data: bytes) -> Dict[str, bytes]:
+    """Encode `data` into every configured size and format; returns {variant_key: bytes}."""
+    image = Image.open(io.BytesIO(data))
+    # Let the JPEG decoder downscale while decoding; phone photos shrink 4-8x for free
+    image.draft('RGB', (AVATAR_SIZES[-1] * 2, AVATAR_SIZES[-1] * 2))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'P') else 'RGB')
+    rendered = {}
+    for size in reversed(AVATAR_SIZES):
+        image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        for fmt in formats():
+            rendered[variant_key(size, fmt)] = _encode(image, fmt)
+    return rendered
+
+
+def process_profile(profile: UserProfile) -> bool:
+    """Write variants for `profile`'s current avatar; False if it changed or vanished meanwhile."""
+    name = profile.avatar.name
+    try:
+        with default_storage.open(name, 'rb') as source:
+            data = source.read()
+        rendered = render_variants(data)
+    except (OSError, Image.DecompressionBombError):
+        # Missing or unreadable files are recorded with no variants; templates fall back to the original
+        rendered = {}
+    variants: Dict[str, str] = {}
+    if rendered:
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        for key, content in rendered.items():
+            size, fmt = key.split('.')
+            path = f"{VARIANT_DIR}/{profile.pk}-{digest}-{size}.{'jpg' if fmt == 'jpeg' else fmt}"
+            if not default_storage.exists(path):
+                default_storage.save(path, ContentFile(content))
+            variants[key] = path
+    with transaction.atomic():
+        # Only record the result if no newer upload replaced the avatar meanwhile
+        updated = UserProfile.objects.filter(pk=profile.pk, avatar=name).update(
+            avatar_variants=variants, avatar_processed=name,
+        )
+    if updated:
+        stale = set((profile.avatar_variants or {}).values()) - set(variants.values())
+        for path in stale:
+            default_storage.delete(path)
+    return bool(updated)
+
+
+def pick(variants: Dict[str, str], size: int, fmt: str) -> Optional[str]:
+    """The smallest variant of `fmt` at least `size` pixels wide (else the largest one)."""
+    sizes = [s for s in AVATAR_SIZES if variant_key(s, fmt) in variants]
+    if not sizes:
+        return None
+    best = next((s for s in sizes if s >= size), sizes[-1])
+    return variants[variant_key(best, fmt)]
@@ -0,0 +1,220 @@
+"""
+Route benchmarks with per-route query budgets.
+
+Every URL in mmi/urls.py and mmi_app/urls.py has at least one `Route`
+with the most SQL queries it may issue. Budgets are fixed numbers, so a
+query count that grows with the data (an N+1) fails on a seeded dataset
+of any size. Each route runs in a transaction that is rolled back, so
+write routes leave the data unchanged and can run again. Cached pages are
+orphaned before each route (the rest of the cache, which may be shared with
+running workers, is left alone): the first (cold) request counts against
+the budget, and the later ones give the latency figures. Routes served from
+the page cache also have a `warm_budget` for those later requests.
+Process-wide values such as the site settings are loaded before each
+route, so budgets count only the queries of the request itself.
+
+Run against data from `manage.py seed_data` with `manage.py bench_routes`.
+"""
+
+import statistics
+import time
+from datetime import timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import admission
+from .authentication import ClaimsTokenObtainPairSerializer, revocations
+from .caching import invalidate_all_pages
+from .models import ActionRequest, Booking, Enrollment, Resource, Session
+from .search import course_search_index
+from .seeding import PASSWORD, STAFF_USERNAME
+from .utils import site_setting_cache
+
+# Loaded at most once per check interval, not once per request
+PROCESS_VALUES = (site_setting_cache, revocations, course_search_index)
+
+
+class Route(NamedTuple):
+    name: str
+    path: str
+    budget: int
+    user: str = 'anon'  # anon | student | staff | student-jwt | staff-jwt
+    method: str = 'get'
+    data: Optional[dict] = None
+    status: Tuple[int, ...] = (200,)
+    warm_budget: Optional[int] = None
+
+
+class _Rollback(Exception):
+    pass
+
+
+def fixtures() -> Dict[str, object]:
+    """Rows the routes point at, picked from the current (seeded) data."""
+    User = get_user_model()
+    booking = (
+        Booking.objects.filter(student__enrollments__course__price_cents__gt=0, student__tutor__isnull=True)
+        .select_related('student').order_by('id').first()
+    )
+    if booking is None:
+        raise LookupError('No student with bookings and paid enrollments; run `manage.py seed_data` first.')
+    student = booking.student
+    enrollment = Enrollment.objects.filter(student=student, course__price_cents__gt=0).select_related('course').order_by('id').first()
+    course = enrollment.course
+    session = (
+        Session.objects.filter(course=course, start_time__gte=timezone.now())
+        .exclude(bookings__student=student).order_by('start_time').first()
+    )
+    pending = ActionRequest.objects.filter(status=ActionRequest.STATUS_PENDING).order_by('id').first()
+    now = timezone.now()
+    return {
+        'staff': User.objects.filter(username=STAFF_USERNAME).first() or User.objects.filter(is_staff=True).first(),
+        'student': student,
+        'course': course,
+        'tutor_id': course.tutor_id,
+        'enrollment_id': enrollment.id,
+        'booking_id': booking.id,
+        'session_id': session.id if session else booking.session_id,
+        'resource_id': Resource.objects.exclude(file='').order_by('id').values_list('id', flat=True).first() or 0,
+        'request_id': pending.id if pending else 0,
+        'window': urlencode({'start': now.isoformat(), 'end': (now + timedelta(days=14)).isoformat(), 'minutes': 60}),
+    }
+
+
+def routes(fx) -> List[Route]:
+    slug = fx['course'].slug
+    return [
+        # Pages (mmi/urls.py); catalog pages and endpoints include the
+        # change stamp lookup behind their ETag (mmi_app.conditional), and
+        # anonymous catalog pages are page cache hits once warm
+        Route('home', '/', 2, warm_budget=0),
+        Route('courses', '/courses/', 4, warm_budget=0),
+        Route('courses-search', '/courses/?q=algebra+practice', 5, warm_budget=0),
+        Route('course-detail', f'/courses/{slug}/', 4, warm_budget=0),
+        Route('tutors', '/tutors/', 2, warm_budget=0),
+        # One more with BOOKING_QUEUE: the student's booking requests
+        Route('dashboard', '/dashboard/', 5 + admission.QUEUE_ENABLED, user='student'),
+        Route('dashboard-anon', '/dashboard/', 0, status=(401,)),
+        Route('bookings', '/bookings/', 1),
+        Route('checkout', f"/checkout/?enrollment_id={fx['enrollment_id']}", 3, user='student'),
+        Route('checkout-success', '/checkout/success/', 0),
+        Route('checkout-cancel', '/checkout/cancel/', 0),
+        Route('privacy', '/privacy/', 0),
+        Route('terms', '/terms/', 0),
+        Route('contact', '/contact/', 0),
+        Route('profile', '/profile/', 4, user='student'),
+        Route('admin-dashboard', '/admin-dashboard/', 7, user='staff'),
+        Route('login', '/auth/login/', 0),
+        Route('logout-confirm', '/auth/logout/confirm/', 2, user='student'),
+        Route('logout-perform', '/auth/logout/perform/', 4, user='student', method='post', status=(302,)),
+        Route('logout', '/auth/logout/', 4, user='student', method='post', status=(302,)),
+        Route('register', '/auth/register/', 0),
+        Route('enroll', f'/enroll/{slug}/', 4, user='student', method='post', status=(302,)),
+        Route('book-session', f"/book/{fx['session_id']}/", 7, user='student', method='post', status=(302,)),
+        Route('pay-enrollment', f"/pay/{fx['enrollment_id']}/", 9, user='student', status=(302,)),
+        Route('cancel-booking', f"/cancel-booking/{fx['booking_id']}/", 4, user='student', method='post', status=(302,)),
+        Route('download-resource', f"/resources/{fx['resource_id']}/download/", 3, user='student'),
+        Route('stripe-webhook', '/webhooks/stripe/', 1, method='post', status=(400, 503)),
+        Route('metrics', '/metrics', 4, user='staff'),
+        Route('admin', '/admin/', 5, user='staff'),
+        # API (mmi_app/urls.py)
+        Route('api-root', '/api/', 0),
+        Route('api-token', '/api/auth/token/', 1, method='post', data={'username': fx['staff'].username, 'password': PASSWORD}),
+        Route('api-token-refresh', '/api/auth/token/refresh/', 0, method='post', data={'refresh': fx['refresh']}),
+        Route('api-checkout-session', '/api/payments/create-checkout-session/', 1, user='student-jwt', method='post',
+              data={'enrollment_id': fx['enrollment_id']}),
+        Route('api-review-requests', '/api/action-requests/review/', 5, user='staff-jwt', method='post',
+              data={'decision': 'reject', 'ids': [fx['request_id']]}),
+        Route('api-export', f'/api/exports/enrollments.csv?course={slug}', 2, user='staff-jwt'),
+        Route('api-courses', '/api/courses/', 2),
+        Route('api-courses-search', '/api/courses/?q=algebra', 3),
+        Route('api-course', f"/api/courses/{fx['course'].id}/", 2),
+        Route('api-tutors', '/api/tutors/', 2),
+        Route('api-tutor', f"/api/tutors/{fx['tutor_id']}/", 2),
+        Route('api-tutor-free-slots', f"/api/tutors/{fx['tutor_id']}/free-slots/?{fx['window']}", 3),
+        Route('api-sessions', '/api/sessions/', 2),
+        Route('api-session', f"/api/sessions/{fx['session_id']}/", 2),
+        Route('api-sessions-sparse', '/api/sessions/?fields=id,start_time,end_time', 2),
+        Route('api-enrollments', '/api/enrollments/', 2, user='student-jwt'),
+        Route('api-bookings', '/api/bookings/', 2, user='student-jwt'),
+        Route('api-booking-requests', '/api/booking-requests/', 2, user='student-jwt'),
+        Route('api-resources', '/api/resources/', 3, user='student-jwt'),
+        Route('api-resource', f"/api/resources/{fx['resource_id']}/", 3, user='student-jwt'),
+        Route('api-resource-download', f"/api/resources/{fx['resource_id']}/download/", 2, user='student-jwt'),
+        Route('api-payments', '/api/payments/', 2, user='student-jwt'),
+    ]
+
+
+def _client(route: Route, fx) -> Client:
+    client = Client()
+    if route.user in ('student', 'staff'):
+        client.force_login(fx[route.user])
+    elif route.user.endswith('-jwt'):
+        token = ClaimsTokenObtainPairSerializer.get_token(fx[route.user[:-len('-jwt')]]).access_token
+        client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    return client
+
+
+def _request(client: Client, route: Route):
+    if route.method == 'post' and route.path.startswith('/api/'):
+        response = client.post(route.path, route.data or {}, content_type='application/json')
+    elif route.method == 'post':
+        response = client.post(route.path, route.data or {})
+    else:
+        response = client.get(route.path)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def run_route(route: Route, fx, repeat: int = 5) -> dict:
+    invalidate_all_pages()
+    for value in PROCESS_VALUES:
+        value.get()
+    timings: List[float] = []
+    queries: List[int] = []
+    status = None
+    try:
+        with transaction.atomic():
+            client = _client(route, fx)
+            for _ in range(max(1, repeat)):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = _request(client, route)
+                    timings.append(time.perf_counter() - started)
+                queries.append(len(captured))
+                status = response.status_code
+            raise _Rollback
+    except _Rollback:
+        pass
+    warm = timings[1:] or timings
+    return {
+        'name': route.name,
+        'method': route.method.upper(),
+        'path': route.path,
+        'user': route.user,
+        'status': status,
+        'status_ok': status in route.status,
+        'queries': max(queries),
+        'queries_warm': queries[-1],
+        'budget': route.budget,
+        'within_budget': max(queries) <= route.budget and (
+            route.warm_budget is None or len(queries) < 2 or queries[-1] <= route.warm_budget
+        ),
+        'cold_ms': round(timings[0] * 1000, 3),
+        'p50_ms': round(statistics.median(warm) * 1000, 3),
+        'p95_ms': round(sorted(warm)[min(len(warm) - 1, int(len(warm) * 0.95))] * 1000, 3),
+    }
+
+
+def run(repeat: int = 5, only: Optional[List[str]] = None) -> List[dict]:
+    fx = fixtures()
+    fx['refresh'] = str(ClaimsTokenObtainPairSerializer.get_token(fx['staff']))
+    selected = [r for r in routes(fx) if not only or r.name in only]
+    return [run_route(route, fx, repeat) for route in selected]
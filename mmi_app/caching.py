@@ -0,0 +1,198 @@
+"""
+Caching helpers: process-local versioned values and the anonymous page cache.
+
+`VersionedValue` keeps a loaded value in process memory and revalidates it
+against a version stamp held in Django's cache. Bumping the stamp (usually
+from a post_save/post_delete receiver) invalidates every worker: each one
+notices the new stamp on its next check, at most `check_interval` seconds
+later. A per-process backend (LocMemCache, the default, or DummyCache)
+cannot carry the stamp to other workers, so there every check reloads the
+value instead: other workers then see a change at most `check_interval`
+seconds late, at the price of one load per interval. Values that must not
+depend on the cache backend pass a `version` callable that reads a stamp
+every process can see, such as the newest row in a table.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+
+from .routers import reads_after
+
+_MISSING = object()
+
+
+def cache_is_shared() -> bool:
+    """Whether the default cache is visible to other processes."""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+class VersionedValue:
+    def __init__(
+        self, key: str, loader: Callable[[], Any], check_interval: float = 5.0, version: Optional[Callable[[], Any]] = None,
+    ):
+        self.key = key
+        self.loader = loader
+        self.check_interval = check_interval
+        self.version = version
+        # (version, value, checked_at); replaced atomically
+        self._state = (None, _MISSING, 0.0)
+
+    @property
+    def version_key(self) -> str:
+        return f'mmi:version:{self.key}'
+
+    def _current_version(self):
+        if self.version is not None:
+            return self.version()
+        version = cache.get(self.version_key)
+        if version is None:
+            # First use, or the stamp was evicted: start a fresh one
+            cache.add(self.version_key, time.time_ns(), timeout=None)
+            version = cache.get(self.version_key)
+        return version
+
+    def get(self) -> Any:
+        version, value, checked_at = self._state
+        now = time.monotonic()
+        if value is not _MISSING and now - checked_at < self.check_interval:
+            return value
+        current = self._current_version()
+        if value is not _MISSING and current == version and (self.version is not None or cache_is_shared()):
+            self._state = (version, value, now)
+            return value
+        if self.version is not None:
+            value = self.loader()
+        else:
+            with reads_after(current):
+                value = self.loader()
+        self._state = (current, value, now)
+        return value
+
+    def invalidate(self) -> None:
+        """Drop this process' copy and bump the shared stamp for the others."""
+        self._state = (None, _MISSING, 0.0)
+        cache.set(self.version_key, time.time_ns(), timeout=None)
+
+
+class BoundedCache:
+    """A small thread-safe LRU of process-local values that expire after `timeout` seconds."""
+
+    def __init__(self, max_size: int = 1024, timeout: float = 60.0):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, loader: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and now - item[1] < self.timeout:
+                self._items.move_to_end(key)
+                return item[0]
+        value = loader()
+        with self._lock:
+            self._items[key] = (value, now)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return value
+
+    def discard(self, key) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+
+# Anonymous page cache
+#
+# Cached pages are tagged with invalidation groups (for example 'courses' or
+# 'course:<slug>'). Each group has a version stamp in the cache and the stamps
+# are part of the page key, so bumping a group orphans exactly the pages that
+# depend on it; orphaned entries age out through the cache's own timeout.
+# A generation stamp in every key does the same for all pages at once.
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+
+page_cache_stats = {'hits': 0, 'misses': 0, 'bypass': 0}
+
+
+def _group_key(group: str) -> str:
+    return f'mmi:page-group:{group}'
+
+
+_GENERATION_KEY = 'mmi:page-generation'
+
+
+def invalidate_page_groups(*groups: str) -> None:
+    stamp = time.time_ns()
+    cache.set_many({_group_key(g): stamp for g in groups}, timeout=None)
+
+
+def invalidate_all_pages() -> None:
+    """Orphan every cached page without touching the rest of the cache."""
+    cache.set(_GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def _page_key(name: str, request, groups) -> Tuple[str, List[int]]:
+    stamps = cache.get_many([_GENERATION_KEY] + [_group_key(g) for g in groups])
+    versions = [stamps.get(_group_key(g), 0) for g in groups]
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    key = f"mmi:page:{name}:{path}:{stamps.get(_GENERATION_KEY, 0)}:{'.'.join(map(str, versions))}"
+    return key, versions
+
+
+def cache_anonymous_page(name: str, groups: Callable[..., Iterable[str]]):
+    """
+    Cache a view's 200 responses for anonymous GET/HEAD requests.
+
+    `groups` receives the view's URL kwargs and returns the invalidation
+    groups the page depends on. The page's ETag is cached with it, so a
+    hit answers If-None-Match without touching the database.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            cacheable = (
+                request.method in ('GET', 'HEAD')
+                and not request.user.is_authenticated
+                # Flash messages are per visitor; never share or swallow them
+                and not len(get_messages(request))
+            )
+            if not cacheable:
+                page_cache_stats['bypass'] += 1
+                return view(request, *args, **kwargs)
+            key, versions = _page_key(name, request, list(groups(**kwargs)))
+            cached = cache.get(key)
+            if cached is not None:
+                page_cache_stats['hits'] += 1
+                # Entries cached before ETags were stored have two items
+                content, content_type, etag = (*cached, None)[:3]
+                response = get_conditional_response(request, etag=etag) if etag else None
+                if response is None:
+                    response = HttpResponse(content, content_type=content_type)
+                if etag:
+                    response['ETag'] = etag
+                response['X-Page-Cache'] = 'hit'
+                return response
+            page_cache_stats['misses'] += 1
+            # Don't cache a page rendered from a replica that may predate the invalidation
+            with reads_after(*versions):
+                response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.cookies and not response.streaming:
+                cache.set(key, (response.content, response['Content-Type'], response.get('ETag')), PAGE_CACHE_TIMEOUT)
+            response['X-Page-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
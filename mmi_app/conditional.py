@@ -0,0 +1,126 @@
+"""
+Conditional GET from per-model change stamps.
+
+`touch()` moves the `ChangeStamp` row of a model when the current
+transaction commits. Saves and deletes of Course, Session, Tutor and
+Resource touch through signal receivers; code that changes them with
+`.update()` calls it directly. A response's ETag is a hash of the URL and
+the stamps of every model it shows, read with one primary-key lookup, so
+validators cost the same however large the tables are and are known before
+anything is serialized. The stamps are coarse: any change to a model
+revalidates every response that shows it.
+
+`ConditionalGetMixin` answers If-None-Match/If-Modified-Since on DRF list
+and detail actions; `conditional_page` does the same for server-rendered
+pages. Bump ETAG_VERSION when a deploy changes what a response looks like.
+"""
+
+import hashlib
+from calendar import timegm
+from datetime import datetime
+from functools import wraps
+from typing import Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import ChangeStamp
+
+ETAG_VERSION = getattr(settings, 'ETAG_VERSION', '1')
+
+
+def _bump(names: Sequence[str]) -> None:
+    now = timezone.now()
+    ChangeStamp.objects.bulk_create(
+        [ChangeStamp(name=name, changed_at=now) for name in names],
+        update_conflicts=True, unique_fields=['name'], update_fields=['changed_at'],
+    )
+
+
+def touch(*names: str) -> None:
+    """Move the change stamps of `names` (e.g. 'course') once the current transaction commits."""
+    transaction.on_commit(lambda: _bump(names))
+
+
+def change_stamps(names: Sequence[str]) -> Tuple[Optional[datetime], ...]:
+    """The stamps of `names`, in order; None for a model that has not changed yet."""
+    stamps = dict(ChangeStamp.objects.filter(name__in=names).values_list('name', 'changed_at'))
+    return tuple(stamps.get(name) for name in names)
+
+
+def make_etag(*parts) -> str:
+    return quote_etag(hashlib.md5(repr((ETAG_VERSION,) + parts).encode()).hexdigest())
+
+
+def _timestamp(stamps: Sequence[Optional[datetime]]) -> Optional[int]:
+    stamps = [stamp for stamp in stamps if stamp is not None]
+    return timegm(max(stamps).utctimetuple()) if stamps else None
+
+
+def _set_validators(response, etag: str, last_modified: Optional[int]):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag and Last-Modified for `list` and `retrieve`, answered with 304
+    before the payload is built. `change_models` are the stamps of every
+    model the payload includes.
+    """
+    change_models: Sequence[str] = ()
+
+    def _conditional(self, respond):
+        request = self.request
+        stamps = change_stamps(self.change_models)
+        etag = make_etag(request.get_full_path(), request.accepted_renderer.format, stamps)
+        timestamp = _timestamp(stamps)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if not_modified is not None:
+            return _set_validators(not_modified, etag, timestamp)
+        response = respond()
+        if response.status_code == 200:
+            _set_validators(response, etag, timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
+
+
+def conditional_page(*names: str):
+    """
+    ETag and 304s for a page view, for anonymous visitors only. `names` are
+    the change stamps of the models the page shows. Signed-in pages carry
+    per-session state (CSRF tokens in forms, staff links) that the stamps do
+    not cover, so they are always rendered, as are pages with pending flash
+    messages. The ETag includes the CSRF cookie, so a replaced cookie never
+    revalidates a form rendered with the old one; there is no Last-Modified
+    for the same reason.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ('GET', 'HEAD') or request.user.is_authenticated
+                or len(get_messages(request))
+            ):
+                return view(request, *args, **kwargs)
+            etag = make_etag(request.get_full_path(), request.COOKIES.get(settings.CSRF_COOKIE_NAME), change_stamps(names))
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return _set_validators(not_modified, etag, None)
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.has_header('ETag'):
+                _set_validators(response, etag, None)
+            return response
+        return wrapper
+    return decorator
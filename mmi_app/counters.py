@@ -0,0 +1,150 @@
+"""
+Row counters for the admin dashboard.
+
+Counters are bumped by the post_save/post_delete receivers in signals.py,
+inside the writer's transaction. Writes that bypass model signals
+(bulk_create, raw SQL, fast deletes) make them drift; the
+`reconcile_counters` command recounts from the real tables. The
+post_delete receivers also rule out Django's fast deletes for the counted
+models: deletes and cascades fetch the rows and fire a signal per row.
+
+Each thread sticks to one shard, so a transaction that bumps several
+metrics locks one known row per metric instead of random ones, and
+`deferred()` applies its metrics in name order.
+"""
+
+import os
+import random
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import F, Sum
+
+from .models import Booking, Course, Enrollment, MetricCounter, Payment, Session, Tutor
+
+SHARDS = getattr(settings, 'METRIC_COUNTER_SHARDS', 8)
+
+
+def tracked_models() -> Dict[str, type]:
+    return {
+        'users': get_user_model(),
+        'tutors': Tutor,
+        'courses': Course,
+        'sessions': Session,
+        'enrollments': Enrollment,
+        'bookings': Booking,
+        'payments': Payment,
+    }
+
+
+_pending = threading.local()
+
+
+@contextmanager
+def deferred():
+    """
+    Collect bumps made inside the block and apply them as one UPDATE per
+    metric on exit; for set-based writes that fire a signal per row.
+    """
+    if getattr(_pending, 'deltas', None) is not None:
+        yield
+        return
+    _pending.deltas = {}
+    try:
+        yield
+        deltas = _pending.deltas
+    finally:
+        _pending.deltas = None
+    for name, delta in sorted(deltas.items()):
+        if delta:
+            _apply(name, delta)
+
+
+def bump(name: str, delta: int) -> None:
+    deltas = getattr(_pending, 'deltas', None)
+    if deltas is not None:
+        deltas[name] = deltas.get(name, 0) + delta
+        return
+    _apply(name, delta)
+
+
+_thread = threading.local()
+
+
+def _shard() -> int:
+    # Picked once per thread (and again after a fork)
+    pid, shard = getattr(_thread, 'shard', (None, 0))
+    if pid != os.getpid():
+        pid, shard = os.getpid(), random.randrange(SHARDS)
+        _thread.shard = (pid, shard)
+    return shard
+
+
+def _apply(name: str, delta: int) -> None:
+    shard = _shard()
+    updated = MetricCounter.objects.filter(name=name, shard=shard).update(value=F('value') + delta)
+    if not updated:
+        MetricCounter.objects.get_or_create(name=name, shard=shard)
+        MetricCounter.objects.filter(name=name, shard=shard).update(value=F('value') + delta)
+
+
+def ensure_shards() -> None:
+    """Create all shard rows up front, so the first bump on a shard is a single UPDATE."""
+    MetricCounter.objects.bulk_create(
+        [MetricCounter(name=name, shard=shard) for name in tracked_models() for shard in range(SHARDS)],
+        ignore_conflicts=True,
+    )
+
+
+def read_counters() -> Dict[str, int]:
+    """All dashboard metrics in one query."""
+    metrics = dict.fromkeys(tracked_models(), 0)
+    rows = MetricCounter.objects.filter(name__in=list(metrics)).values('name').annotate(total=Sum('value')).order_by()
+    for row in rows:
+        metrics[row['name']] = max(0, row['total'] or 0)
+    return metrics
+
+
+def read_approximate() -> Dict[str, int]:
+    """
+    Row estimates from MySQL's table statistics, in one query. Cheap but
+    can be off by tens of percent on InnoDB; falls back to the counters on
+    other backends.
+    """
+    if connection.vendor != 'mysql':
+        return read_counters()
+    tables = {model._meta.db_table: name for name, model in tracked_models().items()}
+    placeholders = ', '.join(['%s'] * len(tables))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT TABLE_NAME, TABLE_ROWS FROM information_schema.TABLES '
+            f'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders})',
+            list(tables),
+        )
+        rows = cursor.fetchall()
+    metrics = dict.fromkeys(tables.values(), 0)
+    for table, estimate in rows:
+        metrics[tables[table]] = int(estimate or 0)
+    return metrics
+
+
+def read_metrics() -> Dict[str, int]:
+    if getattr(settings, 'ADMIN_METRICS_MODE', 'counters') == 'approximate':
+        return read_approximate()
+    return read_counters()
+
+
+def reconcile(name: str) -> int:
+    """Reset `name` to the real row count; returns the counted value."""
+    model = tracked_models()[name]
+    with transaction.atomic():
+        # Lock the shards so concurrent bumps wait for the reset
+        list(MetricCounter.objects.select_for_update().filter(name=name))
+        actual = model.objects.count()
+        MetricCounter.objects.filter(name=name).exclude(shard=0).delete()
+        MetricCounter.objects.update_or_create(name=name, shard=0, defaults={'value': actual})
+    return actual
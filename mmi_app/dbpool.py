@@ -0,0 +1,230 @@
+"""
+A thread-safe pool of DB-API connections.
+
+Used by the `mmi_app.pooled_mysql` database backend: Django still closes
+its connection at the end of each request (CONN_MAX_AGE = 0), but the
+close hands the live connection back to the pool instead of ending the
+session, so the next request skips the TCP, TLS and auth handshake. The same
+pool serves WSGI worker threads and the threads ASGI runs sync views in.
+
+- `max_size` caps the connections each process opens; a checkout waits up
+  to `timeout` seconds for one to be returned, then raises `PoolTimeout`.
+- `min_size` connections are kept open even when idle; extra idle
+  connections close after `max_idle` seconds.
+- Connections are replaced after `max_lifetime` seconds, before the
+  server's wait_timeout can drop them, and a connection that sat idle for
+  more than `check_after` seconds is pinged before it is handed out.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Tuple
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _Entry:
+    __slots__ = ('connection', 'created', 'returned')
+
+    def __init__(self, connection, created: float):
+        self.connection = connection
+        self.created = created
+        self.returned = created
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect: Callable[[], object],
+        validate: Callable[[object], bool],
+        min_size: int = 0,
+        max_size: int = 10,
+        timeout: float = 5.0,
+        max_lifetime: float = 1800.0,
+        max_idle: float = 300.0,
+        check_after: float = 30.0,
+    ):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError('Pool sizes need 1 <= max_size and min_size <= max_size.')
+        self.connect = connect
+        self.validate = validate
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self._lock = threading.Condition()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._idle: Deque[_Entry] = deque()
+        self._checked_out: Dict[int, _Entry] = {}
+        self._opening = 0
+        self.waiting = 0
+        self.created_total = 0
+        self.closed_total = 0
+        self.timeouts_total = 0
+        self.failed_checks_total = 0
+        self.wait_seconds_total = 0.0
+
+    @property
+    def size(self) -> int:
+        return len(self._idle) + len(self._checked_out) + self._opening
+
+    def _check_fork(self) -> None:
+        # A forked worker must not share sockets with its parent: drop the
+        # inherited connections without closing them (that would end the
+        # parent's sessions) and start empty.
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _close(self, entry: _Entry) -> None:
+        self.closed_total += 1
+        try:
+            entry.connection.close()
+        except Exception:
+            pass
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return bool(self.max_lifetime) and now - entry.created > self.max_lifetime
+
+    def acquire(self):
+        """Check out a connection, opening one if the pool is below max_size."""
+        deadline = None
+        with self._lock:
+            self._check_fork()
+            while True:
+                now = time.monotonic()
+                entry = self._idle.pop() if self._idle else None
+                if entry is not None:
+                    if self._expired(entry, now):
+                        self._close(entry)
+                        continue
+                    self._checked_out[id(entry.connection)] = entry
+                    break
+                if self.size < self.max_size:
+                    self._opening += 1
+                    break
+                if deadline is None:
+                    deadline = now + self.timeout
+                remaining = deadline - now
+                if remaining <= 0:
+                    self.timeouts_total += 1
+                    raise PoolTimeout(
+                        f'No database connection free within {self.timeout}s ({self.max_size} in use).'
+                    )
+                self.waiting += 1
+                try:
+                    self._lock.wait(remaining)
+                finally:
+                    self.waiting -= 1
+                    self.wait_seconds_total += time.monotonic() - now
+
+        if entry is None:
+            return self._open()
+        if self.check_after is not None and time.monotonic() - entry.returned > self.check_after:
+            if not self._healthy(entry.connection):
+                with self._lock:
+                    self.failed_checks_total += 1
+                    self._checked_out.pop(id(entry.connection), None)
+                    self._close(entry)
+                    self._lock.notify()
+                return self.acquire()
+        return entry.connection
+
+    def _healthy(self, connection) -> bool:
+        try:
+            return self.validate(connection)
+        except Exception:
+            return False
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self._lock:
+                self._opening -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._opening -= 1
+            self.created_total += 1
+            self._checked_out[id(connection)] = _Entry(connection, time.monotonic())
+        return connection
+
+    def release(self, connection, discard: bool = False) -> None:
+        """Return a checked-out connection; `discard` closes it instead."""
+        with self._lock:
+            entry = self._checked_out.pop(id(connection), None)
+            if entry is None:
+                # Checked out before a fork, or released twice
+                connection.close()
+                return
+            now = time.monotonic()
+            if discard or self._expired(entry, now):
+                self._close(entry)
+            else:
+                entry.returned = now
+                self._idle.append(entry)
+                self._prune(now)
+            self._lock.notify()
+
+    def _prune(self, now: float) -> None:
+        # The oldest-returned connections sit at the left end
+        while self._idle and self.size > self.min_size and now - self._idle[0].returned > self.max_idle:
+            self._close(self._idle.popleft())
+
+    def fill(self) -> None:
+        """Open connections until `min_size` are available."""
+        while True:
+            with self._lock:
+                self._check_fork()
+                if self.size >= self.min_size:
+                    return
+                self._opening += 1
+            self.release(self._open())
+
+    def close_all(self) -> None:
+        with self._lock:
+            while self._idle:
+                self._close(self._idle.popleft())
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'size': self.size,
+                'idle': len(self._idle),
+                'in_use': len(self._checked_out),
+                'waiting': self.waiting,
+                'max_size': self.max_size,
+                'created_total': self.created_total,
+                'closed_total': self.closed_total,
+                'timeouts_total': self.timeouts_total,
+                'failed_checks_total': self.failed_checks_total,
+                'wait_seconds_total': self.wait_seconds_total,
+            }
+
+
+_pools: Dict[Tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key: Tuple, factory: Callable[[], ConnectionPool]) -> ConnectionPool:
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = factory()
+    return pool
+
+
+def pool_stats() -> List[Tuple[str, Dict[str, float]]]:
+    """(database alias, stats) for every pool this process has opened."""
+    return sorted(((key[0], pool.stats()) for key, pool in list(_pools.items())), key=lambda item: item[0])
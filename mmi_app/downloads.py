@@ -0,0 +1,149 @@
+"""
+Serving stored files (course resources) to signed-in users.
+
+With RESOURCE_SENDFILE set, Django only checks access and the front proxy
+sends the bytes: 'nginx' answers with X-Accel-Redirect to an internal
+location, e.g.
+
+    location /protected-media/ { internal; alias /srv/mmi/media/; }
+
+and 'apache' answers with X-Sendfile (mod_xsendfile). Both proxies handle
+Range and conditional requests on their own.
+
+Without it the file goes out through FileResponse, which WSGI servers with
+`wsgi.file_wrapper` (gunicorn, uWSGI) send with sendfile(2). Single byte
+ranges, If-Range and ETag / Last-Modified validators are handled here.
+"""
+
+import os
+import re
+from calendar import timegm
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+SENDFILE = getattr(settings, 'RESOURCE_SENDFILE', '')
+ACCEL_PREFIX = getattr(settings, 'RESOURCE_ACCEL_PREFIX', '/protected-media/')
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    The inclusive (first, last) byte positions of a single-range `Range`
+    header, or None to send the whole file (no header, multiple ranges, or
+    syntax this does not handle).
+    """
+    match = _RANGE_RE.match((header or '').replace(' ', ''))
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        # An empty file has no last bytes to send
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - length), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or last < first:
+        raise RangeNotSatisfiable
+    return first, last
+
+
+class _Slice:
+    """`length` bytes of an open file from its current position; keeps fileno() for sendfile."""
+
+    def __init__(self, file, length: int):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size: int = -1) -> bytes:
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self) -> int:
+        return self.file.fileno()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def _validators(storage, name: str):
+    try:
+        size = storage.size(name)
+        modified = storage.get_modified_time(name)
+    except (OSError, NotImplementedError):
+        raise Http404('File not found.')
+    etag = quote_etag(f'{size:x}-{int(modified.timestamp() * 1_000_000):x}')
+    return size, etag, timegm(modified.utctimetuple())
+
+
+def _finish(response, etag: str, last_modified: int):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    # Private data: browsers may keep it but must revalidate, which is a cheap 304
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _if_range_matches(request, etag: str, last_modified: int) -> bool:
+    value = request.headers.get('If-Range')
+    return not value or value == etag or value == http_date(last_modified)
+
+
+def serve_file(request, field_file, as_attachment: bool = False):
+    """Respond with `field_file` (a FieldFile), honouring Range and conditional headers."""
+    if not field_file:
+        raise Http404('No file.')
+    storage, name = field_file.storage, field_file.name
+    size, etag, last_modified = _validators(storage, name)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return _finish(not_modified, etag, last_modified)
+    filename = os.path.basename(name)
+
+    if SENDFILE in ('nginx', 'apache'):
+        response = HttpResponse()
+        # Let the proxy pick the Content-Type from the file
+        del response['Content-Type']
+        if SENDFILE == 'nginx':
+            response['X-Accel-Redirect'] = ACCEL_PREFIX.rstrip('/') + '/' + quote(name)
+        else:
+            response['X-Sendfile'] = storage.path(name)
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        return _finish(response, etag, last_modified)
+
+    byte_range = None
+    if request.method == 'GET' and _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return _finish(response, etag, last_modified)
+
+    file = storage.open(name, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, as_attachment=as_attachment, filename=filename)
+    else:
+        first, last = byte_range
+        file.seek(first)
+        response = FileResponse(_Slice(file, last - first + 1), as_attachment=as_attachment, filename=filename)
+        response.status_code = 206
+        response['Content-Length'] = str(last - first + 1)
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+    return _finish(response, etag, last_modified)
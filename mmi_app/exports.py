@@ -0,0 +1,120 @@
+"""
+Streaming CSV / NDJSON exports of enrollments, bookings and payments.
+
+Rows are read in keyset batches ordered by id (`id > last seen`) rather
+than with one long `iterator()`: PyMySQL buffers a whole result set on the
+client, so a single query over a multi-million row table would not keep
+memory flat. Each batch becomes one chunk of the response, and the header is
+sent before the first query runs.
+"""
+
+import csv
+import io
+import json
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Booking, Enrollment, Payment
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+CHUNK_SIZE = 2000
+
+_STUDENT = [('student_id', 'student_id'), ('student_username', 'student__username'), ('student_email', 'student__email')]
+
+# name -> (model, [(column, lookup)], lookup of the row's course slug); the first column must be the id
+EXPORTS: Dict[str, Tuple[type, List[Tuple[str, str]], str]] = {
+    'enrollments': (Enrollment, [
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        *_STUDENT,
+        ('course_id', 'course_id'),
+        ('course_slug', 'course__slug'),
+        ('course_title', 'course__title'),
+        ('tutor_id', 'course__tutor_id'),
+        ('tutor_username', 'course__tutor__user__username'),
+    ], 'course__slug'),
+    'bookings': (Booking, [
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        *_STUDENT,
+        ('session_id', 'session_id'),
+        ('session_start', 'session__start_time'),
+        ('session_end', 'session__end_time'),
+        ('course_id', 'session__course_id'),
+        ('course_slug', 'session__course__slug'),
+        ('course_title', 'session__course__title'),
+        ('tutor_id', 'session__course__tutor_id'),
+        ('tutor_username', 'session__course__tutor__user__username'),
+    ], 'session__course__slug'),
+    'payments': (Payment, [
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        ('status', 'status'),
+        ('amount_cents', 'amount_cents'),
+        ('currency', 'currency'),
+        ('stripe_payment_intent', 'stripe_payment_intent'),
+        ('enrollment_id', 'enrollment_id'),
+        ('student_id', 'enrollment__student_id'),
+        ('student_username', 'enrollment__student__username'),
+        ('student_email', 'enrollment__student__email'),
+        ('course_id', 'enrollment__course_id'),
+        ('course_slug', 'enrollment__course__slug'),
+        ('course_title', 'enrollment__course__title'),
+        ('tutor_id', 'enrollment__course__tutor_id'),
+        ('tutor_username', 'enrollment__course__tutor__user__username'),
+    ], 'enrollment__course__slug'),
+}
+
+
+def columns(name: str) -> List[str]:
+    return [column for column, _ in EXPORTS[name][1]]
+
+
+def export_queryset(name: str, since=None, until=None, course: Optional[str] = None):
+    """Rows of export `name` as value tuples, created in [since, until) and optionally for one course slug."""
+    model, fields, course_lookup = EXPORTS[name]
+    queryset = model.objects.all()
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+    if course:
+        queryset = queryset.filter(**{course_lookup: course})
+    return queryset.order_by('id').values_list(*[lookup for _, lookup in fields])
+
+
+def batches(queryset, chunk_size: int = CHUNK_SIZE) -> Iterator[list]:
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1][0]
+
+
+def _csv_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def stream(name: str, fmt: str, queryset, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Yield the export as text chunks: the header first, then one chunk per batch."""
+    header = columns(name)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(header)
+        yield buffer.getvalue()
+    for rows in batches(queryset, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        if fmt == 'csv':
+            writer.writerows([_csv_value(v) for v in row] for row in rows)
+        else:
+            for row in rows:
+                buffer.write(json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder))
+                buffer.write('\n')
+        yield buffer.getvalue()
@@ -0,0 +1,136 @@
+"""
+Sparse fieldsets and opt-in expansion for API responses.
+
+`?fields=id,start_time,course.title` picks the keys of each object (dotted
+names reach into related objects) and `?expand=course,course.tutor` nests
+related objects. Once a request uses either parameter, relations that are
+not expanded are rendered as their primary key, so
+`/api/sessions/?fields=id,start_time,end_time` needs no joins at all.
+Without them, payloads are unchanged.
+
+Serializers opt in with `SparseFieldsMixin`; `restrict()` narrows the
+view's queryset to the columns and joins the selection renders.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+MAX_NAMES = 50
+
+
+class Selection:
+    """The keys to render for one object (None for all) and the relations to nest."""
+
+    def __init__(self, path: str = ''):
+        self.path = path
+        self.fields: Optional[Set[str]] = None
+        self.expand: Dict[str, 'Selection'] = {}
+
+    def child(self, name: str) -> 'Selection':
+        if name not in self.expand:
+            self.expand[name] = Selection(f'{self.path}{name}.')
+        return self.expand[name]
+
+
+def _names(value: Optional[str]) -> Optional[List[str]]:
+    if value is None:
+        return None
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    if len(names) > MAX_NAMES:
+        raise serializers.ValidationError(f'At most {MAX_NAMES} names in fields and expand.')
+    return names
+
+
+def parse(query_params) -> Optional[Selection]:
+    """The request's selection; None when it asks for the full payload."""
+    fields = _names(query_params.get('fields'))
+    expand = _names(query_params.get('expand'))
+    if fields is None and expand is None:
+        return None
+    root = Selection()
+    for path in expand or ():
+        node = root
+        for name in path.split('.'):
+            node = node.child(name)
+    if fields is not None:
+        root.fields = set()
+        for path in fields:
+            node = root
+            *parents, name = path.split('.')
+            for parent in parents:
+                node.fields = (node.fields or set()) | {parent}
+                node = node.child(parent)
+            node.fields = (node.fields or set()) | {name}
+    return root
+
+
+def select(fields: Dict[str, serializers.Field], selection: Selection) -> Dict[str, serializers.Field]:
+    """Drop unselected fields and collapse relations that are not expanded to their primary key."""
+    errors = [f'Unknown field: {selection.path}{name}' for name in sorted((selection.fields or set()) - set(fields))]
+    errors += [
+        f'Cannot expand: {selection.path}{name}' for name in sorted(selection.expand)
+        if name in fields and not isinstance(fields[name], serializers.BaseSerializer)
+    ]
+    errors += [f'Unknown field: {selection.path}{name}' for name in sorted(set(selection.expand) - set(fields))]
+    if errors:
+        raise serializers.ValidationError(errors)
+    selected = {}
+    for name, field in fields.items():
+        if selection.fields is not None and name not in selection.fields:
+            continue
+        if isinstance(field, serializers.BaseSerializer):
+            if name in selection.expand:
+                field._selection = selection.expand[name]
+            else:
+                field = serializers.PrimaryKeyRelatedField(read_only=True, source=field.source)
+        selected[name] = field
+    return selected
+
+
+class SparseFieldsMixin:
+    """Applies the `selection` in the serializer context to `get_fields()`."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = getattr(self, '_selection', None) or self.context.get('selection')
+        return fields if selection is None else select(fields, selection)
+
+
+def _is_column(model, name: str) -> bool:
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    return field.concrete and not field.many_to_many
+
+
+def _load(serializer, prefix: str, related: List[str]) -> List[str]:
+    model = serializer.Meta.model
+    paths = []
+    for field in serializer.fields.values():
+        name = '__'.join(field.source_attrs)
+        if isinstance(field, serializers.BaseSerializer):
+            related.append(prefix + name)
+            paths.append(prefix + name)
+            paths += _load(field, f'{prefix}{name}__', related)
+        elif len(field.source_attrs) == 1 and _is_column(model, name):
+            paths.append(prefix + name)
+        else:
+            # Method fields and properties may read any column of the row
+            paths += [prefix + f.name for f in model._meta.concrete_fields]
+    return paths
+
+
+def restrict(queryset, serializer, extra: Iterable[str] = ()):
+    """
+    `only()` the columns `serializer` (built with a selection) renders, plus
+    `extra` (e.g. pagination keys), and join just its expanded relations.
+    """
+    related: List[str] = []
+    paths = _load(serializer, '', related)
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*paths, *extra)
@@ -0,0 +1,270 @@
+"""
+Bulk catalog import for courses, sessions and enrollments.
+
+Rows are streamed from CSV or JSON Lines and written in chunks with
+`bulk_create`, so memory stays flat however large the file is. Tutors and
+courses are resolved through in-memory lookups loaded once per run; students
+are resolved per chunk. Each chunk commits together with its `ImportJob`
+progress row, so an interrupted run resumes after the last committed chunk
+without duplicating rows.
+
+Rows are validated with the models' field validators and the session length
+rules. The per-row tutor conflict and availability checks in
+`scheduling.validate_session` are skipped: they cost several queries a row.
+
+`bulk_create` does not send signals, so each chunk bumps the dashboard
+counters and invalidates the page cache and search index itself.
+"""
+
+import csv
+import json
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters
+from .caching import invalidate_page_groups
+from .models import Course, Enrollment, ImportJob, Session, Tutor
+from .scheduling import MAX_SESSION_LENGTH, validate_interval
+from .search import course_search_index
+
+Row = Tuple[int, dict]
+
+
+def read_rows(stream, fmt: str) -> Iterator[Row]:
+    """Yield (record number, row dict) pairs; record numbers start at 1."""
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), start=1):
+            yield number, row
+        return
+    number = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            row = {'__error__': f'Invalid JSON: {exc}'}
+        yield number, row if isinstance(row, dict) else {'__error__': 'Expected a JSON object.'}
+
+
+def _text(row: dict, name: str, required: bool = True) -> str:
+    value = row.get(name)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise ValidationError({name: 'This field is required.'})
+    return value
+
+
+def _bool(row: dict, name: str, default: bool) -> bool:
+    value = row.get(name)
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in ('1', 'true', 't', 'yes', 'y'):
+        return True
+    if value in ('0', 'false', 'f', 'no', 'n'):
+        return False
+    raise ValidationError({name: f'"{value}" is not a boolean.'})
+
+
+def _aware(instance, *names: str) -> None:
+    for name in names:
+        value = getattr(instance, name)
+        if timezone.is_naive(value):
+            setattr(instance, name, timezone.make_aware(value))
+
+
+class Importer:
+    model = None
+    counter = ''
+    fk_fields: Tuple[str, ...] = ()
+
+    def resolve(self, rows: List[Row]) -> None:
+        """Load per-chunk lookups before the chunk's rows are built."""
+
+    def build(self, row: dict):
+        raise NotImplementedError
+
+    def validate(self, instance) -> None:
+        # FK ids come from the lookups, so skip the per-row existence queries
+        instance.clean_fields(exclude=self.fk_fields)
+
+    def write(self, objs: list) -> int:
+        self.model.objects.bulk_create(objs)
+        return len(objs)
+
+    def invalidate(self, objs: list) -> None:
+        pass
+
+
+class CourseImporter(Importer):
+    """Columns: title, slug, description, tutor (username), price_cents, is_active."""
+    model = Course
+    counter = 'courses'
+    fk_fields = ('tutor',)
+
+    def __init__(self):
+        self.tutors = dict(Tutor.objects.values_list('user__username', 'id'))
+        self.slugs = set(Course.objects.values_list('slug', flat=True).iterator(chunk_size=5000))
+
+    def build(self, row: dict) -> Course:
+        tutor = _text(row, 'tutor')
+        if tutor not in self.tutors:
+            raise ValidationError({'tutor': f'Unknown tutor "{tutor}".'})
+        course = Course(
+            title=_text(row, 'title'),
+            slug=_text(row, 'slug'),
+            description=_text(row, 'description', required=False),
+            tutor_id=self.tutors[tutor],
+            price_cents=_text(row, 'price_cents', required=False) or 0,
+            is_active=_bool(row, 'is_active', True),
+        )
+        self.validate(course)
+        if course.slug in self.slugs:
+            raise ValidationError({'slug': f'A course with slug "{course.slug}" already exists.'})
+        self.slugs.add(course.slug)
+        return course
+
+    def invalidate(self, objs: list) -> None:
+        invalidate_page_groups('courses', 'tutors', *[f'course:{c.slug}' for c in objs])
+        course_search_index.invalidate()
+
+
+class SessionImporter(Importer):
+    """Columns: course (slug), start_time, end_time, capacity."""
+    model = Session
+    counter = 'sessions'
+    fk_fields = ('course',)
+
+    def __init__(self):
+        self.courses = dict(Course.objects.values_list('slug', 'id').iterator(chunk_size=5000))
+        self.slug_of = {pk: slug for slug, pk in self.courses.items()}
+
+    def build(self, row: dict) -> Session:
+        slug = _text(row, 'course')
+        if slug not in self.courses:
+            raise ValidationError({'course': f'Unknown course "{slug}".'})
+        session = Session(
+            course_id=self.courses[slug],
+            start_time=_text(row, 'start_time'),
+            end_time=_text(row, 'end_time'),
+            capacity=_text(row, 'capacity', required=False) or 1,
+        )
+        self.validate(session)
+        _aware(session, 'start_time', 'end_time')
+        validate_interval(session.start_time, session.end_time, MAX_SESSION_LENGTH)
+        return session
+
+    def invalidate(self, objs: list) -> None:
+        invalidate_page_groups(*{f'course:{self.slug_of[s.course_id]}' for s in objs})
+
+
+class EnrollmentImporter(Importer):
+    """Columns: student (username), course (slug). Existing enrollments are skipped."""
+    model = Enrollment
+    counter = 'enrollments'
+    fk_fields = ('student', 'course')
+
+    def __init__(self):
+        self.courses = dict(Course.objects.values_list('slug', 'id').iterator(chunk_size=5000))
+        self.students: Dict[str, int] = {}
+
+    def resolve(self, rows: List[Row]) -> None:
+        usernames = {str(row.get('student') or '').strip() for _, row in rows}
+        self.students = dict(
+            get_user_model().objects.filter(username__in=usernames).values_list('username', 'id')
+        )
+
+    def build(self, row: dict) -> Enrollment:
+        student, slug = _text(row, 'student'), _text(row, 'course')
+        if student not in self.students:
+            raise ValidationError({'student': f'Unknown user "{student}".'})
+        if slug not in self.courses:
+            raise ValidationError({'course': f'Unknown course "{slug}".'})
+        return Enrollment(student_id=self.students[student], course_id=self.courses[slug])
+
+    def write(self, objs: list) -> int:
+        pairs = {(e.student_id, e.course_id): e for e in objs}
+        existing = Enrollment.objects.filter(
+            student_id__in={s for s, _ in pairs}, course_id__in={c for _, c in pairs}
+        ).values_list('student_id', 'course_id')
+        for pair in existing:
+            pairs.pop(pair, None)
+        # ignore_conflicts covers enrollments created concurrently since the check
+        Enrollment.objects.bulk_create(pairs.values(), ignore_conflicts=True)
+        return len(pairs)
+
+
+IMPORTERS: Dict[str, Callable[[], Importer]] = {
+    'courses': CourseImporter,
+    'sessions': SessionImporter,
+    'enrollments': EnrollmentImporter,
+}
+
+
+class TooManyErrors(Exception):
+    pass
+
+
+def _chunks(rows: Iterable[Row], size: int) -> Iterator[List[Row]]:
+    chunk: List[Row] = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_import(
+    job: ImportJob,
+    rows: Iterable[Row],
+    chunk_size: int = 1000,
+    max_errors: Optional[int] = 100,
+    on_error: Callable[[int, str], None] = lambda number, message: None,
+    on_chunk: Callable[[ImportJob, float], None] = lambda job, rate: None,
+) -> ImportJob:
+    """
+    Import `rows` into `job.kind`, skipping the `job.rows_done` records already
+    committed. Raises TooManyErrors once more than `max_errors` rows are rejected.
+    """
+    importer = IMPORTERS[job.kind]()
+    started, done_at_start = time.monotonic(), job.rows_done
+    remaining = ((number, row) for number, row in rows if number > done_at_start)
+    for chunk in _chunks(remaining, chunk_size):
+        importer.resolve(chunk)
+        objs = []
+        rejected = 0
+        for number, row in chunk:
+            try:
+                if '__error__' in row:
+                    raise ValidationError(row['__error__'])
+                objs.append(importer.build(row))
+            except ValidationError as exc:
+                rejected += 1
+                on_error(number, '; '.join(exc.messages))
+        if max_errors is not None and job.rows_rejected + rejected > max_errors:
+            raise TooManyErrors(f'More than {max_errors} rows rejected; stopped after record {job.rows_done}.')
+        with transaction.atomic():
+            created = importer.write(objs) if objs else 0
+            job.rows_done = chunk[-1][0]
+            job.rows_created += created
+            job.rows_rejected += rejected
+            job.save(update_fields=['rows_done', 'rows_created', 'rows_rejected', 'updated_at'])
+            if created:
+                counters.bump(importer.counter, created)
+            transaction.on_commit(lambda objs=objs: importer.invalidate(objs))
+        elapsed = time.monotonic() - started
+        on_chunk(job, (job.rows_done - done_at_start) / elapsed if elapsed else 0.0)
+    job.finished = True
+    job.save(update_fields=['finished', 'updated_at'])
+    return job
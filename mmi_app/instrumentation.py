@@ -0,0 +1,258 @@
+"""
+Per-request performance metrics.
+
+`RequestMetricsMiddleware` times a sample of requests (METRICS_SAMPLE_RATE):
+total latency, SQL query count and time on every database alias, and
+template render time via the `TimedDjangoTemplates` backend. Sampled
+responses get a Server-Timing header, and the numbers are aggregated per
+resolved view name into histograms that `/metrics` serves in the Prometheus
+text format. Requests that are not sampled skip everything but one random()
+call and one context lookup per query. The middleware runs in both sync
+and async mode, so it does not force the stack under ASGI (and async views
+such as checkout) onto a thread. Queries are timed by a wrapper that every
+database connection gets when it is opened, since connections belong to
+the thread that runs the ORM rather than to the request.
+
+The aggregates live in process memory, so each worker reports its own
+numbers; Prometheus sums them across scrape targets.
+"""
+
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+SAMPLE_RATE = float(getattr(settings, 'METRICS_SAMPLE_RATE', 1.0))
+SERVER_TIMING = getattr(settings, 'METRICS_SERVER_TIMING', True)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_seconds', 'template_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar('mmi_request_stats', default=None)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class ViewMetrics:
+    __slots__ = ('latency', 'db', 'queries', 'template_seconds', 'statuses')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.db = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.template_seconds = 0.0
+        self.statuses: Dict[str, int] = {}
+
+
+_views: Dict[Tuple[str, str], ViewMetrics] = {}
+_lock = threading.Lock()
+
+
+def record(view: str, method: str, status: int, latency: float, stats: RequestStats) -> None:
+    with _lock:
+        metrics = _views.get((view, method))
+        if metrics is None:
+            metrics = _views[(view, method)] = ViewMetrics()
+        metrics.latency.observe(latency)
+        metrics.db.observe(stats.db_seconds)
+        metrics.queries.observe(stats.queries)
+        metrics.template_seconds += stats.template_seconds
+        status_class = f'{status // 100}xx'
+        metrics.statuses[status_class] = metrics.statuses.get(status_class, 0) + 1
+
+
+def reset() -> None:
+    with _lock:
+        _views.clear()
+
+
+def _sql_timer(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_seconds += time.perf_counter() - started
+        stats.queries += 1
+
+
+@receiver(connection_created)
+def install_sql_timer(sender, connection, **kwargs):
+    if _sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _sql_timer)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render time added to the sampled request's stats."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+def _server_timing(stats: RequestStats, latency: float) -> str:
+    return (
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", '
+        f'tpl;dur={stats.template_seconds * 1000:.1f}, '
+        f'total;dur={latency * 1000:.1f}'
+    )
+
+
+def _sampled() -> bool:
+    return SAMPLE_RATE > 0 and (SAMPLE_RATE >= 1 or random.random() < SAMPLE_RATE)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not _sampled():
+            return self.get_response(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        if not _sampled():
+            return await self.get_response(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, started)
+
+    def _finish(self, request, response, stats: RequestStats, started: float):
+        latency = time.perf_counter() - started
+        match = request.resolver_match
+        record(match.view_name if match else '<unresolved>', request.method, response.status_code, latency, stats)
+        if SERVER_TIMING:
+            response['Server-Timing'] = _server_timing(stats, latency)
+        return response
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _histogram_lines(name: str, histogram: Histogram, **labels) -> List[str]:
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {cumulative}')
+    lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {histogram.count}')
+    lines.append(f'{name}_sum{_labels(**labels)} {histogram.total}')
+    lines.append(f'{name}_count{_labels(**labels)} {histogram.count}')
+    return lines
+
+
+def render_prometheus(extra: Optional[Dict[str, Tuple[str, str, object]]] = None) -> str:
+    """
+    This process' metrics in the Prometheus text format. `extra` maps metric
+    names to (type, help, value) for gauges and counters owned elsewhere;
+    value may also be a dict of per-database values, labelled `database`.
+    """
+    with _lock:
+        views = sorted(_views.items())
+        sections = {
+            'mmi_request_duration_seconds': ('histogram', 'Request latency of sampled requests.', []),
+            'mmi_request_db_seconds': ('histogram', 'SQL time per sampled request.', []),
+            'mmi_request_queries': ('histogram', 'SQL queries per sampled request.', []),
+            'mmi_request_template_seconds_total': ('counter', 'Template render time of sampled requests.', []),
+            'mmi_requests_sampled_total': ('counter', 'Sampled requests by status class.', []),
+        }
+        for (view, method), m in views:
+            sections['mmi_request_duration_seconds'][2].extend(
+                _histogram_lines('mmi_request_duration_seconds', m.latency, view=view, method=method))
+            sections['mmi_request_db_seconds'][2].extend(
+                _histogram_lines('mmi_request_db_seconds', m.db, view=view, method=method))
+            sections['mmi_request_queries'][2].extend(
+                _histogram_lines('mmi_request_queries', m.queries, view=view, method=method))
+            sections['mmi_request_template_seconds_total'][2].append(
+                f'mmi_request_template_seconds_total{_labels(view=view, method=method)} {m.template_seconds}')
+            for status, count in sorted(m.statuses.items()):
+                sections['mmi_requests_sampled_total'][2].append(
+                    f'mmi_requests_sampled_total{_labels(view=view, method=method, status=status)} {count}')
+    lines = [
+        '# HELP mmi_metrics_sample_rate Fraction of requests that are timed.',
+        '# TYPE mmi_metrics_sample_rate gauge',
+        f'mmi_metrics_sample_rate {SAMPLE_RATE}',
+    ]
+    for name, (kind, help_text, values) in sections.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', *values]
+    for name, (kind, help_text, value) in sorted((extra or {}).items()):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        if isinstance(value, dict):
+            lines += [f'{name}{_labels(database=alias)} {v}' for alias, v in sorted(value.items())]
+        else:
+            lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
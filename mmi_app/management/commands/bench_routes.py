@@ -0,0 +1,70 @@
+import json
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from mmi_app import benchmarks
+from mmi_app.models import Booking, Course, Enrollment, Session
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+class Command(BaseCommand):
+    help = 'Request every route against the current (seeded) data and check SQL query budgets and latency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Requests per route; the first one is the cold run.')
+        parser.add_argument('--only', nargs='+', metavar='ROUTE', help='Only these route names.')
+        parser.add_argument('--output', '-o', help='Write the results as JSON to this file.')
+        parser.add_argument('--compare', metavar='FILE', help='Earlier --output file to compare p50 latency and queries against.')
+        parser.add_argument('--tolerance', type=float, default=25.0, help='Percent p50 slowdown reported as a regression.')
+
+    def handle(self, *args, **options):
+        try:
+            results = benchmarks.run(repeat=options['repeat'], only=options['only'])
+        except LookupError as exc:
+            raise CommandError(str(exc))
+        baseline = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = {r['name']: r for r in json.load(f)['routes']}
+
+        self.stdout.write(f"{'route':<24} {'status':>6} {'queries':>9} {'cold ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+        failures, regressions = [], []
+        for r in results:
+            line = f"{r['name']:<24} {r['status']:>6} {r['queries']:>4}/{r['budget']:<4} {r['cold_ms']:>9.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f}"
+            before = baseline.get(r['name'])
+            if before:
+                change = (r['p50_ms'] / before['p50_ms'] - 1) * 100 if before['p50_ms'] else 0.0
+                line += f'  {change:+.0f}%'
+                if change > options['tolerance'] or r['queries'] > before['queries']:
+                    regressions.append(r['name'])
+            if not (r['status_ok'] and r['within_budget']):
+                failures.append(r['name'])
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+
+        if options['output']:
+            report = {
+                'created': timezone.now().isoformat(),
+                'commit': _git_commit(),
+                'database': connection.vendor,
+                'repeat': options['repeat'],
+                'rows': {model._meta.model_name: model.objects.count() for model in (Course, Session, Booking, Enrollment)},
+                'routes': results,
+            }
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+        if regressions:
+            self.stdout.write(self.style.WARNING(f"Slower than {options['compare']}: {', '.join(regressions)}"))
+        if failures:
+            raise CommandError(f"Over budget or unexpected status: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS(f'{len(results)} routes within budget.'))
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from mmi_app.models import Course, Session, Tutor
+from mmi_app.serializers import CourseValuesReader, SessionValuesReader, TutorValuesReader
+
+TARGETS = {
+    'sessions': (Session.objects.select_related('course__tutor__user').order_by('start_time', 'id'), SessionValuesReader),
+    'courses': (Course.objects.select_related('tutor__user').order_by('id'), CourseValuesReader),
+    'tutors': (Tutor.objects.select_related('user').order_by('id'), TutorValuesReader),
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/sec of the nested API serializers against the .values() fast path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', nargs='?', default='sessions', choices=sorted(TARGETS))
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per run.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per path; the best run is reported.')
+
+    def handle(self, *args, **options):
+        queryset, reader_class = TARGETS[options['target']]
+        queryset = queryset[:options['rows']]
+        reader = reader_class()
+        renderer = JSONRenderer()
+
+        def serializer_path():
+            return renderer.render(reader.serializer_class(list(queryset), many=True).data)
+
+        def reader_path():
+            return renderer.render(reader.many(reader.values(queryset)))
+
+        expected = serializer_path()
+        if not expected or expected == b'[]':
+            raise CommandError('No rows to benchmark; seed some data first.')
+        if reader_path() != expected:
+            raise CommandError('Fast path output differs from the serializer output.')
+
+        rows = len(reader.values(queryset))
+        results = {}
+        for label, run in (('serializer', serializer_path), ('values', reader_path)):
+            best = None
+            for _ in range(max(1, options['repeat'])):
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            results[label] = rows / best if best else float('inf')
+            self.stdout.write(f"{label:<10} {rows} rows  {best * 1000:8.2f} ms  {results[label]:12.0f} rows/s")
+        self.stdout.write(self.style.SUCCESS(f"speedup x{results['values'] / results['serializer']:.1f}"))
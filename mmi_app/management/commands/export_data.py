@@ -0,0 +1,43 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from mmi_app import exports
+
+
+class Command(BaseCommand):
+    help = 'Stream enrollments, bookings or payments with their course, student and tutor fields as CSV or NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(exports.EXPORTS))
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--since', help='Only rows created at or after this ISO 8601 datetime.')
+        parser.add_argument('--until', help='Only rows created before this ISO 8601 datetime.')
+        parser.add_argument('--course', help='Only rows for this course slug.')
+        parser.add_argument('--output', '-o', help='File to write (default: stdout).')
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE)
+
+    def _datetime(self, options, name):
+        if not options[name]:
+            return None
+        value = parse_datetime(options[name])
+        if value is None:
+            raise CommandError(f'--{name} expects an ISO 8601 datetime.')
+        return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+    def handle(self, *args, **options):
+        queryset = exports.export_queryset(
+            options['name'],
+            since=self._datetime(options, 'since'),
+            until=self._datetime(options, 'until'),
+            course=options['course'],
+        )
+        out = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for chunk in exports.stream(options['name'], options['format'], queryset, max(1, options['chunk_size'])):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
@@ -0,0 +1,67 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mmi_app.importers import IMPORTERS, TooManyErrors, read_rows, run_import
+from mmi_app.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = 'Stream courses, sessions or enrollments from a CSV or JSON Lines file into the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path', help='File to import, or - for stdin.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--max-errors', type=int, default=100, help='Abort after this many rejected rows (-1: never).')
+        parser.add_argument('--job', help='Progress record name (default: kind and absolute path).')
+        parser.add_argument('--resume', action='store_true', help='Continue an interrupted run of the same job.')
+        parser.add_argument('--restart', action='store_true', help='Forget earlier progress and start from the first row.')
+
+    def handle(self, *args, **options):
+        kind, path = options['kind'], options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        name = options['job'] or f"{kind}:{path if path == '-' else os.path.abspath(path)}"
+        job, created = ImportJob.objects.get_or_create(name=name, defaults={'kind': kind, 'source': path})
+        if job.kind != kind:
+            raise CommandError(f'Job "{name}" imports {job.kind}, not {kind}.')
+        if not created and options['restart']:
+            job.rows_done = job.rows_created = job.rows_rejected = 0
+            job.finished = False
+            job.save()
+        elif not created and job.finished:
+            raise CommandError(f'Job "{name}" already finished; use --restart to import the file again.')
+        elif not created and job.rows_done and not options['resume']:
+            raise CommandError(
+                f'Job "{name}" stopped after record {job.rows_done}; use --resume to continue or --restart.'
+            )
+        if job.rows_done:
+            self.stdout.write(f'Resuming after record {job.rows_done}.')
+
+        max_errors = None if options['max_errors'] < 0 else options['max_errors']
+
+        def on_error(number, message):
+            self.stderr.write(f'record {number}: {message}')
+
+        def on_chunk(job, rate):
+            self.stdout.write(
+                f'{job.rows_done:>10} records  {job.rows_created:>10} created  '
+                f'{job.rows_rejected:>6} rejected  {rate:>9.0f} rows/s'
+            )
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        try:
+            run_import(
+                job, read_rows(stream, fmt), chunk_size=max(1, options['chunk_size']),
+                max_errors=max_errors, on_error=on_error, on_chunk=on_chunk,
+            )
+        except TooManyErrors as exc:
+            raise CommandError(f'{exc} Fix the file and rerun with --resume.')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {job.rows_created} {kind} ({job.rows_rejected} rejected) from {job.rows_done} records.'
+        ))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mmi_app import avatars
+from mmi_app.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Render resized JPEG/WebP variants for new and existing profile avatars.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--rebuild', action='store_true', help='Re-render every avatar, e.g. after AVATAR_SIZES changes.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new uploads instead of exiting.')
+        parser.add_argument('--idle-sleep', type=float, default=5.0, help='Seconds to wait between polls when idle.')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        if options['rebuild']:
+            UserProfile.objects.update(avatar_processed='')
+        while True:
+            started = time.perf_counter()
+            done = 0
+            while True:
+                batch = list(avatars.pending_profiles().order_by('id')[:batch_size])
+                if not batch:
+                    break
+                for profile in batch:
+                    done += avatars.process_profile(profile)
+            if done or not options['loop']:
+                self.stdout.write(f'Processed {done} avatar(s) in {time.perf_counter() - started:.2f}s.')
+            if not options['loop']:
+                return
+            if not done:
+                time.sleep(options['idle_sleep'])
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mmi_app import admission
+
+
+class Command(BaseCommand):
+    help = 'Admit queued booking requests in arrival order (BOOKING_QUEUE mode).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting once the queue is empty.')
+        parser.add_argument('--idle-sleep', type=float, default=0.2, help='Seconds to wait between polls when idle.')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        while True:
+            started = time.perf_counter()
+            totals = {}
+            while True:
+                outcome = admission.process_batch(batch_size)
+                if not outcome:
+                    break
+                for status, n in outcome.items():
+                    totals[status] = totals.get(status, 0) + n
+            elapsed = time.perf_counter() - started
+            done = sum(totals.values())
+            if done or not options['loop']:
+                stats = admission.queue_stats()
+                rate = done / elapsed if elapsed else 0.0
+                summary = ', '.join(f'{n} {status}' for status, n in sorted(totals.items())) or 'nothing to do'
+                self.stdout.write(f"{summary} in {elapsed:.2f}s ({rate:.0f} requests/s); pending {stats['pending']}")
+            if not options['loop']:
+                return
+            if not done:
+                time.sleep(options['idle_sleep'])
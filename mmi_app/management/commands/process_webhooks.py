@@ -0,0 +1,55 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from mmi_app import webhooks
+
+
+class Command(BaseCommand):
+    help = 'Drain queued Stripe webhook events into Payment rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=1, help='Worker threads, each claiming its own batches.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting once the queue is empty.')
+        parser.add_argument('--idle-sleep', type=float, default=1.0, help='Seconds to wait between polls when idle.')
+
+    def _drain(self, batch_size):
+        totals = {}
+        try:
+            while True:
+                outcome = webhooks.process_batch(batch_size)
+                if not outcome:
+                    return totals
+                for status, n in outcome.items():
+                    totals[status] = totals.get(status, 0) + n
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        concurrency = max(1, options['concurrency'])
+        while True:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(self._drain, [batch_size] * concurrency))
+            elapsed = time.perf_counter() - started
+            totals = {}
+            for result in results:
+                for status, n in result.items():
+                    totals[status] = totals.get(status, 0) + n
+            done = sum(totals.values())
+            stats = webhooks.queue_stats()
+            if done or not options['loop']:
+                rate = done / elapsed if elapsed else 0.0
+                summary = ', '.join(f'{n} {status}' for status, n in sorted(totals.items())) or 'nothing to do'
+                self.stdout.write(
+                    f"{summary} in {elapsed:.2f}s ({rate:.0f} events/s); "
+                    f"pending {stats['pending']}, failed {stats['failed']}, lag {stats['lag_seconds']:.1f}s"
+                )
+            if not options['loop']:
+                return
+            if not done:
+                time.sleep(options['idle_sleep'])
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mmi_app import counters
+
+
+class Command(BaseCommand):
+    help = 'Recount the admin dashboard metric counters from their source tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Metrics to repair (default: all).')
+
+    def handle(self, *args, **options):
+        names = options['names'] or list(counters.tracked_models())
+        unknown = set(names) - set(counters.tracked_models())
+        if unknown:
+            raise CommandError(f"Unknown metric(s): {', '.join(sorted(unknown))}")
+        before = counters.read_counters()
+        for name in names:
+            actual = counters.reconcile(name)
+            drift = before[name] - actual
+            self.stdout.write(f"{name:<12} {actual:>10}  (drift {drift:+d})")
+        self.stdout.write(self.style.SUCCESS('Counters reconciled.'))
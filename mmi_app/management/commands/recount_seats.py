@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from mmi_app.seats import drifted_session_ids, recount_booked_seats
+
+
+class Command(BaseCommand):
+    help = 'Recompute Session.booked_count for sessions whose counter has drifted from their bookings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report drifted sessions.')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        drifted = drifted_session_ids()
+        if options['dry_run']:
+            self.stdout.write(f"{len(drifted)} session(s) have drifted counters.")
+            return
+        fixed = 0
+        for start in range(0, len(drifted), batch_size):
+            fixed += recount_booked_seats(drifted[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f"Recounted {fixed} session(s)."))
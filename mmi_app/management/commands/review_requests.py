@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from mmi_app import approvals
+from mmi_app.models import ActionRequest
+
+
+class Command(BaseCommand):
+    help = 'Approve or reject pending action requests in chunked transactions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('decision', choices=['approve', 'reject'])
+        parser.add_argument('ids', nargs='*', type=int, help='Request ids (default: every pending request).')
+        parser.add_argument('--reviewer', required=True, help='Username recorded as the reviewer.')
+        parser.add_argument('--type', dest='request_type', help='Only requests of this type.')
+        parser.add_argument('--chunk-size', type=int, default=approvals.DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            reviewer = get_user_model().objects.get(username=options['reviewer'], is_staff=True)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No staff user named {options['reviewer']!r}.")
+        requests = ActionRequest.objects.all()
+        if options['ids']:
+            requests = requests.filter(id__in=options['ids'])
+        if options['request_type']:
+            requests = requests.filter(request_type=options['request_type'])
+        review = approvals.approve_requests if options['decision'] == 'approve' else approvals.reject_requests
+        result = review(requests, reviewer, chunk_size=options['chunk_size'])
+        for pk, reason in result.failed.items():
+            self.stderr.write(f"#{pk}: {reason}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Approved' if options['decision'] == 'approve' else 'Rejected'} {len(result.processed)} request(s); "
+            f"{len(result.skipped)} skipped, {len(result.failed)} failed."
+        ))
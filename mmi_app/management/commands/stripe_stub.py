@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from mmi_app.stripe_stub import StripeStubServer
+
+
+class Command(BaseCommand):
+    help = 'Run a local Stripe stand-in server (point STRIPE_API_BASE at it).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=12111)
+        parser.add_argument('--latency-ms', type=int, default=0, help='Delay added to every API call.')
+
+    def handle(self, *args, **options):
+        server = StripeStubServer(options['host'], options['port'], latency=options['latency_ms'] / 1000, verbose=True)
+        self.stdout.write(f"Stripe stub listening on {server.base_url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.2 on 2025-11-12 10:04
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_booked_count(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Session = apps.get_model('mmi_app', 'Session')
+    Booking = apps.get_model('mmi_app', 'Booking')
+    bookings = (
+        Booking.objects.filter(session=OuterRef('pk'))
+        .order_by()
+        .values('session')
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    Session.objects.using(db).update(booked_count=Coalesce(Subquery(bookings, output_field=IntegerField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mmi_app', '0002_actionrequest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='booked_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_booked_count, migrations.RunPython.noop),
+    ]
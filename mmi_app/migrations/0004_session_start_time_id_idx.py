@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2025-11-12 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mmi_app', '0003_session_booked_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['start_time', 'id'], name='mmi_app_ses_start_t_9b1cb5_idx'),
+        ),
+    ]
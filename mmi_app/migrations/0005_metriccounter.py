@@ -0,0 +1,47 @@
+# Generated by Django 5.1.2 on 2025-11-14 09:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+COUNTED_MODELS = {
+    'users': settings.AUTH_USER_MODEL,
+    'tutors': 'mmi_app.Tutor',
+    'courses': 'mmi_app.Course',
+    'sessions': 'mmi_app.Session',
+    'enrollments': 'mmi_app.Enrollment',
+    'bookings': 'mmi_app.Booking',
+    'payments': 'mmi_app.Payment',
+}
+
+
+def seed_counters(apps, schema_editor):
+    db = schema_editor.connection.alias
+    MetricCounter = apps.get_model('mmi_app', 'MetricCounter')
+    MetricCounter.objects.using(db).bulk_create([
+        MetricCounter(name=name, shard=0, value=apps.get_model(label).objects.using(db).count())
+        for name, label in COUNTED_MODELS.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mmi_app', '0004_session_start_time_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32)),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('name', 'shard')},
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
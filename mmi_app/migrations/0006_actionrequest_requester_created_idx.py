@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2025-11-14 15:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mmi_app', '0005_metriccounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='actionrequest',
+            index=models.Index(fields=['requested_by', 'created_at'], name='mmi_app_act_request_2319c1_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2025-11-17 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mmi_app', '0006_actionrequest_requester_created_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='actionrequest',
+            name='booking',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='action_requests', to='mmi_app.booking'),
+        ),
+    ]
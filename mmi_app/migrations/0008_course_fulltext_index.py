@@ -0,0 +1,27 @@
+from django.db import migrations
+
+INDEX_NAME = 'mmi_app_course_fulltext'
+
+
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        # Other backends use the in-process index in mmi_app.search
+        return
+    schema_editor.execute(f'CREATE FULLTEXT INDEX {INDEX_NAME} ON mmi_app_course (title, description)')
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(f'DROP INDEX {INDEX_NAME} ON mmi_app_course')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mmi_app', '0007_actionrequest_booking_set_null'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
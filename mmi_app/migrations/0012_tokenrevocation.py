@@ -0,0 +1,21 @@
+# Generated by Django 5.1.2 on 2025-11-26 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mmi_app', '0011_userprofile_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenRevocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.PositiveIntegerField(unique=True)),
+                ('revoked_at', models.DateTimeField()),
+            ],
+        ),
+    ]
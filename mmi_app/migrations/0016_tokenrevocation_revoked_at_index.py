@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2025-12-02 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mmi_app', '0015_webhookevent_next_attempt_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tokenrevocation',
+            name='revoked_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
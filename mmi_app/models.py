@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class Role(models.Model):
@@ -13,6 +14,10 @@ class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     roles = models.ManyToManyField(Role, related_name='users')
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    # Resized copies written by `process_avatars`: {'<size>.<format>': storage name}
+    avatar_variants = models.JSONField(default=dict, blank=True)
+    # The avatar name the variants were rendered from; differs from `avatar` while pending
+    avatar_processed = models.CharField(max_length=100, blank=True)
     bio = models.TextField(blank=True)
     phone = models.CharField(max_length=20, blank=True)
 
@@ -23,6 +28,8 @@ class UserProfile(models.Model):
 class Tutor(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='tutor')
     bio = models.TextField(blank=True)
+    # Change stamps for conditional GET (mmi_app.conditional); also bumped when the user's name changes
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self) -> str:
         return self.user.get_full_name() or self.user.username
@@ -35,6 +42,7 @@ class Course(models.Model):
     tutor = models.ForeignKey(Tutor, on_delete=models.PROTECT, related_name='courses')
     price_cents = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self) -> str:
         return self.title
@@ -45,15 +53,24 @@ class Session(models.Model):
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
     capacity = models.PositiveIntegerField(default=1)
+    # Denormalized count of bookings; maintained by mmi_app.seats
+    booked_count = models.PositiveIntegerField(default=0)
+    # Seat counter UPDATEs in mmi_app.seats bump this too
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         indexes = [
             models.Index(fields=['course', 'start_time']),
+            models.Index(fields=['start_time', 'id']),
         ]
 
     def __str__(self) -> str:
         return f"{self.course.title} @ {self.start_time}"
 
+    def clean(self):
+        from .scheduling import validate_session
+        validate_session(self)
+
 
 class Availability(models.Model):
     tutor = models.ForeignKey(Tutor, on_delete=models.CASCADE, related_name='availability')
@@ -65,6 +82,10 @@ class Availability(models.Model):
             models.Index(fields=['tutor', 'start_time']),
         ]
 
+    def clean(self):
+        from .scheduling import MAX_AVAILABILITY_LENGTH, validate_interval
+        validate_interval(self.start_time, self.end_time, MAX_AVAILABILITY_LENGTH)
+
 
 class Enrollment(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='enrollments')
@@ -84,11 +105,40 @@ class Booking(models.Model):
         unique_together = ('student', 'session')
 
 
+class BookingRequest(models.Model):
+    """A queued booking (BOOKING_QUEUE mode); `process_booking_queue` admits them in id order."""
+    STATUS_PENDING = 'pending'
+    STATUS_BOOKED = 'booked'
+    STATUS_FULL = 'full'
+    STATUS_ALREADY_BOOKED = 'already_booked'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_BOOKED, 'Booked'),
+        (STATUS_FULL, 'Session full'),
+        (STATUS_ALREADY_BOOKED, 'Already booked'),
+    ]
+
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='booking_requests')
+    session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='booking_requests')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.student_id} -> session {self.session_id} ({self.status})"
+
+
 class Resource(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='resources')
     title = models.CharField(max_length=200)
     file = models.FileField(upload_to='resources/', blank=True)
     url = models.URLField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
 
 class Payment(models.Model):
@@ -125,7 +175,8 @@ class ActionRequest(models.Model):
 
     request_type = models.CharField(max_length=64, choices=REQUEST_TYPES)
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
-    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, null=True, blank=True, related_name='action_requests')
+    # SET_NULL keeps the request (and its review outcome) after the booking is cancelled
+    booking = models.ForeignKey(Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name='action_requests')
     requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='action_requests')
     reviewed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='action_reviews')
     review_comment = models.TextField(blank=True)
@@ -135,7 +186,97 @@ class ActionRequest(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['status', 'request_type']),
+            models.Index(fields=['requested_by', 'created_at']),
+        ]
+
+
+class MetricCounter(models.Model):
+    """
+    Running row counts for the admin dashboard, maintained by mmi_app.counters.
+    Each metric is spread over a few shard rows so concurrent writers do not
+    queue on a single hot row; the metric's value is the sum of its shards.
+    """
+    name = models.CharField(max_length=32)
+    shard = models.PositiveSmallIntegerField(default=0)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('name', 'shard')
+
+    def __str__(self) -> str:
+        return f"{self.name}[{self.shard}] = {self.value}"
+
+
+class WebhookEvent(models.Model):
+    """Raw Stripe webhook deliveries, queued for the process_webhooks worker."""
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSED = 'processed'
+    STATUS_IGNORED = 'ignored'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSED, 'Processed'),
+        (STATUS_IGNORED, 'Ignored'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=128)
+    payload = models.TextField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    # Failed attempts are retried with exponential backoff from here
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id']),
         ]
 
+    def __str__(self) -> str:
+        return f"{self.event_type} {self.event_id} ({self.status})"
+
+
+class ImportJob(models.Model):
+    """Progress of an `import_catalog` run, committed with each chunk so runs can resume."""
+    name = models.CharField(max_length=200, unique=True)
+    kind = models.CharField(max_length=32)
+    source = models.CharField(max_length=500)
+    rows_done = models.PositiveBigIntegerField(default=0)
+    rows_created = models.PositiveBigIntegerField(default=0)
+    rows_rejected = models.PositiveBigIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.rows_done} rows)"
+
+
+class TokenRevocation(models.Model):
+    """
+    Access tokens authenticated before `revoked_at` are rejected for this user
+    (deactivation, privilege or password change). Not a FK, so entries outlive
+    deleted users.
+    """
+    user_id = models.PositiveIntegerField(unique=True)
+    # Indexed for the MAX(revoked_at) every worker polls
+    revoked_at = models.DateTimeField(db_index=True)
+
+    def __str__(self) -> str:
+        return f"user {self.user_id} revoked at {self.revoked_at}"
+
+
+class ChangeStamp(models.Model):
+    """When rows of a model last changed, for the ETags in mmi_app.conditional."""
+    name = models.CharField(max_length=32, primary_key=True)
+    changed_at = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return f"{self.name} changed at {self.changed_at}"
+
 
 # Create your models here.
+
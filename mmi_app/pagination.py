@@ -0,0 +1,20 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """Keyset pagination over the primary key; the default for API list endpoints."""
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 200)
+
+
+class SessionCursorPagination(IdCursorPagination):
+    # Matches the (start_time, id) and (course, start_time) indexes on Session
+    ordering = ('start_time', 'id')
+
+
+class RankedPagination(PageNumberPagination):
+    """Page-number pagination for relevance-ordered results such as course search."""
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 200)
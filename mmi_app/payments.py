@@ -0,0 +1,126 @@
+"""
+Stripe client plumbing.
+
+Requests go through one `StripeClient` per API key, kept for the life of
+the process, instead of the module-global `stripe.api_key`. Its HTTP
+client reuses a pooled keep-alive `requests.Session` with strict connect
+and read timeouts, and Stripe's own retry logic handles transient failures.
+Callers pass an idempotency key, so neither those retries nor a resubmitted
+form can create a second checkout session.
+
+The async path uses httpx when it is installed, with one pooled client per
+event loop: an httpx connection must not outlive the loop that opened it,
+so call it only where the loop does (under ASGI). Without httpx, the
+blocking call runs in a worker thread so the event loop stays free.
+STRIPE_API_BASE can point the client at the local stand-in server in
+`mmi_app.stripe_stub`.
+"""
+
+import asyncio
+import re
+import threading
+import uuid
+import weakref
+from typing import Dict, Optional
+
+import requests
+import stripe
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+_clients: Dict[str, stripe.StripeClient] = {}
+_clients_lock = threading.Lock()
+_loop_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, stripe.StripeClient]]' = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _timeout():
+    return (
+        getattr(settings, 'STRIPE_CONNECT_TIMEOUT', 3.0),
+        getattr(settings, 'STRIPE_READ_TIMEOUT', 10.0),
+    )
+
+
+def _http_client() -> stripe.HTTPClient:
+    pool_size = getattr(settings, 'STRIPE_POOL_SIZE', 20)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return stripe.RequestsClient(timeout=_timeout(), session=session)
+
+
+def _stripe_client(api_key: str, http_client: stripe.HTTPClient) -> stripe.StripeClient:
+    base = getattr(settings, 'STRIPE_API_BASE', '')
+    return stripe.StripeClient(
+        api_key,
+        http_client=http_client,
+        max_network_retries=getattr(settings, 'STRIPE_MAX_RETRIES', 2),
+        base_addresses={'api': base} if base else {},
+    )
+
+
+def get_stripe_client(api_key: str) -> stripe.StripeClient:
+    client = _clients.get(api_key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(api_key)
+            if client is None:
+                client = _clients[api_key] = _stripe_client(api_key, _http_client())
+    return client
+
+
+def get_async_stripe_client(api_key: str) -> stripe.StripeClient:
+    """The httpx-backed client for the running event loop."""
+    clients = _loop_clients.setdefault(asyncio.get_running_loop(), {})
+    if api_key not in clients:
+        clients[api_key] = _stripe_client(api_key, stripe.HTTPXClient(timeout=sum(_timeout())))
+    return clients[api_key]
+
+
+def checkout_session_params(enrollment, success_url: str, cancel_url: str) -> dict:
+    return {
+        'mode': 'payment',
+        'payment_method_types': ['card'],
+        'line_items': [{
+            'price_data': {
+                'currency': 'usd',
+                'product_data': { 'name': enrollment.course.title },
+                'unit_amount': max(0, int(enrollment.course.price_cents or 0)),
+            },
+            'quantity': 1,
+        }],
+        'metadata': { 'enrollment_id': str(enrollment.id) },
+        'success_url': success_url,
+        'cancel_url': cancel_url,
+    }
+
+
+def checkout_attempt(value: Optional[str]) -> str:
+    """The token a checkout form was rendered with, or a new one."""
+    return value if value and re.fullmatch(r'[0-9a-f]{32}', value) else uuid.uuid4().hex
+
+
+def checkout_idempotency_key(enrollment, attempt: str) -> str:
+    return f'checkout-{enrollment.id}-{attempt}'
+
+
+def create_checkout_session(api_key: str, params: dict, idempotency_key: str):
+    return get_stripe_client(api_key).checkout.sessions.create(
+        params=params, options={'idempotency_key': idempotency_key},
+    )
+
+
+async def create_checkout_session_async(api_key: str, params: dict, idempotency_key: str):
+    if httpx is not None:
+        return await get_async_stripe_client(api_key).checkout.sessions.create_async(
+            params=params, options={'idempotency_key': idempotency_key},
+        )
+    return await sync_to_async(create_checkout_session, thread_sensitive=False)(api_key, params, idempotency_key)
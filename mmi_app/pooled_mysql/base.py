@@ -0,0 +1,79 @@
+"""
+Django's MySQL backend with connections from a per-process `ConnectionPool`.
+
+Configure with ENGINE 'mmi_app.pooled_mysql' and the pool's keyword
+arguments under OPTIONS['pool'] (see mmi_app.dbpool); CONN_MAX_AGE must be
+0 so that Django returns the connection at the end of every request.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.mysql import base as mysql
+
+from mmi_app.dbpool import ConnectionPool, PoolTimeout, get_pool
+
+Database = mysql.Database
+
+
+class DatabaseWrapper(mysql.DatabaseWrapper):
+    def __init__(self, settings_dict, alias='default'):
+        super().__init__(settings_dict, alias)
+        if settings_dict.get('CONN_MAX_AGE'):
+            raise ImproperlyConfigured('The pooled MySQL backend needs CONN_MAX_AGE = 0; the pool keeps connections open.')
+
+    @property
+    def pool(self) -> ConnectionPool:
+        s = self.settings_dict
+        # The test runner points NAME at the test database, which gets its own pool
+        key = (self.alias, s['NAME'], s['HOST'], s['PORT'], s['USER'])
+        return get_pool(key, self._make_pool)
+
+    def _make_pool(self) -> ConnectionPool:
+        params = self.get_connection_params()
+        pool = ConnectionPool(
+            connect=lambda: super(DatabaseWrapper, self).get_new_connection(params),
+            validate=self._ping,
+            **self.settings_dict['OPTIONS'].get('pool', {}),
+        )
+        pool.fill()
+        return pool
+
+    @staticmethod
+    def _ping(connection) -> bool:
+        # Without reconnect=False the driver silently reopens a dead session,
+        # which would skip init_connection_state() on the new one
+        try:
+            connection.ping(False)
+        except Database.Error:
+            return False
+        return True
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        try:
+            return self.pool.acquire()
+        except PoolTimeout as exc:
+            raise Database.OperationalError(str(exc)) from exc
+
+    def init_connection_state(self):
+        # Session settings (isolation level, SQL_AUTO_IS_NULL) stay with the
+        # pooled connection, so they only need to be sent once
+        if getattr(self.connection, '_mmi_initialized', False):
+            return
+        super().init_connection_state()
+        self.connection._mmi_initialized = True
+
+    def _close(self):
+        if self.connection is None:
+            return
+        connection, discard = self.connection, self.errors_occurred
+        if not discard and (self.in_atomic_block or not self.autocommit):
+            # Don't hand an open transaction to the next request
+            try:
+                connection.rollback()
+            except Database.Error:
+                discard = True
+        self.pool.release(connection, discard=discard)
@@ -0,0 +1,172 @@
+"""
+Read replicas with read-your-writes stickiness.
+
+`ReplicaRouter` sends writes to `default` and, during a request, reads to
+one of DATABASE_REPLICAS (one replica per request, so a page and its count
+query agree). Reads go to the primary instead when:
+
+- the request has written anything (every write passes `db_for_write`),
+- the client wrote within the last REPLICA_PIN_SECONDS: `ReplicaPinMiddleware`
+  marks browsers with a short-lived cookie and remembers bearer-token
+  clients in the cache (which must be shared between workers),
+- the read happens inside a transaction on the primary,
+- the model must always be fresh (sessions, token revocations, change
+  stamps), or
+- there is no request at all (management commands and workers).
+
+Loads that fill shared caches call `reads_after()` with the stamp of the
+invalidation that triggered them, so a cache is not refilled from a replica
+that has not caught up yet.
+"""
+
+import hashlib
+import math
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICAS = list(getattr(settings, 'DATABASE_REPLICAS', []))
+PIN_SECONDS = float(getattr(settings, 'REPLICA_PIN_SECONDS', 5.0))
+PIN_COOKIE = 'mmi_dbpin'
+
+# Models whose reads never go to a replica
+PRIMARY_MODELS = {'sessions.session', 'mmi_app.tokenrevocation', 'mmi_app.changestamp'}
+
+
+class RequestState:
+    __slots__ = ('pinned', 'wrote', 'replica')
+
+    def __init__(self, pinned: bool = False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica: Optional[str] = None
+
+
+_state: ContextVar[Optional[RequestState]] = ContextVar('mmi_db_state', default=None)
+_primary: ContextVar[bool] = ContextVar('mmi_db_primary', default=False)
+
+
+@contextmanager
+def use_primary():
+    """Send reads inside the block to the primary."""
+    token = _primary.set(True)
+    try:
+        yield
+    finally:
+        _primary.reset(token)
+
+
+@contextmanager
+def reads_after(*stamps_ns: int):
+    """Read from the primary if any of the `time.time_ns()` stamps is within the pin window."""
+    cutoff = time.time_ns() - PIN_SECONDS * 1e9
+    if any(stamp and stamp > cutoff for stamp in stamps_ns):
+        with use_primary():
+            yield
+    else:
+        yield
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None or state.pinned or state.wrote or _primary.get()
+            or model._meta.label_lower in PRIMARY_MODELS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = random.choice(REPLICAS)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _bearer_key(request) -> Optional[str]:
+    auth = request.headers.get('Authorization', '')
+    if not auth.startswith('Bearer '):
+        return None
+    return 'mmi:dbpin:' + hashlib.sha256(auth.encode()).hexdigest()[:32]
+
+
+def _cookie_pinned(request) -> bool:
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReplicaPinMiddleware:
+    """Keeps a client's reads on the primary for REPLICA_PIN_SECONDS after it writes."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not REPLICAS:
+            raise MiddlewareNotUsed
+        from .caching import cache_is_shared  # caching imports this module
+
+        if not cache_is_shared():
+            raise ImproperlyConfigured(
+                'DATABASE_REPLICAS needs a cache shared between workers (CACHE_BACKEND), '
+                'or bearer-token clients lose read-your-writes on other workers.'
+            )
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        key = _bearer_key(request)
+        state = RequestState(_cookie_pinned(request) or (key is not None and cache.get(key) is not None))
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and key is not None:
+            cache.set(key, 1, PIN_SECONDS)
+        return self._finish(request, response, state)
+
+    async def __acall__(self, request):
+        key = _bearer_key(request)
+        state = RequestState(_cookie_pinned(request) or (key is not None and await cache.aget(key) is not None))
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and key is not None:
+            await cache.aset(key, 1, PIN_SECONDS)
+        return self._finish(request, response, state)
+
+    def _finish(self, request, response, state: RequestState):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, f'{time.time() + PIN_SECONDS:.3f}', max_age=math.ceil(PIN_SECONDS),
+                httponly=True, samesite='Lax', secure=request.is_secure(),
+            )
+        return response
@@ -0,0 +1,111 @@
+"""
+Tutor scheduling: overlap queries over Availability and Session.
+
+Intervals are capped in length (SCHEDULING_MAX_SESSION_HOURS and
+SCHEDULING_MAX_AVAILABILITY_HOURS), so every interval overlapping a window
+starts no earlier than `window_start - cap`. That turns each overlap query
+into a bounded range scan on the (tutor, start_time) / (course, start_time)
+indexes instead of a scan over the tutor's whole history.
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+from .models import Availability, Session
+
+Interval = Tuple[datetime, datetime]
+
+MAX_SESSION_LENGTH = timedelta(hours=getattr(settings, 'SCHEDULING_MAX_SESSION_HOURS', 12))
+MAX_AVAILABILITY_LENGTH = timedelta(hours=getattr(settings, 'SCHEDULING_MAX_AVAILABILITY_HOURS', 24 * 7))
+
+
+def _overlapping(queryset, window: Interval, max_length: timedelta):
+    start, end = window
+    return queryset.filter(
+        start_time__gte=start - max_length,
+        start_time__lt=end,
+        end_time__gt=start,
+    ).order_by('start_time')
+
+
+def availability_in(tutor, window: Interval):
+    return _overlapping(Availability.objects.filter(tutor=tutor), window, MAX_AVAILABILITY_LENGTH)
+
+
+def sessions_in(tutor, window: Interval):
+    return _overlapping(Session.objects.filter(course__tutor=tutor), window, MAX_SESSION_LENGTH)
+
+
+def _merge(intervals: List[Interval]) -> List[Interval]:
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _clip(intervals, window: Interval) -> List[Interval]:
+    start, end = window
+    return [(max(s, start), min(e, end)) for s, e in intervals if s < end and e > start]
+
+
+def find_conflicts(tutor, window: Interval, exclude_session_id: Optional[int] = None):
+    """The tutor's sessions overlapping `window`."""
+    sessions = sessions_in(tutor, window)
+    if exclude_session_id:
+        sessions = sessions.exclude(id=exclude_session_id)
+    return sessions
+
+
+def find_free_slots(tutor, window: Interval, duration: timedelta) -> List[Interval]:
+    """
+    Free intervals of at least `duration` inside `window`: time covered by
+    the tutor's availability and not taken by any of their sessions.
+    """
+    available = _merge(_clip(availability_in(tutor, window).values_list('start_time', 'end_time'), window))
+    busy = _merge(_clip(sessions_in(tutor, window).values_list('start_time', 'end_time'), window))
+    free: List[Interval] = []
+    i = 0
+    for start, end in available:
+        cursor = start
+        # `busy` is sorted and merged; skip blocks that end before this availability
+        while i < len(busy) and busy[i][1] <= cursor:
+            i += 1
+        j = i
+        while j < len(busy) and busy[j][0] < end:
+            if busy[j][0] - cursor >= duration:
+                free.append((cursor, busy[j][0]))
+            cursor = max(cursor, busy[j][1])
+            j += 1
+        if end - cursor >= duration:
+            free.append((cursor, end))
+    return free
+
+
+def validate_interval(start: datetime, end: datetime, max_length: timedelta) -> None:
+    if start and end:
+        if end <= start:
+            raise ValidationError({'end_time': 'End time must be after the start time.'})
+        if end - start > max_length:
+            raise ValidationError({'end_time': f'Intervals may not be longer than {max_length}.'})
+
+
+def validate_session(session: Session) -> None:
+    """Reject sessions outside the tutor's availability or clashing with their other sessions."""
+    validate_interval(session.start_time, session.end_time, MAX_SESSION_LENGTH)
+    if not (session.course_id and session.start_time and session.end_time):
+        return
+    tutor = session.course.tutor
+    window = (session.start_time, session.end_time)
+    clash = find_conflicts(tutor, window, exclude_session_id=session.pk).select_related('course').first()
+    if clash:
+        raise ValidationError(f'The tutor already teaches {clash} at that time.')
+    if getattr(settings, 'SCHEDULING_REQUIRE_AVAILABILITY', False):
+        covered = _merge(_clip(availability_in(tutor, window).values_list('start_time', 'end_time'), window))
+        if covered != [window]:
+            raise ValidationError("The session is outside the tutor's availability.")
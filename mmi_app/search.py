@@ -0,0 +1,105 @@
+"""
+Course search over title and description.
+
+On MySQL the FULLTEXT index created by migration 0008 ranks matches with
+MATCH ... AGAINST in natural language mode. Other backends (SQLite in
+tests and local setups) use an in-process inverted index that is rebuilt
+lazily whenever a course is saved or deleted. Its ranking is applied with
+one query parameter per id, so only the best SEARCH_MAX_RESULTS matches
+are returned (SQLite allows 999 parameters per query in older builds).
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, When
+from django.db.models.expressions import RawSQL
+
+from .caching import VersionedValue
+from .models import Course
+
+TITLE_WEIGHT = 3
+MAX_RESULTS = getattr(settings, 'SEARCH_MAX_RESULTS', 250)
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or '').lower()) if len(t) > 1]
+
+
+class InvertedIndex:
+    def __init__(self, rows):
+        # term -> {course_id: weighted term frequency}
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.size = 0
+        for pk, title, description in rows:
+            self.size += 1
+            weights = Counter()
+            for term in tokenize(title):
+                weights[term] += TITLE_WEIGHT
+            for term in tokenize(description):
+                weights[term] += 1
+            for term, weight in weights.items():
+                self.postings[term][pk] = weight
+
+    def rank(self, query: str) -> List[int]:
+        """Course ids matching any query term, best first (tf-idf)."""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + self.size / len(docs))
+            for pk, weight in docs.items():
+                scores[pk] += (1 + math.log(weight)) * idf
+        return sorted(scores, key=lambda pk: (-scores[pk], pk))
+
+
+def _build_index() -> InvertedIndex:
+    return InvertedIndex(Course.objects.values_list('id', 'title', 'description').iterator(chunk_size=2000))
+
+
+# Invalidated by the Course save/delete receivers in signals.py
+course_search_index = VersionedValue('course-search-index', _build_index, check_interval=30.0)
+
+
+def uses_fulltext() -> bool:
+    return connection.vendor == 'mysql'
+
+
+def search_courses(
+    queryset,
+    query: str = '',
+    tutor_id: Optional[int] = None,
+    min_price_cents: Optional[int] = None,
+    max_price_cents: Optional[int] = None,
+):
+    """Filter `queryset`; with a `query`, keep only matches ordered by relevance."""
+    if tutor_id is not None:
+        queryset = queryset.filter(tutor_id=tutor_id)
+    if min_price_cents is not None:
+        queryset = queryset.filter(price_cents__gte=min_price_cents)
+    if max_price_cents is not None:
+        queryset = queryset.filter(price_cents__lte=max_price_cents)
+    query = (query or '').strip()
+    if not query:
+        return queryset
+    if uses_fulltext():
+        relevance = RawSQL(
+            f'MATCH ({Course._meta.db_table}.title, {Course._meta.db_table}.description) AGAINST (%s IN NATURAL LANGUAGE MODE)',
+            [query],
+        )
+        return queryset.annotate(relevance=relevance).filter(relevance__gt=0).order_by('-relevance', 'id')
+    ranked = course_search_index.get().rank(query)
+    if len(ranked) > MAX_RESULTS:
+        # Apply the other filters first, so the cap keeps the best matches that pass them
+        allowed = set(queryset.values_list('id', flat=True))
+        ranked = [pk for pk in ranked if pk in allowed][:MAX_RESULTS]
+    if not ranked:
+        return queryset.none()
+    position = Case(*[When(id=pk, then=i) for i, pk in enumerate(ranked)], output_field=IntegerField())
+    return queryset.filter(id__in=ranked).annotate(relevance_rank=position).order_by('relevance_rank')
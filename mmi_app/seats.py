@@ -0,0 +1,148 @@
+"""
+Seat reservation for sessions.
+
+`Session.booked_count` is a denormalized counter of the session's bookings.
+Reservations claim a seat with a single conditional UPDATE, so concurrent
+requests cannot overbook a session; cancellations give the seats back.
+Use the `recount_seats` management command to repair drifted counters.
+Every counter UPDATE also bumps `Session.updated_at` and, since UPDATEs
+send no signals, the sessions' change stamp and the cached pages of their
+courses: the seats left are part of what clients cache.
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, List
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from . import conditional, counters
+from .caching import invalidate_page_groups
+from .models import Booking, Course, Session
+
+SEAT_RESERVED = 'reserved'
+SEAT_FULL = 'full'
+SEAT_ALREADY_BOOKED = 'already_booked'
+SEAT_MISSING = 'missing'
+
+
+def reserve_seat(student, session_id: int) -> str:
+    """Book `student` onto a session, returning one of the SEAT_* outcomes."""
+    try:
+        with transaction.atomic():
+            claimed = Session.objects.filter(id=session_id, booked_count__lt=F('capacity')).update(
+                booked_count=F('booked_count') + 1, updated_at=timezone.now()
+            )
+            if not claimed:
+                if Session.objects.filter(id=session_id).exists():
+                    return SEAT_FULL
+                return SEAT_MISSING
+            Booking.objects.create(student=student, session_id=session_id)
+            seats_changed([session_id])
+    except IntegrityError:
+        # Duplicate booking; leaving the atomic block undid the increment
+        return SEAT_ALREADY_BOOKED
+    return SEAT_RESERVED
+
+
+def seats_changed(session_ids: Iterable[int]) -> None:
+    """Invalidate what shows the sessions' seats once the transaction commits."""
+    session_ids = list(session_ids)
+    conditional.touch('session')
+
+    def invalidate_pages():
+        slugs = Course.objects.filter(sessions__id__in=session_ids).values_list('slug', flat=True).distinct()
+        invalidate_page_groups(*[f'course:{slug}' for slug in slugs])
+
+    transaction.on_commit(invalidate_pages)
+
+
+def lock_seats_left(session_ids: Iterable[int]) -> Dict[int, int]:
+    """Lock the sessions' rows (in id order) and return their free seats; call inside a transaction."""
+    rows = (
+        Session.objects.select_for_update().filter(id__in=list(session_ids)).order_by('id')
+        .values_list('id', 'capacity', 'booked_count')
+    )
+    return {sid: max(0, capacity - booked) for sid, capacity, booked in rows}
+
+
+def take_seats(taken: Dict[int, int]) -> int:
+    """Add `taken[session_id]` to each session's counter in one UPDATE; pair with `lock_seats_left`."""
+    taken = {sid: n for sid, n in taken.items() if n}
+    if not taken:
+        return 0
+    increment = Case(
+        *[When(id=sid, then=Value(n)) for sid, n in taken.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    seats_changed(taken)
+    return Session.objects.filter(id__in=taken.keys()).update(
+        booked_count=F('booked_count') + increment, updated_at=timezone.now()
+    )
+
+
+def release_seats(session_ids: Iterable[int]) -> int:
+    """Give back one seat per occurrence of a session id."""
+    released = Counter(session_ids)
+    if not released:
+        return 0
+    decrement = Case(
+        *[When(id=sid, then=Value(n)) for sid, n in released.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    seats_changed(released)
+    # GREATEST(count, n) - n never goes negative, even on unsigned columns
+    return Session.objects.filter(id__in=released.keys()).update(
+        booked_count=Greatest(F('booked_count'), decrement) - decrement, updated_at=timezone.now()
+    )
+
+
+def cancel_bookings(booking_ids: Iterable[int]) -> int:
+    """Delete bookings and release their seats in the same transaction."""
+    booking_ids = list(booking_ids)
+    if not booking_ids:
+        return 0
+    with transaction.atomic(), counters.deferred():
+        session_ids = list(
+            Booking.objects.select_for_update().filter(id__in=booking_ids).values_list('session_id', flat=True)
+        )
+        Booking.objects.filter(id__in=booking_ids).delete()
+        release_seats(session_ids)
+    return len(session_ids)
+
+
+def seats_left_expression():
+    """Remaining seats as a column expression, for `.annotate(seats_left=...)`."""
+    return Greatest(F('capacity'), F('booked_count')) - F('booked_count')
+
+
+def booked_count_subquery() -> Subquery:
+    bookings = (
+        Booking.objects.filter(session=OuterRef('pk'))
+        .order_by()
+        .values('session')
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    return Coalesce(Subquery(bookings, output_field=IntegerField()), Value(0))
+
+
+def drifted_session_ids() -> List[int]:
+    return list(
+        Session.objects.annotate(actual=booked_count_subquery())
+        .exclude(booked_count=F('actual'))
+        .values_list('id', flat=True)
+    )
+
+
+def recount_booked_seats(session_ids: Iterable[int]) -> int:
+    """Recompute the counter for the given sessions with one UPDATE."""
+    session_ids = list(session_ids)
+    seats_changed(session_ids)
+    return Session.objects.filter(id__in=session_ids).update(
+        booked_count=booked_count_subquery(), updated_at=timezone.now()
+    )
@@ -0,0 +1,205 @@
+"""
+Synthetic data for benchmarks and local load testing.
+
+Everything is generated from a seeded RNG and row indexes, so the same scale
+and seed give the same dataset on SQLite or MySQL (times are relative to the
+day the data is seeded). Rows are written with chunked `bulk_create`;
+booking counters are computed up front and the dashboard counters, page
+cache and search index are refreshed at the end, since bulk writes send no
+signals. Seeded rows are recognisable by the `seed-` prefix on usernames and
+course slugs, which `reset()` uses to remove them again.
+"""
+
+import random
+from datetime import timedelta
+from typing import Callable, Dict, Iterator, NamedTuple
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters
+from .caching import invalidate_page_groups
+from .models import ActionRequest, Availability, Booking, Course, Enrollment, Payment, Resource, Session, Tutor
+from .search import course_search_index
+
+PREFIX = 'seed-'
+PASSWORD = 'seed-password'
+STAFF_USERNAME = f'{PREFIX}staff'
+
+
+class Scale(NamedTuple):
+    users: int
+    tutors: int
+    courses: int
+    sessions: int
+    bookings: int
+    enrollments: int
+
+
+SCALES: Dict[str, Scale] = {
+    'tiny': Scale(users=60, tutors=6, courses=12, sessions=120, bookings=240, enrollments=120),
+    'small': Scale(users=2_000, tutors=100, courses=200, sessions=10_000, bookings=10_000, enrollments=4_000),
+    'medium': Scale(users=20_000, tutors=500, courses=1_000, sessions=100_000, bookings=100_000, enrollments=40_000),
+    'large': Scale(users=100_000, tutors=1_000, courses=5_000, sessions=500_000, bookings=500_000, enrollments=200_000),
+}
+
+_FIRST = ['Ada', 'Ben', 'Chen', 'Dara', 'Elif', 'Farah', 'Goran', 'Hana', 'Ivo', 'Jun', 'Kofi', 'Lena', 'Mira', 'Nils', 'Omar', 'Priya']
+_LAST = ['Akhtar', 'Bauer', 'Costa', 'Dubois', 'Eze', 'Fischer', 'Garcia', 'Haddad', 'Ito', 'Jensen', 'Khan', 'Lopez', 'Moreau', 'Novak']
+_SUBJECTS = ['Algebra', 'Biology', 'Chemistry', 'Calculus', 'Physics', 'Statistics', 'Python', 'Writing', 'History', 'Economics', 'Spanish', 'Geometry']
+_LEVELS = ['Foundations of', 'Intermediate', 'Advanced', 'Exam Prep:', 'Workshop:', 'Intensive']
+_WORDS = ['practice', 'problems', 'theory', 'lab', 'review', 'projects', 'exam', 'essay', 'data', 'proofs', 'reading', 'feedback', 'quizzes']
+_PRICES = [0, 1900, 2900, 4900, 9900, 14900]
+
+
+def _chunked(rows: Iterator, size: int) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write(model, rows: Iterator, batch_size: int, progress: Callable[[str, int], None]) -> int:
+    written = 0
+    for chunk in _chunked(rows, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(chunk, batch_size=batch_size)
+        written += len(chunk)
+        progress(model._meta.verbose_name_plural, written)
+    return written
+
+
+def exists() -> bool:
+    return get_user_model().objects.filter(username__startswith=PREFIX).exists()
+
+
+def reset() -> None:
+    """Delete previously seeded rows."""
+    User = get_user_model()
+    seeded_courses = Course.objects.filter(slug__startswith=PREFIX)
+    Booking.objects.filter(session__course__in=seeded_courses).delete()
+    Session.objects.filter(course__in=seeded_courses).delete()
+    seeded_courses.delete()
+    User.objects.filter(username__startswith=PREFIX).delete()
+    _refresh()
+
+
+def _refresh() -> None:
+    for name in counters.tracked_models():
+        counters.reconcile(name)
+    counters.ensure_shards()
+    invalidate_page_groups('courses', 'tutors')
+    course_search_index.invalidate()
+
+
+def seed(scale: Scale, seed: int = 1, batch_size: int = 5000, progress: Callable[[str, int], None] = lambda name, n: None) -> Dict[str, int]:
+    rng = random.Random(seed)
+    User = get_user_model()
+    now = timezone.now().replace(minute=0, second=0, microsecond=0)
+    window_start, window_days = now - timedelta(days=30), 120
+    password = make_password(PASSWORD)
+    written: Dict[str, int] = {}
+
+    def users():
+        for i in range(scale.users):
+            first, last = rng.choice(_FIRST), rng.choice(_LAST)
+            yield User(
+                username=f'{PREFIX}user-{i:06d}', email=f'user{i}@example.test', first_name=first, last_name=last,
+                password=password, date_joined=now - timedelta(days=rng.randrange(365)),
+            )
+
+    written['users'] = _write(User, users(), batch_size, progress)
+    User.objects.create(username=STAFF_USERNAME, email='staff@example.test', password=password, is_staff=True, is_superuser=True)
+    user_ids = list(User.objects.filter(username__startswith=f'{PREFIX}user-').order_by('id').values_list('id', flat=True))
+
+    written['tutors'] = _write(Tutor, (
+        Tutor(user_id=user_ids[i], bio=f'Teaches {rng.choice(_SUBJECTS)} and {rng.choice(_SUBJECTS)}.')
+        for i in range(min(scale.tutors, scale.users))
+    ), batch_size, progress)
+    tutor_ids = list(Tutor.objects.filter(user__username__startswith=PREFIX).order_by('id').values_list('id', flat=True))
+
+    def availability():
+        for tutor_id in tutor_ids:
+            for week in range(0, window_days, 7):
+                start = window_start + timedelta(days=week)
+                yield Availability(tutor_id=tutor_id, start_time=start, end_time=start + timedelta(days=7))
+
+    written['availability'] = _write(Availability, availability(), batch_size, progress)
+
+    def courses():
+        for i in range(scale.courses):
+            subject = rng.choice(_SUBJECTS)
+            yield Course(
+                title=f'{rng.choice(_LEVELS)} {subject} {i}',
+                slug=f'{PREFIX}course-{i:05d}',
+                description=' '.join([subject.lower()] + rng.choices(_WORDS, k=12)),
+                tutor_id=tutor_ids[i % len(tutor_ids)],
+                price_cents=rng.choice(_PRICES),
+            )
+
+    written['courses'] = _write(Course, courses(), batch_size, progress)
+    course_ids = list(Course.objects.filter(slug__startswith=PREFIX).order_by('id').values_list('id', flat=True))
+
+    # Booking i goes to session i % sessions, so each session's count is known up front
+    rounds, extra = divmod(scale.bookings, scale.sessions)
+
+    def sessions():
+        for i in range(scale.sessions):
+            start = window_start + timedelta(hours=rng.randrange(window_days * 24))
+            booked = rounds + (1 if i < extra else 0)
+            yield Session(
+                course_id=course_ids[i % len(course_ids)], start_time=start, end_time=start + timedelta(hours=1),
+                capacity=max(rng.randint(5, 30), booked), booked_count=booked,
+            )
+
+    written['sessions'] = _write(Session, sessions(), batch_size, progress)
+    session_ids = list(Session.objects.filter(course__slug__startswith=PREFIX).order_by('id').values_list('id', flat=True))
+
+    def bookings():
+        for i in range(min(scale.bookings, len(session_ids) * len(user_ids))):
+            s = i % len(session_ids)
+            yield Booking(student_id=user_ids[(s * 31 + i // len(session_ids)) % len(user_ids)], session_id=session_ids[s])
+
+    written['bookings'] = _write(Booking, bookings(), batch_size, progress)
+    del session_ids
+
+    def enrollments():
+        for j in range(min(scale.enrollments, len(course_ids) * len(user_ids))):
+            c = j % len(course_ids)
+            yield Enrollment(student_id=user_ids[(c * 17 + j // len(course_ids)) % len(user_ids)], course_id=course_ids[c])
+
+    written['enrollments'] = _write(Enrollment, enrollments(), batch_size, progress)
+
+    def payments():
+        rows = (
+            Enrollment.objects.filter(course__slug__startswith=PREFIX, course__price_cents__gt=0)
+            .order_by('id').values_list('id', 'course__price_cents')
+        )
+        for n, (enrollment_id, price) in enumerate(rows.iterator(chunk_size=batch_size)):
+            if n % 2 == 0:
+                yield Payment(enrollment_id=enrollment_id, amount_cents=price, stripe_payment_intent=f'{PREFIX}pi-{enrollment_id}', status='paid')
+
+    written['payments'] = _write(Payment, payments(), batch_size, progress)
+
+    def resources():
+        for c, course_id in enumerate(course_ids[:500]):
+            yield Resource(course_id=course_id, title=f'Reading list {c}', url=f'https://example.test/reading/{c}')
+
+    written['resources'] = _write(Resource, resources(), batch_size, progress)
+    handout = Resource(course_id=course_ids[0], title='Handout')
+    handout.file.save('seed-handout.txt', ContentFile(b'Seeded handout.\n' * 4096), save=True)
+
+    def action_requests():
+        rows = Booking.objects.filter(session__course__slug__startswith=PREFIX).order_by('id').values_list('id', 'student_id')
+        for booking_id, student_id in rows[:max(1, scale.bookings // 50)]:
+            yield ActionRequest(request_type=ActionRequest.REQUEST_CANCEL_BOOKING, booking_id=booking_id, requested_by_id=student_id)
+
+    written['action requests'] = _write(ActionRequest, action_requests(), batch_size, progress)
+    _refresh()
+    return written
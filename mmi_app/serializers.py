@@ -1,16 +1,19 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
 
-from .models import Course, Enrollment, Session, Booking, Resource, Tutor, Payment
+from .fieldsets import SparseFieldsMixin
+from .models import Course, Enrollment, Session, Booking, BookingRequest, Resource, Tutor, Payment
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'first_name', 'last_name']
 
 
-class TutorSerializer(serializers.ModelSerializer):
+class TutorSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
@@ -18,7 +21,7 @@ class TutorSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'bio']
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     tutor = TutorSerializer(read_only=True)
 
     class Meta:
@@ -26,7 +29,7 @@ class CourseSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'slug', 'description', 'tutor', 'price_cents', 'is_active']
 
 
-class SessionSerializer(serializers.ModelSerializer):
+class SessionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     course = CourseSerializer(read_only=True)
 
     class Meta:
@@ -34,7 +37,7 @@ class SessionSerializer(serializers.ModelSerializer):
         fields = ['id', 'course', 'start_time', 'end_time', 'capacity']
 
 
-class EnrollmentSerializer(serializers.ModelSerializer):
+class EnrollmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     course = serializers.PrimaryKeyRelatedField(queryset=Course.objects.all())
 
     class Meta:
@@ -43,7 +46,7 @@ class EnrollmentSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     session = serializers.PrimaryKeyRelatedField(queryset=Session.objects.all())
 
     class Meta:
@@ -52,16 +55,193 @@ class BookingSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
-class ResourceSerializer(serializers.ModelSerializer):
+class BookingRequestSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = BookingRequest
+        fields = ['id', 'session', 'status', 'created_at', 'processed_at']
+        read_only_fields = fields
+
+
+class ResourceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
     class Meta:
         model = Resource
-        fields = ['id', 'course', 'title', 'file', 'url']
+        fields = ['id', 'course', 'title', 'file', 'url', 'download_url']
 
+    def get_download_url(self, obj):
+        if not obj.file:
+            return None
+        url = reverse('resource-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
-class PaymentSerializer(serializers.ModelSerializer):
+
+class PaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = ['id', 'enrollment', 'amount_cents', 'currency', 'stripe_payment_intent', 'status', 'created_at']
         read_only_fields = ['created_at']
 
 
+# Read-only fast path for list endpoints.
+#
+# These readers build the same payloads as the nested serializers above from
+# flat `.values()` rows with the joins already done, skipping per-field DRF
+# machinery. Keep the key order in step with the serializers' `fields`.
+
+def _format_datetime(value, tz):
+    # Same output as DateTimeField.to_representation with the ISO 8601 default
+    if value is None:
+        return None
+    if timezone.is_aware(value):
+        value = value.astimezone(tz)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _user_columns(prefix):
+    return [f'{prefix}id', f'{prefix}username', f'{prefix}first_name', f'{prefix}last_name']
+
+
+def _user_from_row(row, prefix):
+    return {
+        'id': row[f'{prefix}id'],
+        'username': row[f'{prefix}username'],
+        'first_name': row[f'{prefix}first_name'],
+        'last_name': row[f'{prefix}last_name'],
+    }
+
+
+def _tutor_columns(prefix):
+    return [f'{prefix}id', f'{prefix}bio'] + _user_columns(f'{prefix}user__')
+
+
+def _tutor_from_row(row, prefix):
+    return {
+        'id': row[f'{prefix}id'],
+        'user': _user_from_row(row, f'{prefix}user__'),
+        'bio': row[f'{prefix}bio'],
+    }
+
+
+def _course_columns(prefix):
+    fields = ['id', 'title', 'slug', 'description', 'price_cents', 'is_active']
+    return [f'{prefix}{f}' for f in fields] + _tutor_columns(f'{prefix}tutor__')
+
+
+def _course_from_row(row, prefix):
+    return {
+        'id': row[f'{prefix}id'],
+        'title': row[f'{prefix}title'],
+        'slug': row[f'{prefix}slug'],
+        'description': row[f'{prefix}description'],
+        'tutor': _tutor_from_row(row, f'{prefix}tutor__'),
+        'price_cents': row[f'{prefix}price_cents'],
+        'is_active': row[f'{prefix}is_active'],
+    }
+
+
+class ValuesReader:
+    """Serialize `.values()` rows; mirrors the output of `serializer_class`."""
+    serializer_class = None
+    columns = []
+
+    def __init__(self):
+        self.tz = timezone.get_current_timezone()
+
+    def values(self, queryset):
+        return queryset.values(*self.columns)
+
+    def to_representation(self, row):
+        raise NotImplementedError
+
+    def many(self, rows):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+
+class TutorValuesReader(ValuesReader):
+    serializer_class = TutorSerializer
+    columns = _tutor_columns('')
+
+    def to_representation(self, row):
+        return _tutor_from_row(row, '')
+
+
+class CourseValuesReader(ValuesReader):
+    serializer_class = CourseSerializer
+    columns = _course_columns('')
+
+    def to_representation(self, row):
+        return _course_from_row(row, '')
+
+
+class SessionValuesReader(ValuesReader):
+    serializer_class = SessionSerializer
+    columns = ['id', 'start_time', 'end_time', 'capacity'] + _course_columns('course__')
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'course': _course_from_row(row, 'course__'),
+            'start_time': _format_datetime(row['start_time'], self.tz),
+            'end_time': _format_datetime(row['end_time'], self.tz),
+            'capacity': row['capacity'],
+        }
+
+
+class SelectionValuesReader(ValuesReader):
+    """
+    Rows for a `?fields=`/`?expand=` request, shaped like `serializer` (built
+    with the selection). `for_serializer` returns None when a selected field
+    is not a plain column, and the view falls back to the serializer.
+    """
+    PLAIN_FIELDS = (
+        serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+        serializers.DateTimeField, serializers.PrimaryKeyRelatedField,
+    )
+
+    def __init__(self, plan, columns):
+        super().__init__()
+        self.plan = plan
+        self.columns = columns
+
+    @classmethod
+    def for_serializer(cls, serializer, extra=()):
+        columns = list(extra)
+        plan = cls._plan(serializer, '', columns)
+        return None if plan is None else cls(plan, list(dict.fromkeys(columns)))
+
+    @classmethod
+    def _plan(cls, serializer, prefix, columns):
+        plan = []
+        for name, field in serializer.fields.items():
+            column = prefix + '__'.join(field.source_attrs)
+            if isinstance(field, serializers.BaseSerializer):
+                nested = cls._plan(field, column + '__', columns)
+                if nested is None:
+                    return None
+                plan.append((name, None, nested))
+            elif isinstance(field, cls.PLAIN_FIELDS):
+                plan.append((name, column, isinstance(field, serializers.DateTimeField)))
+                columns.append(column)
+            else:
+                return None
+        return plan
+
+    def _row(self, row, plan):
+        data = {}
+        for name, column, item in plan:
+            if column is None:
+                data[name] = self._row(row, item)
+            elif item:
+                data[name] = _format_datetime(row[column], self.tz)
+            else:
+                data[name] = row[column]
+        return data
+
+    def to_representation(self, row):
+        return self._row(row, self.plan)
@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import conditional, counters
+from .authentication import revocations, revoke_user
+from .caching import invalidate_page_groups
+from .models import Course, Resource, Session, SiteSetting, Tutor
+from .search import course_search_index
+from .utils import site_setting_cache
+
+
+@receiver([post_save, post_delete], sender=SiteSetting)
+def invalidate_site_setting(sender, **kwargs):
+    # Bump after commit so other workers cannot reload the old row under the new stamp
+    transaction.on_commit(site_setting_cache.invalidate)
+
+
+def _count_receivers(name, model):
+    def on_save(sender, instance, created, raw=False, **kwargs):
+        if created and not raw:
+            counters.bump(name, 1)
+
+    def on_delete(sender, instance, **kwargs):
+        counters.bump(name, -1)
+
+    post_save.connect(on_save, sender=model, weak=False, dispatch_uid=f'counters-save-{name}')
+    post_delete.connect(on_delete, sender=model, weak=False, dispatch_uid=f'counters-delete-{name}')
+
+
+for _name, _model in counters.tracked_models().items():
+    _count_receivers(_name, _model)
+
+
+def _invalidate_pages(*groups):
+    groups = [g for g in groups if g]
+    transaction.on_commit(lambda: invalidate_page_groups(*groups))
+
+
+def _course_group(course_id):
+    slug = Course.objects.filter(pk=course_id).values_list('slug', flat=True).first()
+    return f'course:{slug}' if slug else None
+
+
+@receiver(pre_save, sender=Course)
+def remember_course_slug(sender, instance, raw=False, **kwargs):
+    instance._previous_slug = None
+    if instance.pk and not raw:
+        instance._previous_slug = Course.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course_pages(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_slug', None)
+    _invalidate_pages(
+        'courses',
+        f'course:{instance.slug}',
+        f'course:{previous}' if previous and previous != instance.slug else None,
+    )
+
+
+def _touch_receiver(name, model):
+    def on_change(sender, raw=False, **kwargs):
+        if not raw:
+            conditional.touch(name)
+
+    post_save.connect(on_change, sender=model, weak=False, dispatch_uid=f'change-stamp-save-{name}')
+    post_delete.connect(on_change, sender=model, weak=False, dispatch_uid=f'change-stamp-delete-{name}')
+
+
+for _name, _model in (('course', Course), ('session', Session), ('tutor', Tutor), ('resource', Resource)):
+    _touch_receiver(_name, _model)
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course_search(sender, **kwargs):
+    transaction.on_commit(course_search_index.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Session)
+@receiver([post_save, post_delete], sender=Resource)
+def invalidate_course_detail_page(sender, instance, **kwargs):
+    _invalidate_pages(_course_group(instance.course_id))
+
+
+@receiver([post_save, post_delete], sender=Tutor)
+def invalidate_tutor_pages(sender, instance, **kwargs):
+    slugs = Course.objects.filter(tutor_id=instance.pk).values_list('slug', flat=True)
+    _invalidate_pages('courses', 'tutors', *[f'course:{slug}' for slug in slugs])
+
+
+# Fields whose change must invalidate the claims in already issued JWTs
+_TOKEN_FIELDS = ('is_active', 'is_staff', 'is_superuser', 'username', 'password')
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_token_fields(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._revoke_tokens = False
+    if raw or not instance.pk or (update_fields is not None and not set(update_fields) & set(_TOKEN_FIELDS)):
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(*_TOKEN_FIELDS).first()
+    instance._revoke_tokens = previous is not None and any(
+        previous[name] != getattr(instance, name) for name in _TOKEN_FIELDS
+    )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def revoke_changed_user_tokens(sender, instance, raw=False, **kwargs):
+    if getattr(instance, '_revoke_tokens', False):
+        revoke_user(instance.pk)
+        transaction.on_commit(revocations.invalidate)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+    revoke_user(instance.pk)
+    transaction.on_commit(revocations.invalidate)
+
+
+_TUTOR_NAME_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def touch_tutor_on_name_change(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Tutor payloads include the user's name, so their change stamp must move with it
+    if raw or created or (update_fields is not None and not set(update_fields) & _TUTOR_NAME_FIELDS):
+        return
+    if Tutor.objects.filter(user_id=instance.pk).update(updated_at=timezone.now()):
+        conditional.touch('tutor')
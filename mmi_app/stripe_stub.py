@@ -0,0 +1,105 @@
+"""
+A minimal local stand-in for the Stripe API, for tests and benchmarks.
+
+Only the endpoints the site uses are implemented. Set STRIPE_API_BASE to the
+server's URL (for example http://127.0.0.1:12111) to send traffic here.
+`latency` simulates a slow upstream so blocking behaviour can be measured.
+"""
+
+import json
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Request-Id', f'req_{uuid.uuid4().hex[:14]}')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _form(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        return dict(parse_qsl(self.rfile.read(length).decode()))
+
+    def do_POST(self):
+        form = self._form()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.path.rstrip('/') != '/v1/checkout/sessions':
+            self._send(404, {'error': {'type': 'invalid_request_error', 'message': f'Unrecognized request URL ({self.path}).'}})
+            return
+        key = self.headers.get('Idempotency-Key')
+        with self.server.lock:
+            replay = self.server.idempotent.get(key) if key else None
+        if replay is not None:
+            self._send(200, replay)
+            return
+        session_id = f'cs_test_{uuid.uuid4().hex}'
+        session = {
+            'id': session_id,
+            'object': 'checkout.session',
+            'mode': form.get('mode', 'payment'),
+            'status': 'open',
+            'payment_status': 'unpaid',
+            'amount_total': int(form.get('line_items[0][price_data][unit_amount]', 0) or 0),
+            'currency': form.get('line_items[0][price_data][currency]', 'usd'),
+            'metadata': {k[len('metadata['):-1]: v for k, v in form.items() if k.startswith('metadata[')},
+            'success_url': form.get('success_url'),
+            'cancel_url': form.get('cancel_url'),
+            'url': f'{self.server.base_url}/pay/{session_id}',
+        }
+        with self.server.lock:
+            self.server.sessions[session_id] = session
+            if key:
+                self.server.idempotent[key] = session
+        self._send(200, session)
+
+    def do_GET(self):
+        prefix = '/v1/checkout/sessions/'
+        session = self.server.sessions.get(self.path[len(prefix):]) if self.path.startswith(prefix) else None
+        if session is None:
+            self._send(404, {'error': {'type': 'invalid_request_error', 'message': 'No such checkout session.'}})
+            return
+        self._send(200, session)
+
+
+class StripeStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, verbose: bool = False):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.verbose = verbose
+        self.sessions = {}
+        self.idempotent = {}
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up before the delayed response is written
+        if self.verbose or not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> threading.Thread:
+        """Serve from a daemon thread; call `shutdown()` to stop."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
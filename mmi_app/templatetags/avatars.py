@@ -0,0 +1,36 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from mmi_app.avatars import pick
+
+register = template.Library()
+
+
+def _srcset(variants, size: int, fmt: str) -> str:
+    one, two = pick(variants, size, fmt), pick(variants, size * 2, fmt)
+    if not one:
+        return ''
+    srcset = default_storage.url(one)
+    if two and two != one:
+        srcset += f', {default_storage.url(two)} 2x'
+    return srcset
+
+
+@register.simple_tag
+def avatar(profile, size: int = 40, alt: str = 'Profile picture'):
+    """
+    A <picture> with WebP and JPEG variants sized for `size` CSS pixels (and 2x
+    screens). Falls back to the original upload until its variants are ready.
+    """
+    if not profile or not profile.avatar:
+        return ''
+    variants = profile.avatar_variants or {}
+    if profile.avatar_processed != profile.avatar.name or not variants:
+        return format_html('<img src="{}" alt="{}" width="{}" height="{}" />', profile.avatar.url, alt, size, size)
+    webp, jpeg = _srcset(variants, size, 'webp'), _srcset(variants, size, 'jpeg')
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" alt="{}" width="{}" height="{}" loading="lazy" /></picture>',
+        format_html('<source type="image/webp" srcset="{}" />', webp) if webp else '',
+        default_storage.url(pick(variants, size, 'jpeg')), jpeg, alt, size, size,
+    )
@@ -1,3 +1,1354 @@
-from django.test import TestCase
+import csv
+import hashlib
+import hmac
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import BytesIO, StringIO
+from unittest import mock
+from urllib.parse import quote
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import (
+    admission, approvals, avatars, benchmarks, counters, dbpool, downloads, exports, importers, instrumentation, payments,
+    routers, scheduling, search, seats, seeding, views, webhooks,
+)
+from .authentication import ClaimsTokenObtainPairSerializer, StatelessJWTAuthentication, revocations
+from .caching import VersionedValue, invalidate_all_pages
+from .pagination import IdCursorPagination
+from .stripe_stub import StripeStubServer
+from .models import (
+    ActionRequest, Availability, Booking, BookingRequest, Course, Enrollment, ImportJob, MetricCounter, Payment, Resource,
+    Session, SiteSetting, Tutor, UserProfile, WebhookEvent,
+)
+from .utils import (
+    decode_keyset_cursor, encode_keyset_cursor, get_stripe_keys, keyset_page, site_setting_cache,
+)
+from .views import CourseViewSet, SessionViewSet, TutorViewSet
+
+
+class SeatTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tutor = Tutor.objects.create(user=User.objects.create_user('tutor'))
+        course = Course.objects.create(title='Course', slug='course', description='', tutor=tutor)
+        start = timezone.now() + timedelta(days=1)
+        cls.session = Session.objects.create(course=course, start_time=start, end_time=start + timedelta(hours=1), capacity=2)
+        cls.students = [User.objects.create_user(f'student-{i}') for i in range(3)]
+
+    def booked(self):
+        self.session.refresh_from_db()
+        return self.session.booked_count
+
+    def test_reserve_outcomes(self):
+        first, second, third = self.students
+        self.assertEqual(seats.reserve_seat(first, self.session.id), seats.SEAT_RESERVED)
+        self.assertEqual(seats.reserve_seat(first, self.session.id), seats.SEAT_ALREADY_BOOKED)
+        self.assertEqual(self.booked(), 1)
+        self.assertEqual(seats.reserve_seat(second, self.session.id), seats.SEAT_RESERVED)
+        self.assertEqual(seats.reserve_seat(third, self.session.id), seats.SEAT_FULL)
+        self.assertEqual(seats.reserve_seat(third, 0), seats.SEAT_MISSING)
+        self.assertEqual(self.booked(), 2)
+        self.assertEqual(Booking.objects.filter(session=self.session).count(), 2)
+
+    def test_cancel_releases_and_never_goes_negative(self):
+        for student in self.students[:2]:
+            seats.reserve_seat(student, self.session.id)
+        booking_ids = Booking.objects.filter(session=self.session).values_list('id', flat=True)
+        self.assertEqual(seats.cancel_bookings(list(booking_ids)), 2)
+        self.assertEqual(self.booked(), 0)
+        self.assertFalse(Booking.objects.filter(session=self.session).exists())
+        seats.release_seats([self.session.id, self.session.id])
+        self.assertEqual(self.booked(), 0)
+
+    def test_bookings_cannot_move_between_sessions(self):
+        other = Session.objects.create(
+            course=self.session.course, start_time=self.session.start_time, end_time=self.session.end_time, capacity=1,
+        )
+        student = self.students[0]
+        seats.reserve_seat(student, self.session.id)
+        booking = Booking.objects.get(student=student)
+        token = ClaimsTokenObtainPairSerializer.get_token(student).access_token
+        for method in (self.client.patch, self.client.put):
+            response = method(
+                f'/api/bookings/{booking.id}/', {'session': other.id}, content_type='application/json',
+                HTTP_AUTHORIZATION=f'Bearer {token}',
+            )
+            self.assertEqual(response.status_code, 405)
+        booking.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((booking.session_id, self.booked(), other.booked_count), (self.session.id, 1, 0))
+
+    def test_recount_repairs_drift(self):
+        seats.reserve_seat(self.students[0], self.session.id)
+        Session.objects.filter(id=self.session.id).update(booked_count=2)
+        self.assertEqual(seats.drifted_session_ids(), [self.session.id])
+        out = StringIO()
+        call_command('recount_seats', stdout=out)
+        self.assertIn('Recounted 1 session(s)', out.getvalue())
+        self.assertEqual(self.booked(), 1)
+        self.assertEqual(seats.drifted_session_ids(), [])
+
+
+class CounterTests(TestCase):
+    def test_a_thread_bumps_one_shard(self):
+        for _ in range(5):
+            counters.bump('courses', 1)
+            counters.bump('sessions', 2)
+        shards = set(MetricCounter.objects.exclude(value=0).values_list('shard', flat=True))
+        self.assertEqual(len(shards), 1)
+        self.assertEqual(counters.read_counters()['courses'], 5)
+        self.assertEqual(counters.read_counters()['sessions'], 10)
+
+
+class SchedulingTests(TestCase):
+    day = datetime(2030, 1, 7, tzinfo=dt_timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tutor = Tutor.objects.create(user=User.objects.create_user('tutor'))
+        cls.course = Course.objects.create(title='Course', slug='course', description='', tutor=cls.tutor)
+        Availability.objects.create(tutor=cls.tutor, start_time=cls.at(9), end_time=cls.at(17))
+        for start, end in ((10, 11), (11, 12), (14, 15)):
+            Session.objects.create(course=cls.course, start_time=cls.at(start), end_time=cls.at(end))
+
+    @classmethod
+    def at(cls, hour, minute=0):
+        return cls.day + timedelta(hours=hour, minutes=minute)
+
+    def session(self, start, end):
+        return Session(course=self.course, start_time=start, end_time=end)
+
+    def test_overlap_detection(self):
+        self.assertEqual(scheduling.find_conflicts(self.tutor, (self.at(10, 30), self.at(14, 30))).count(), 3)
+        # Touching intervals do not overlap
+        self.assertFalse(scheduling.find_conflicts(self.tutor, (self.at(12), self.at(14))).exists())
+        self.session(self.at(12), self.at(14)).full_clean()
+        with self.assertRaisesMessage(ValidationError, 'already teaches'):
+            self.session(self.at(11, 30), self.at(12, 30)).full_clean()
+        existing = Session.objects.get(start_time=self.at(14))
+        existing.end_time = self.at(15, 30)
+        existing.full_clean()
+
+    def test_interval_cap(self):
+        with self.assertRaisesMessage(ValidationError, 'may not be longer'):
+            self.session(self.at(0), self.at(0) + scheduling.MAX_SESSION_LENGTH + timedelta(minutes=1)).full_clean()
+        with self.assertRaisesMessage(ValidationError, 'after the start time'):
+            self.session(self.at(13), self.at(13)).full_clean()
+        # A capped session that started long before the window is still found
+        start = self.at(20)
+        Session.objects.create(course=self.course, start_time=start, end_time=start + scheduling.MAX_SESSION_LENGTH)
+        window = (start + scheduling.MAX_SESSION_LENGTH - timedelta(minutes=1), start + scheduling.MAX_SESSION_LENGTH)
+        self.assertEqual(scheduling.find_conflicts(self.tutor, window).count(), 1)
+
+    def test_require_availability(self):
+        outside = self.session(self.at(17), self.at(18))
+        outside.full_clean()
+        with override_settings(SCHEDULING_REQUIRE_AVAILABILITY=True):
+            with self.assertRaisesMessage(ValidationError, 'availability'):
+                outside.full_clean()
+            self.session(self.at(16), self.at(17)).full_clean()
+
+    def test_free_slots(self):
+        slots = scheduling.find_free_slots(self.tutor, (self.at(0), self.at(23)), timedelta(hours=1))
+        # The adjacent 10-11 and 11-12 sessions form one busy block
+        self.assertEqual(slots, [(self.at(9), self.at(10)), (self.at(12), self.at(14)), (self.at(15), self.at(17))])
+        # Clipped to the window; a gap shorter than the duration is dropped
+        slots = scheduling.find_free_slots(self.tutor, (self.at(9, 30), self.at(16)), timedelta(hours=1))
+        self.assertEqual(slots, [(self.at(12), self.at(14)), (self.at(15), self.at(16))])
+        self.assertEqual(scheduling.find_free_slots(self.tutor, (self.at(17), self.at(20)), timedelta(minutes=1)), [])
+
+
+class CheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tutor = Tutor.objects.create(user=User.objects.create_user('tutor'))
+        course = Course.objects.create(title='Course', slug='course', description='', tutor=tutor, price_cents=2500)
+        cls.enrollment = Enrollment.objects.create(student=User.objects.create_user('student'), course=course)
+
+    def setUp(self):
+        self.stripe = StripeStubServer()
+        self.stripe.start()
+        self.addCleanup(self.stripe.server_close)
+        self.addCleanup(self.stripe.shutdown)
+        # Clients are kept per API key for the life of the process
+        clients = mock.patch.dict(payments._clients, clear=True)
+        clients.start()
+        self.addCleanup(clients.stop)
+
+    def stripe_settings(self, **extra):
+        return override_settings(STRIPE_API_KEY='sk_test_stub', STRIPE_API_BASE=self.stripe.base_url, **extra)
+
+    def checkout(self, key='', **stripe_settings):
+        with self.stripe_settings(**stripe_settings):
+            return self.client.post('/checkout/', {'enrollment_id': self.enrollment.id, 'checkout_key': key})
+
+    def test_checkout_redirects_to_the_session(self):
+        response = self.checkout()
+        [session] = self.stripe.sessions.values()
+        self.assertRedirects(response, session['url'], fetch_redirect_response=False)
+        self.assertEqual(session['amount_total'], 2500)
+        self.assertEqual(session['metadata'], {'enrollment_id': str(self.enrollment.id)})
+
+    def test_each_checkout_creates_one_session(self):
+        for _ in range(3):
+            self.assertEqual(self.checkout().status_code, 302)
+        self.assertEqual(len(self.stripe.sessions), 3)
+
+    def test_resubmitted_form_reuses_the_session(self):
+        with self.stripe_settings():
+            key = self.client.get(f'/checkout/?enrollment_id={self.enrollment.id}').context['checkout_key']
+        first, second = self.checkout(key), self.checkout(key)
+        self.assertEqual(first['Location'], second['Location'])
+        self.assertEqual(len(self.stripe.sessions), 1)
+
+    async def test_asgi_checkout_uses_httpx_on_the_running_loop(self):
+        self.assertIsNotNone(payments.httpx)
+        with self.stripe_settings():
+            for _ in range(2):
+                response = await self.async_client.post('/checkout/', {'enrollment_id': self.enrollment.id})
+                self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(self.stripe.sessions), 2)
+
+    def test_slow_provider_is_reported(self):
+        self.stripe.latency = 0.5
+        key = 'a' * 32
+        response = self.checkout(key, STRIPE_CONNECT_TIMEOUT=0.1, STRIPE_READ_TIMEOUT=0.1, STRIPE_MAX_RETRIES=0)
+        # The retry link keeps the attempt, so a session created after the timeout is reused
+        self.assertRedirects(response, f'/checkout/?enrollment_id={self.enrollment.id}&key={key}', fetch_redirect_response=False)
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET='whsec_test')
+class WebhookTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tutor = Tutor.objects.create(user=User.objects.create_user('tutor'))
+        course = Course.objects.create(title='Course', slug='course', description='', tutor=tutor, price_cents=2500)
+        cls.enrollment = Enrollment.objects.create(student=User.objects.create_user('student'), course=course)
+
+    def setUp(self):
+        site_setting_cache.invalidate()
+
+    def deliver(self, event_id, event_type, obj):
+        payload = json.dumps({'id': event_id, 'object': 'event', 'type': event_type, 'data': {'object': obj}})
+        timestamp = int(time.time())
+        signature = hmac.new(b'whsec_test', f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+        return self.client.post(
+            '/webhooks/stripe/', payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=f't={timestamp},v1={signature}',
+        )
+
+    def completed(self, event_id='evt_1'):
+        return self.deliver(event_id, 'checkout.session.completed', {
+            'id': 'cs_1', 'payment_intent': 'pi_1', 'amount_total': 2500, 'currency': 'usd',
+            'payment_status': 'paid', 'metadata': {'enrollment_id': str(self.enrollment.id)},
+        })
+
+    def test_enqueue_apply_and_duplicate_delivery(self):
+        self.assertEqual(self.completed().status_code, 200)
+        self.assertEqual(self.completed().status_code, 200)
+        self.assertEqual(self.client.post('/webhooks/stripe/', '{}', content_type='application/json').status_code, 400)
+        self.assertEqual(WebhookEvent.objects.get().status, WebhookEvent.STATUS_PENDING)
+        self.assertEqual(webhooks.process_batch(10), {WebhookEvent.STATUS_PROCESSED: 1})
+        self.assertEqual(webhooks.process_batch(10), {})
+        payment = Payment.objects.get()
+        self.assertEqual((payment.enrollment_id, payment.amount_cents, payment.status), (self.enrollment.id, 2500, 'paid'))
+
+    def test_failed_event_backs_off_before_retrying(self):
+        self.completed()
+        event = WebhookEvent.objects.get()
+        failing = mock.Mock(side_effect=RuntimeError('database away'))
+        with mock.patch.dict(webhooks.HANDLERS, {'checkout.session.completed': failing}):
+            self.assertEqual(webhooks.process_batch(10), {'retrying': 1})
+            # Not due yet: the next drain leaves it alone
+            self.assertEqual(webhooks.process_batch(10), {})
+            event.refresh_from_db()
+            self.assertEqual((event.attempts, event.last_error), (1, 'RuntimeError: database away'))
+            self.assertAlmostEqual(
+                (event.next_attempt_at - timezone.now()).total_seconds(), webhooks.RETRY_BASE_SECONDS, delta=5,
+            )
+            self.assertEqual(webhooks.retry_delay(3).total_seconds(), webhooks.RETRY_BASE_SECONDS * 4)
+            for _ in range(2, webhooks.MAX_ATTEMPTS):
+                WebhookEvent.objects.update(next_attempt_at=timezone.now())
+                self.assertEqual(webhooks.process_batch(10), {'retrying': 1})
+        # Recovered before running out of attempts
+        WebhookEvent.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(webhooks.process_batch(10), {WebhookEvent.STATUS_PROCESSED: 1})
+        event.refresh_from_db()
+        self.assertEqual((event.attempts, event.last_error), (webhooks.MAX_ATTEMPTS, ''))
+
+    def test_gives_up_after_max_attempts(self):
+        self.completed()
+        with mock.patch.dict(webhooks.HANDLERS, {'checkout.session.completed': mock.Mock(side_effect=ValueError)}):
+            for _ in range(webhooks.MAX_ATTEMPTS):
+                WebhookEvent.objects.update(next_attempt_at=timezone.now())
+                webhooks.process_batch(10)
+        self.assertEqual(WebhookEvent.objects.get().status, WebhookEvent.STATUS_FAILED)
+        self.assertEqual(webhooks.queue_stats()['failed'], 1)
+
+
+class CourseSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tutor = Tutor.objects.create(user=User.objects.create_user('tutor'))
+        for slug, title, description, price in (
+            ('algebra', 'Algebra', 'Equations', 1000),
+            ('geometry', 'Geometry', 'Shapes and some algebra', 2000),
+            ('algebra-ii', 'Algebra II', 'More algebra', 3000),
+            ('poetry', 'Poetry', 'Rhymes', 1000),
+        ):
+            Course.objects.create(title=title, slug=slug, description=description, tutor=tutor, price_cents=price)
+
+    def setUp(self):
+        search.course_search_index.invalidate()
+
+    def slugs(self, queryset):
+        return [course.slug for course in queryset]
+
+    def test_inverted_index_ranking_and_cap(self):
+        self.assertEqual(self.slugs(search.search_courses(Course.objects.all(), 'algebra')), ['algebra-ii', 'algebra', 'geometry'])
+        self.assertEqual(self.slugs(search.search_courses(Course.objects.all(), 'nothing here')), [])
+        with mock.patch.object(search, 'MAX_RESULTS', 2):
+            # The cap keeps the best matches that pass the other filters
+            courses = search.search_courses(Course.objects.all(), 'algebra', max_price_cents=2000)
+            self.assertEqual(self.slugs(courses), ['algebra', 'geometry'])
+
+    def test_fulltext_query(self):
+        with mock.patch.object(search, 'uses_fulltext', return_value=True):
+            queryset = search.search_courses(Course.objects.all(), 'algebra', min_price_cents=1000)
+        sql, params = queryset.query.sql_with_params()
+        self.assertIn('MATCH (mmi_app_course.title, mmi_app_course.description) AGAINST (%s IN NATURAL LANGUAGE MODE)', sql)
+        self.assertIn('algebra', params)
+        self.assertEqual(queryset.query.order_by, ('-relevance', 'id'))
+
+    def test_non_finite_prices(self):
+        for value in ('inf', '-inf', 'nan', '1e400'):
+            with self.subTest(value=value):
+                self.assertEqual(self.client.get(f'/api/courses/?min_price_cents={value}').status_code, 400)
+                self.assertEqual(self.client.get(f'/courses/?min_price={value}').status_code, 200)
+
+
+class ApprovalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tutor = Tutor.objects.create(user=User.objects.create_user('tutor'))
+        course = Course.objects.create(title='Course', slug='course', description='', tutor=tutor)
+        start = timezone.now() + timedelta(days=1)
+        cls.session = Session.objects.create(course=course, start_time=start, end_time=start + timedelta(hours=1), capacity=10)
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+        cls.requests = []
+        for i in range(5):
+            student = User.objects.create_user(f'student-{i}')
+            seats.reserve_seat(student, cls.session.id)
+            cls.requests.append(ActionRequest.objects.create(
+                request_type=ActionRequest.REQUEST_CANCEL_BOOKING, requested_by=student,
+                booking=Booking.objects.get(student=student),
+            ))
+
+    def test_chunked_approval(self):
+        bookings_before = counters.read_counters()['bookings']
+        with CaptureQueriesContext(connection) as queries:
+            result = approvals.approve_requests(ActionRequest.objects.all(), self.staff, chunk_size=2)
+        self.assertEqual(len(result.processed), 5)
+        self.assertFalse(Booking.objects.exists())
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.booked_count, 0)
+        # The requests outlive their bookings, with the booking set to NULL
+        self.assertEqual(
+            set(ActionRequest.objects.values_list('status', 'booking_id', 'reviewed_by')),
+            {(ActionRequest.STATUS_APPROVED, None, self.staff.id)},
+        )
+        # Counter bumps are deferred to one UPDATE per chunk
+        counter_updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "mmi_app_metriccounter"')]
+        self.assertEqual(len(counter_updates), 3)
+        self.assertEqual(counters.read_counters()['bookings'], bookings_before - 5)
+
+    def test_reports_skipped_and_failed_items(self):
+        first, second = self.requests[:2]
+        approvals.reject_requests([first.id], self.staff)
+        seats.cancel_bookings([second.booking_id])
+        result = approvals.approve_requests([first.id, second.id, self.requests[2].id], self.staff)
+        self.assertEqual(result.as_dict(), {
+            'processed': 1, 'skipped': [first.id], 'failed': {str(second.id): 'Booking no longer exists.'},
+        })
+
+    def test_command_and_api(self):
+        out = StringIO()
+        call_command('review_requests', 'reject', str(self.requests[0].id), '--reviewer', 'staff', stdout=out)
+        self.assertIn('Rejected 1 request(s); 0 skipped, 0 failed.', out.getvalue())
+        response = self.client.post(
+            '/api/action-requests/review/', {'decision': 'approve', 'ids': [r.id for r in self.requests]},
+            content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.staff)}',
+        )
+        self.assertEqual(response.json(), {'processed': 4, 'skipped': [self.requests[0].id], 'failed': {}})
+        student = self.requests[1].requested_by
+        response = self.client.post(
+            '/api/action-requests/review/', {'decision': 'approve', 'ids': []},
+            content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(student)}',
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+@mock.patch('rest_framework.views.APIView.authentication_classes', [StatelessJWTAuthentication])
+class StatelessJWTTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('student', password='secret-password')
+
+    def setUp(self):
+        revocations.invalidate()
+        # Another worker's revocation only reaches this one through the database
+        interval = mock.patch.object(revocations, 'check_interval', 0)
+        interval.start()
+        self.addCleanup(interval.stop)
+
+    def get(self, token):
+        return self.client.get('/api/enrollments/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_claims_token_is_rejected_after_revocation(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        self.assertEqual(self.get(token).status_code, 200)
+        self.user.set_password('new-password')
+        self.user.save()
+        response = self.get(token)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['detail'], 'Token has been revoked.')
+        # Tokens authenticated after the change are fine
+        time.sleep(0.01)
+        self.assertEqual(self.get(ClaimsTokenObtainPairSerializer.get_token(self.user).access_token).status_code, 200)
+
+    def test_token_without_claims_loads_the_user(self):
+        token = AccessToken.for_user(self.user)
+        self.assertEqual(self.get(token).status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.get(token).status_code, 401)
+
+
+class VersionedValueTests(TestCase):
+    def setUp(self):
+        # Don't leave the rows of this test in the process-wide cache
+        self.addCleanup(site_setting_cache.invalidate)
+
+    def test_per_process_cache_reloads_after_check_interval(self):
+        SiteSetting.objects.create(stripe_api_key='sk_old')
+        with mock.patch.object(site_setting_cache, 'check_interval', 0):
+            site_setting_cache.invalidate()
+            self.assertEqual(get_stripe_keys()[0], 'sk_old')
+            # Saved by another worker: its stamp bump never reaches this process' LocMemCache
+            SiteSetting.objects.update(stripe_api_key='sk_new')
+            self.assertEqual(get_stripe_keys()[0], 'sk_new')
+
+    def test_shared_cache_reloads_only_on_a_new_stamp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+        loads = []
+        with override_settings(CACHES=shared):
+            value = VersionedValue('test', lambda: loads.append(1) or len(loads), check_interval=0)
+            self.assertEqual((value.get(), value.get()), (1, 1))
+            # Another worker's copy of the same value invalidates through the shared stamp
+            VersionedValue('test', lambda: None).invalidate()
+            self.assertEqual(value.get(), 2)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """A second SQLite file stands in for the replica; each holds a different SiteSetting row."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.location = tempfile.mkdtemp()
+        connections.settings['replica'] = {
+            **connections.settings['default'],
+            'NAME': os.path.join(cls.location, 'replica.sqlite3'),
+            'TEST': {**connections.settings['default']['TEST'], 'MIRROR': None},
+        }
+        # Added after the runner's checks, which would look for it in settings.DATABASES
+        cls.databases = cls.databases | {'replica'}
+        call_command('migrate', database='replica', verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        shutil.rmtree(cls.location, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        SiteSetting.objects.create(name='primary')
+        SiteSetting.objects.using('replica').create(name='replica')
+        location = tempfile.mkdtemp(dir=self.location)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+        self.enterContext(mock.patch.object(routers, 'REPLICAS', ['replica']))
+        self.enterContext(override_settings(CACHES=shared, DATABASE_ROUTERS=['mmi_app.routers.ReplicaRouter']))
+        self.factory = RequestFactory()
+
+    @staticmethod
+    def view(request):
+        if request.method == 'POST':
+            SiteSetting.objects.create(name='new')
+        return HttpResponse(','.join(SiteSetting.objects.order_by('pk').values_list('name', flat=True)))
+
+    def test_reads_follow_the_client_writes(self):
+        middleware = routers.ReplicaPinMiddleware(self.view)
+        self.assertEqual(middleware(self.factory.get('/')).content, b'replica')
+        response = middleware(self.factory.post('/'))
+        self.assertEqual(response.content, b'primary,new')
+        # The browser comes back with the pin cookie
+        request = self.factory.get('/')
+        request.COOKIES[routers.PIN_COOKIE] = response.cookies[routers.PIN_COOKIE].value
+        self.assertEqual(middleware(request).content, b'primary,new')
+
+    def test_bearer_clients_are_pinned_through_the_cache(self):
+        middleware = routers.ReplicaPinMiddleware(self.view)
+        auth = {'HTTP_AUTHORIZATION': 'Bearer abc'}
+        middleware(self.factory.post('/', **auth))
+        self.assertEqual(middleware(self.factory.get('/', **auth)).content, b'primary,new')
+        self.assertEqual(middleware(self.factory.get('/', HTTP_AUTHORIZATION='Bearer xyz')).content, b'replica')
+
+    def test_async_stack(self):
+        async def view(request):
+            return await sync_to_async(self.view)(request)
+
+        middleware = routers.ReplicaPinMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertEqual(async_to_sync(middleware)(self.factory.get('/')).content, b'replica')
+        self.assertEqual(async_to_sync(middleware)(self.factory.post('/')).content, b'primary,new')
+
+    def test_needs_a_shared_cache(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            with self.assertRaises(ImproperlyConfigured):
+                routers.ReplicaPinMiddleware(self.view)
+
+
+class DownloadTests(TestCase):
+    CONTENT = b'0123456789' * 10
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        tutor = Tutor.objects.create(user=User.objects.create_user('tutor'))
+        course = Course.objects.create(title='Course', slug='course', description='', tutor=tutor)
+        cls.resource = Resource.objects.create(course=course, title='Notes')
+        cls.resource.file.save('notes.txt', ContentFile(cls.CONTENT))
+        cls.token = ClaimsTokenObtainPairSerializer.get_token(User.objects.create_user('student')).access_token
+
+    def get(self, **headers):
+        response = self.client.get(
+            f'/api/resources/{self.resource.id}/download/', HTTP_AUTHORIZATION=f'Bearer {self.token}', **headers,
+        )
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_parse_range(self):
+        self.assertEqual(downloads.parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(downloads.parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(downloads.parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(downloads.parse_range('bytes=-500', 100), (0, 99))
+        self.assertEqual(downloads.parse_range('bytes=95-500', 100), (95, 99))
+        self.assertIsNone(downloads.parse_range('bytes=0-1,5-6', 100))
+        self.assertIsNone(downloads.parse_range('', 100))
+        for header, size in (('bytes=100-', 100), ('bytes=5-2', 100), ('bytes=-0', 100), ('bytes=-1', 0), ('bytes=0-', 0)):
+            with self.subTest(header=header, size=size), self.assertRaises(downloads.RangeNotSatisfiable):
+                downloads.parse_range(header, size)
+
+    def test_full_and_partial_content(self):
+        response, body = self.get()
+        self.assertEqual((response.status_code, body), (200, self.CONTENT))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        response, body = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual((response.status_code, body), (206, self.CONTENT[10:20]))
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(response['Content-Length'], '10')
+
+    def test_unsatisfiable_range(self):
+        response, _ = self.get(HTTP_RANGE='bytes=200-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_if_range(self):
+        full, _ = self.get()
+        etag, last_modified = full['ETag'], full['Last-Modified']
+        for validator in (etag, last_modified):
+            response, body = self.get(HTTP_RANGE='bytes=0-4', HTTP_IF_RANGE=validator)
+            self.assertEqual((response.status_code, body), (206, self.CONTENT[:5]))
+        # A stale validator gets the whole (changed) file instead of a range of it
+        response, body = self.get(HTTP_RANGE='bytes=0-4', HTTP_IF_RANGE='"stale"')
+        self.assertEqual((response.status_code, body), (200, self.CONTENT))
+        response, _ = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_proxy_sendfile(self):
+        with mock.patch.object(downloads, 'SENDFILE', 'nginx'):
+            response, body = self.get(HTTP_RANGE='bytes=0-4')
+        self.assertEqual((response.status_code, body), (200, b''))
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.resource.file.name}')
+        self.assertFalse(response.has_header('Content-Type'))
+        with mock.patch.object(downloads, 'SENDFILE', 'apache'):
+            response, _ = self.get()
+        self.assertEqual(response['X-Sendfile'], self.resource.file.path)
+
+
+class AdmissionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tutor = Tutor.objects.create(user=User.objects.create_user('tutor'))
+        course = Course.objects.create(title='Course', slug='course', description='', tutor=tutor)
+        start = timezone.now() + timedelta(days=1)
+        cls.session = Session.objects.create(course=course, start_time=start, end_time=start + timedelta(hours=1), capacity=2)
+        cls.students = [User.objects.create_user(f'student-{i}') for i in range(4)]
+
+    def enqueue(self, *students):
+        return [admission.enqueue(student.pk, self.session.id) for student in students]
+
+    def statuses(self, requests):
+        return [BookingRequest.objects.get(pk=r.pk).status for r in requests]
+
+    def test_admits_first_come_first_served(self):
+        first, second, third, fourth = self.students
+        requests = self.enqueue(fourth, second, second, first, third)
+        self.assertEqual(admission.queue_stats()['pending'], 5)
+        outcome = admission.process_batch(10)
+        self.assertEqual(self.statuses(requests), [
+            BookingRequest.STATUS_BOOKED, BookingRequest.STATUS_BOOKED, BookingRequest.STATUS_ALREADY_BOOKED,
+            BookingRequest.STATUS_FULL, BookingRequest.STATUS_FULL,
+        ])
+        self.assertEqual(outcome, {
+            BookingRequest.STATUS_BOOKED: 2, BookingRequest.STATUS_ALREADY_BOOKED: 1, BookingRequest.STATUS_FULL: 2,
+        })
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.booked_count, 2)
+        self.assertEqual(set(Booking.objects.values_list('student_id', flat=True)), {fourth.pk, second.pk})
+
+    def test_batches_respect_seats_taken_earlier(self):
+        seats.reserve_seat(self.students[0], self.session.id)
+        requests = self.enqueue(self.students[0], *self.students[1:3])
+        self.assertEqual(admission.process_batch(2), {
+            BookingRequest.STATUS_ALREADY_BOOKED: 1, BookingRequest.STATUS_BOOKED: 1,
+        })
+        self.assertEqual(self.statuses(requests)[2], BookingRequest.STATUS_PENDING)
+        self.assertEqual(admission.process_batch(2), {BookingRequest.STATUS_FULL: 1})
+        self.assertEqual(admission.process_batch(2), {})
+
+    def test_missing_session_is_not_queued(self):
+        with transaction.atomic():
+            self.assertIsNone(admission.enqueue(self.students[0].pk, 0))
+            # The surrounding transaction is still usable
+            self.assertEqual(BookingRequest.objects.count(), 0)
+
+    def test_api_queues_when_enabled(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(self.students[0]).access_token
+        with mock.patch.object(admission, 'QUEUE_ENABLED', True):
+            response = self.client.post(
+                '/api/bookings/', {'session': self.session.id}, content_type='application/json',
+                HTTP_AUTHORIZATION=f'Bearer {token}',
+            )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], BookingRequest.STATUS_PENDING)
+        self.assertFalse(Booking.objects.exists())
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tutor = Tutor.objects.create(user=User.objects.create_user('tutor'))
+        course = Course.objects.create(title='Algebra', slug='algebra', description='', tutor=tutor, price_cents=1000)
+        start = timezone.now() + timedelta(days=1)
+        cls.session = Session.objects.create(course=course, start_time=start, end_time=start + timedelta(hours=1), capacity=1)
+        cls.student = User.objects.create_user('student')
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self):
+        return self.client.get('/courses/algebra/')
+
+    def test_seat_changes_invalidate_the_course_page(self):
+        self.assertContains(self.get(), '1 of 1 seats left')
+        self.assertEqual(self.get()['X-Page-Cache'], 'hit')
+        with self.captureOnCommitCallbacks(execute=True):
+            seats.reserve_seat(self.student, self.session.id)
+        response = self.get()
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, '0 of 1 seats left')
+        with self.captureOnCommitCallbacks(execute=True):
+            seats.cancel_bookings(Booking.objects.values_list('id', flat=True))
+        self.assertContains(self.get(), '1 of 1 seats left')
+
+    def test_admitted_requests_invalidate_the_course_page(self):
+        self.get()
+        admission.enqueue(self.student.pk, self.session.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            admission.process_batch(10)
+        self.assertContains(self.get(), '0 of 1 seats left')
+
+    def test_benchmarks_leave_the_rest_of_the_cache(self):
+        cache.set('other-app', 'kept')
+        self.get()
+        self.assertEqual(self.get()['X-Page-Cache'], 'hit')
+        # The route is measured cold, without clearing the cache other workers may share
+        result = benchmarks.run_route(benchmarks.Route('course', '/courses/algebra/', 5), fx={}, repeat=1)
+        self.assertGreater(result['queries'], 0)
+        self.assertEqual(cache.get('other-app'), 'kept')
+        invalidate_all_pages()
+        self.assertEqual(self.get()['X-Page-Cache'], 'miss')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tutor = Tutor.objects.create(user=User.objects.create_user('tutor'))
+        cls.course = Course.objects.create(title='Algebra', slug='algebra', description='', tutor=tutor, price_cents=1000)
+        start = timezone.now() + timedelta(days=1)
+        cls.session = Session.objects.create(course=cls.course, start_time=start, end_time=start + timedelta(hours=1), capacity=5)
+
+    def setUp(self):
+        cache.clear()
+
+    def change(self, instance, delete=False):
+        with self.captureOnCommitCallbacks(execute=True):
+            instance.delete() if delete else instance.save()
+
+    def test_anonymous_pages_revalidate(self):
+        for url in ('/', '/courses/', '/courses/algebra/', '/tutors/'):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            # Every one of these pages shows the tutor
+            self.change(self.course.tutor)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+
+    def test_deleting_the_last_session_changes_the_detail_page(self):
+        etag = self.client.get('/courses/algebra/')['ETag']
+        self.change(self.course)
+        self.change(self.session, delete=True)
+        self.assertEqual(self.client.get('/courses/algebra/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_page_cache_hits_answer_without_queries(self):
+        etag = self.client.get('/courses/')['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/courses/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            response = self.client.get('/courses/')
+        self.assertEqual((response.status_code, response['ETag']), (200, etag))
+
+    def test_new_csrf_cookie_renders_the_page(self):
+        etag = self.client.get('/courses/')['ETag']
+        cache.clear()
+        self.client.cookies['csrftoken'] = 'x' * 32
+        self.assertEqual(self.client.get('/courses/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_signed_in_pages_are_always_rendered(self):
+        etag = self.client.get('/courses/')['ETag']
+        self.client.force_login(User.objects.create_user('student'))
+        response = self.client.get('/courses/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_api_list_and_detail(self):
+        for url in ('/api/courses/', f'/api/courses/{self.course.pk}/', '/api/sessions/'):
+            self.change(self.course)
+            response = self.client.get(url)
+            etag, last_modified = response['ETag'], response['Last-Modified']
+            with self.assertNumQueries(1):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+            self.change(self.course.tutor)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_seat_changes_move_the_session_stamp(self):
+        etag = self.client.get('/courses/algebra/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            seats.reserve_seat(User.objects.create_user('student'), self.session.id)
+        self.assertEqual(self.client.get('/courses/algebra/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class DashboardQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tutor = Tutor.objects.create(user=User.objects.create_user('tutor'))
+        cls.student = User.objects.create_user('student')
+        start = timezone.now() + timedelta(days=1)
+        for i in range(3):
+            course = Course.objects.create(title=f'Course {i}', slug=f'course-{i}', description='', tutor=tutor, price_cents=1000)
+            enrollment = Enrollment.objects.create(student=cls.student, course=course)
+            if i == 0:
+                Payment.objects.create(enrollment=enrollment, amount_cents=1000, stripe_payment_intent='pi_0', status='paid')
+            session = Session.objects.create(course=course, start_time=start, end_time=start + timedelta(hours=1), capacity=5)
+            Booking.objects.create(student=cls.student, session=session)
+
+    def add_history(self, per_booking):
+        for booking in Booking.objects.filter(student=self.student):
+            for status in [ActionRequest.STATUS_REJECTED] * (per_booking - 1) + [ActionRequest.STATUS_PENDING]:
+                ActionRequest.objects.create(
+                    request_type=ActionRequest.REQUEST_CANCEL_BOOKING, booking=booking, requested_by=self.student, status=status,
+                )
+
+    def test_query_count_does_not_grow_with_history(self):
+        self.client.force_login(self.student)
+        # session, user, enrollments, bookings, recent requests
+        for per_booking in (1, 20):
+            self.add_history(per_booking)
+            with self.assertNumQueries(5):
+                response = self.client.get('/dashboard/')
+            self.assertEqual(response.status_code, 200)
+
+    def test_latest_request_status_and_paid_flag(self):
+        self.add_history(3)
+        self.client.force_login(self.student)
+        response = self.client.get('/dashboard/')
+        self.assertEqual({b.request_status for b in response.context['bookings']}, {ActionRequest.STATUS_PENDING})
+        paid = {e.course.slug: e.is_paid for e in response.context['enrollments']}
+        self.assertEqual(paid, {'course-0': True, 'course-1': False, 'course-2': False})
+
+
+class MetricsMiddlewareTests(TestCase):
+    def test_runs_in_the_mode_of_the_stack(self):
+        async def async_view(request):
+            return None
+        self.assertTrue(iscoroutinefunction(instrumentation.RequestMetricsMiddleware(async_view)))
+        self.assertFalse(iscoroutinefunction(instrumentation.RequestMetricsMiddleware(lambda request: None)))
+
+    def test_times_sync_requests(self):
+        response = self.client.get('/api/tutors/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+    async def test_times_async_requests(self):
+        response = await self.async_client.get('/api/tutors/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(dbpool.time, 'monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.opened = []
+
+    def connect(self):
+        connection = FakeConnection()
+        self.opened.append(connection)
+        return connection
+
+    def pool(self, **kwargs):
+        return dbpool.ConnectionPool(connect=self.connect, validate=lambda c: c.alive, **kwargs)
+
+    def test_release_reuses_the_connection(self):
+        pool = self.pool()
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(pool.stats()['created_total'], 1)
+
+    def test_times_out_at_max_size(self):
+        pool = self.pool(max_size=1, timeout=0)
+        pool.acquire()
+        with self.assertRaises(dbpool.PoolTimeout):
+            pool.acquire()
+        self.assertEqual(pool.stats()['timeouts_total'], 1)
+
+    def test_discard_and_lifetime_close_connections(self):
+        pool = self.pool(max_lifetime=60)
+        first = pool.acquire()
+        pool.release(first, discard=True)
+        self.assertTrue(first.closed)
+        second = pool.acquire()
+        pool.release(second)
+        self.now += 61
+        third = pool.acquire()
+        self.assertTrue(second.closed)
+        self.assertIsNot(third, second)
+
+    def test_prunes_idle_connections_above_min_size(self):
+        pool = self.pool(min_size=1, max_idle=10, max_lifetime=0)
+        first, second = pool.acquire(), pool.acquire()
+        pool.release(first)
+        self.now += 11
+        pool.release(second)
+        self.assertTrue(first.closed)
+        self.assertFalse(second.closed)
+        self.assertEqual(pool.size, 1)
+
+    def test_failed_check_replaces_the_connection(self):
+        pool = self.pool(check_after=30, max_lifetime=0)
+        first = pool.acquire()
+        pool.release(first)
+        first.alive = False
+        self.now += 31
+        second = pool.acquire()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['failed_checks_total'], 1)
+
+    def test_fill_opens_min_size(self):
+        pool = self.pool(min_size=3)
+        pool.fill()
+        self.assertEqual(pool.stats()['idle'], 3)
+        self.assertEqual(len(self.opened), 3)
+
+    @unittest.skipUnless(importlib.util.find_spec('pymysql'), 'PyMySQL is not installed')
+    def test_ping_does_not_reconnect(self):
+        from .pooled_mysql.base import DatabaseWrapper
+        connection = mock.Mock()
+        self.assertTrue(DatabaseWrapper._ping(connection))
+        connection.ping.assert_called_once_with(False)
+
+
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tutor = Tutor.objects.create(user=User.objects.create_user('tutor', first_name='Ada'))
+        course = Course.objects.create(title='Algebra', slug='algebra', description='Long text', tutor=tutor)
+        start = timezone.now() + timedelta(days=1)
+        cls.session = Session.objects.create(course=course, start_time=start, end_time=start + timedelta(hours=1))
+
+    def get(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_fields_and_expand(self):
+        with self.assertNumQueries(2):
+            rows = self.get('/api/sessions/?fields=id,start_time,end_time')['results']
+        self.assertEqual(list(rows[0]), ['id', 'start_time', 'end_time'])
+        rows = self.get('/api/sessions/?fields=id,course')['results']
+        self.assertEqual(rows[0]['course'], self.session.course_id)
+        rows = self.get('/api/sessions/?fields=course.title,course.tutor&expand=course.tutor.user')['results']
+        self.assertEqual(rows[0]['course'], {'title': 'Algebra', 'tutor': {
+            'id': self.session.course.tutor_id, 'user': {
+                'id': self.session.course.tutor.user_id, 'username': 'tutor', 'first_name': 'Ada', 'last_name': '',
+            }, 'bio': '',
+        }})
+        detail = self.get(f'/api/sessions/{self.session.id}/?fields=id,course.title')
+        self.assertEqual(detail, {'id': self.session.id, 'course': {'title': 'Algebra'}})
+        self.assertEqual(self.get('/api/sessions/')['results'][0]['course']['tutor']['user']['first_name'], 'Ada')
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/api/sessions/?fields=id,nope&expand=capacity')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), ['Unknown field: nope', 'Cannot expand: capacity'])
+
+
+class KeysetPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tutor = Tutor.objects.create(user=User.objects.create_user('tutor'))
+        course = Course.objects.create(title='Algebra', slug='algebra', description='', tutor=tutor)
+        start = (timezone.now() + timedelta(days=1)).replace(microsecond=0)
+        # Five sessions share a start time, so pages must break the tie on id
+        starts = [start + timedelta(hours=1), start, start, start, start, start, start - timedelta(hours=1)]
+        cls.sessions = [
+            Session.objects.create(course=course, start_time=at, end_time=at + timedelta(minutes=30), capacity=2)
+            for at in starts
+        ]
+        past = start - timedelta(days=2)
+        Session.objects.create(course=course, start_time=past, end_time=past + timedelta(hours=1))
+        cls.expected = [s.id for s in sorted(cls.sessions, key=lambda s: (s.start_time, s.id))]
+
+    def test_pages_cover_every_row_once_in_order(self):
+        for page_size in (1, 2, 3, 7, 8):
+            ids, cursor = [], ''
+            while True:
+                rows, cursor = keyset_page(Session.objects.filter(start_time__gte=timezone.now()), cursor, page_size)
+                ids += [row.id for row in rows]
+                if cursor is None:
+                    break
+                self.assertEqual(len(rows), page_size)
+            self.assertEqual(ids, self.expected, page_size)
+
+    def test_cursor_round_trip(self):
+        session = self.sessions[1]
+        cursor = encode_keyset_cursor(session.start_time, session.id)
+        self.assertEqual(decode_keyset_cursor(cursor), (session.start_time, session.id))
+        for broken in ('', 'nonsense', '2025-01-01T00:00:00+00:00_x', f'{session.id}'):
+            self.assertIsNone(decode_keyset_cursor(broken), broken)
+
+    def test_bookings_page_follows_the_cursor(self):
+        ids, params = [], {}
+        with mock.patch.object(views, 'BOOKINGS_PAGE_SIZE', 2):
+            while True:
+                # Same query count on every page: the cursor is a seek, not an offset
+                with self.assertNumQueries(1):
+                    response = self.client.get('/bookings/', params)
+                ids += [s.id for s in response.context['sessions']]
+                if not response.context['next_cursor']:
+                    break
+                self.assertContains(response, f'?after={quote(response.context["next_cursor"])}')
+                params = {'after': response.context['next_cursor']}
+        self.assertEqual(ids, self.expected)
+        self.assertEqual({s.seats_left for s in response.context['sessions']}, {2})
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tutor = Tutor.objects.create(user=User.objects.create_user('tutor'))
+        cls.courses = [
+            Course.objects.create(title=f'Course {i}', slug=f'course-{i}', description='', tutor=tutor) for i in range(2)
+        ]
+        cls.start = start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        # Most sessions share a start time; the cursor must break the tie on id
+        starts = [start + timedelta(hours=1)] + [start] * 5 + [start - timedelta(hours=1)]
+        for i, at in enumerate(starts):
+            Session.objects.create(course=cls.courses[i % 2], start_time=at, end_time=at + timedelta(minutes=30))
+
+    def walk(self, path):
+        ids, pages = [], 0
+        while path:
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids += [row['id'] for row in data['results']]
+            path, pages = data['next'], pages + 1
+        return ids, pages
+
+    def test_sessions_page_by_start_time_then_id(self):
+        expected = list(Session.objects.order_by('start_time', 'id').values_list('id', flat=True))
+        for page_size in (1, 2, 3, 7):
+            ids, pages = self.walk(f'/api/sessions/?page_size={page_size}')
+            self.assertEqual(ids, expected, page_size)
+            self.assertEqual(pages, -(-len(expected) // page_size))
+
+    def test_filters_keep_the_order(self):
+        course = self.courses[0]
+        expected = list(Session.objects.filter(course=course).order_by('start_time', 'id').values_list('id', flat=True))
+        self.assertEqual(self.walk(f'/api/sessions/?course={course.id}&page_size=2')[0], expected)
+        after = (self.start + timedelta(minutes=1)).isoformat()
+        self.assertEqual(self.walk(f'/api/sessions/?starts_after={quote(after)}')[0], expected[-1:])
+
+    def test_rows_added_behind_the_cursor_do_not_shift_later_pages(self):
+        first = self.client.get('/api/sessions/?page_size=3').json()
+        early = self.start - timedelta(days=1)
+        Session.objects.create(course=self.courses[0], start_time=early, end_time=early + timedelta(hours=1))
+        rest, _ = self.walk(first['next'])
+        later = Session.objects.filter(start_time__gt=early).order_by('start_time', 'id')
+        expected = list(later.values_list('id', flat=True))
+        self.assertEqual([row['id'] for row in first['results']] + rest, expected)
+
+    def test_courses_page_by_id_and_cap_the_page_size(self):
+        self.assertEqual(self.walk('/api/courses/?page_size=1'), ([c.id for c in self.courses], 2))
+        with mock.patch.object(IdCursorPagination, 'max_page_size', 3):
+            self.assertEqual(len(self.client.get('/api/sessions/?page_size=100').json()['results']), 3)
+
+
+class ValuesReaderParityTests(TestCase):
+    """The `.values()` fast paths must render byte-for-byte what the serializers render."""
+
+    @classmethod
+    def setUpTestData(cls):
+        plain = Tutor.objects.create(user=User.objects.create_user('plain'))
+        named = Tutor.objects.create(
+            user=User.objects.create_user('zoë', first_name='Zoë', last_name="O'Neil"), bio='Bio\nwith "quotes"',
+        )
+        start = datetime(2025, 3, 30, 0, 30, 15, 123456, tzinfo=dt_timezone.utc)
+        for i, (tutor, price, active) in enumerate([(plain, 0, True), (named, 1999, False), (named, 2500, True)]):
+            course = Course.objects.create(
+                title=f'Cours n°{i}', slug=f'course-{i}', description='' if i else 'Ünïcode ✓', tutor=tutor,
+                price_cents=price, is_active=active,
+            )
+            for j in range(2):
+                begins = start + timedelta(days=i, hours=j)
+                Session.objects.create(
+                    course=course, start_time=begins, end_time=begins + timedelta(minutes=45), capacity=j + 1,
+                )
+
+    def assertSamePayload(self, viewset, path):
+        fast = self.client.get(path)
+        with mock.patch.object(viewset, 'get_values_reader', return_value=None):
+            slow = self.client.get(path)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content, path)
+
+    def test_list_fast_paths_match_the_serializers(self):
+        paths = {
+            TutorViewSet: ['/api/tutors/', '/api/tutors/?fields=id,user.username&expand=user'],
+            CourseViewSet: [
+                '/api/courses/', '/api/courses/?fields=title,tutor', '/api/courses/?expand=tutor.user&page_size=2',
+            ],
+            SessionViewSet: [
+                '/api/sessions/', '/api/sessions/?fields=id,start_time,end_time',
+                '/api/sessions/?fields=capacity,course.slug,course.tutor&expand=course.tutor.user',
+            ],
+        }
+        # Datetimes are rendered in the current time zone, here across a DST change
+        for zone in ('UTC', 'Europe/Berlin'):
+            with timezone.override(zone):
+                for viewset, urls in paths.items():
+                    for path in urls:
+                        with self.subTest(zone=zone, path=path):
+                            self.assertSamePayload(viewset, path)
+
+
+class ImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Tutor.objects.create(user=User.objects.create_user('tutor'))
+
+    def job(self, kind='courses'):
+        return ImportJob.objects.create(name=kind, kind=kind, source='test')
+
+    def courses_csv(self, *rows):
+        lines = ['title,slug,description,tutor,price_cents,is_active'] + [','.join(row) for row in rows]
+        return StringIO('\n'.join(lines) + '\n')
+
+    def test_resumes_after_the_last_committed_chunk(self):
+        rows = [(f'Course {i}', f'course-{i}', 'Intro', 'tutor', '1000', '') for i in range(5)]
+
+        def interrupt(job, rate):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            importers.run_import(
+                self.job(), importers.read_rows(self.courses_csv(*rows), 'csv'), chunk_size=2, on_chunk=interrupt,
+            )
+        job = ImportJob.objects.get()
+        self.assertEqual((job.rows_done, job.rows_created, job.finished), (2, 2, False))
+        # The file is read again from the start; committed records are skipped, not duplicated
+        importers.run_import(job, importers.read_rows(self.courses_csv(*rows), 'csv'), chunk_size=2)
+        job.refresh_from_db()
+        self.assertEqual((job.rows_done, job.rows_created, job.rows_rejected, job.finished), (5, 5, 0, True))
+        self.assertEqual(sorted(Course.objects.values_list('slug', flat=True)), [f'course-{i}' for i in range(5)])
+
+    def test_invalid_rows_are_rejected_with_their_record_number(self):
+        stream = self.courses_csv(
+            ('Algebra', 'algebra', 'Intro', 'tutor', '1000', 'yes'),
+            ('Geometry', 'geometry', 'Intro', 'nobody', '1000', ''),
+            ('', 'untitled', 'Intro', 'tutor', '1000', ''),
+            ('Algebra again', 'algebra', 'Intro', 'tutor', '1000', ''),
+            ('Calculus', 'calculus', 'Intro', 'tutor', '-5', ''),
+            ('Physics', 'physics', 'Intro', 'tutor', '1000', 'maybe'),
+        )
+        errors = {}
+        job = importers.run_import(self.job(), importers.read_rows(stream, 'csv'), on_error=errors.__setitem__)
+        self.assertEqual((job.rows_done, job.rows_created, job.rows_rejected), (6, 1, 5))
+        self.assertEqual(sorted(errors), [2, 3, 4, 5, 6])
+        self.assertIn('Unknown tutor "nobody"', errors[2])
+        self.assertIn('already exists', errors[4])
+        self.assertEqual(list(Course.objects.values_list('slug', flat=True)), ['algebra'])
+
+    def test_invalid_json_lines_and_intervals_are_rejected(self):
+        tutor = Tutor.objects.get()
+        Course.objects.create(title='Algebra', slug='algebra', description='', tutor=tutor)
+        start = timezone.now() + timedelta(days=1)
+        end = start + timedelta(hours=1)
+        session = {'course': 'algebra', 'start_time': start.isoformat(), 'end_time': end.isoformat()}
+        lines = [json.dumps(session), '{not json', json.dumps(dict(session, end_time=start.isoformat())), '[]', '']
+        errors = {}
+        rows = importers.read_rows(StringIO('\n'.join(lines)), 'jsonl')
+        job = importers.run_import(self.job('sessions'), rows, on_error=errors.__setitem__)
+        self.assertEqual((job.rows_done, job.rows_created, job.rows_rejected), (4, 1, 3))
+        self.assertIn('Invalid JSON', errors[2])
+        self.assertIn('End time must be after the start time.', errors[3])
+        self.assertEqual(errors[4], 'Expected a JSON object.')
+
+    def test_too_many_errors_stops_before_the_chunk_commits(self):
+        rejected = [('X', f'x-{i}', 'Intro', 'nobody', '0', '') for i in range(3)]
+        stream = self.courses_csv(('Algebra', 'algebra', 'Intro', 'tutor', '0', ''), *rejected)
+        job = self.job()
+        with self.assertRaises(importers.TooManyErrors):
+            importers.run_import(job, importers.read_rows(stream, 'csv'), max_errors=2)
+        job.refresh_from_db()
+        self.assertEqual(job.rows_done, 0)
+        self.assertFalse(Course.objects.exists())
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tutor = Tutor.objects.create(user=User.objects.create_user('tutor'))
+        cls.courses = [
+            Course.objects.create(title=f'Course {i}', slug=f'course-{i}', description='', tutor=tutor) for i in range(2)
+        ]
+        students = [User.objects.create_user(f'student{i}', f's{i}@example.com') for i in range(5)]
+        cls.enrollments = [
+            Enrollment.objects.create(student=student, course=cls.courses[i % 2]) for i, student in enumerate(students)
+        ]
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+
+    def get(self, path, user=None):
+        token = ClaimsTokenObtainPairSerializer.get_token(user or self.staff).access_token
+        return self.client.get(path, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_csv_has_the_header_and_one_row_per_enrollment(self):
+        response = self.get('/api/exports/enrollments.csv?course=course-0')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], exports.columns('enrollments'))
+        expected = [e for e in self.enrollments if e.course == self.courses[0]]
+        self.assertEqual(
+            [row[:3] for row in rows[1:]], [[str(e.id), e.created_at.isoformat(), str(e.student_id)] for e in expected]
+        )
+        self.assertEqual({row[6] for row in rows[1:]}, {'course-0'})
+
+    def test_ndjson_has_one_object_per_line(self):
+        response = self.get('/api/exports/enrollments.ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['student_username'] for line in lines], [f'student{i}' for i in range(5)])
+
+    def test_streams_in_batches_without_loading_the_queryset(self):
+        chunks = exports.stream('enrollments', 'csv', exports.export_queryset('enrollments'), chunk_size=2)
+        # The header goes out before any query runs
+        with self.assertNumQueries(0):
+            self.assertEqual(next(chunks).strip(), ','.join(exports.columns('enrollments')))
+        with CaptureQueriesContext(connection) as queries:
+            sizes = [len(chunk.splitlines()) for chunk in chunks]
+        self.assertEqual(sizes, [2, 2, 1])
+        self.assertEqual(len(queries), 3)
+        self.assertTrue(all('LIMIT 2' in query['sql'] for query in queries))
+
+    def test_staff_only_and_unknown_exports(self):
+        self.assertEqual(self.get('/api/exports/enrollments.csv', user=self.enrollments[0].student).status_code, 403)
+        self.assertEqual(self.get('/api/exports/grades.csv').status_code, 404)
+        self.assertEqual(self.get('/api/exports/enrollments.xlsx').status_code, 404)
+
+
+class AvatarTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def setUp(self):
+        self.profile = UserProfile.objects.create(user=User.objects.create_user('student'))
+        self.upload('red')
+
+    def upload(self, color, size=(600, 400)):
+        out = BytesIO()
+        Image.new('RGB', size, color).save(out, 'PNG')
+        self.profile.avatar.save(f'{color}.png', ContentFile(out.getvalue()))
+
+    def render(self, size=40):
+        template = Template('{% load avatars %}{% avatar profile size %}')
+        return template.render(Context({'profile': self.profile, 'size': size}))
+
+    def test_renders_square_variants_in_every_size_and_format(self):
+        self.assertEqual(list(avatars.pending_profiles()), [self.profile])
+        self.assertTrue(avatars.process_profile(self.profile))
+        self.profile.refresh_from_db()
+        self.assertEqual(set(self.profile.avatar_variants), {
+            avatars.variant_key(size, fmt) for size in avatars.AVATAR_SIZES for fmt in avatars.formats()
+        })
+        for key, path in self.profile.avatar_variants.items():
+            size, fmt = key.split('.')
+            with default_storage.open(path, 'rb') as variant:
+                image = Image.open(variant)
+                self.assertEqual((image.size, image.format.lower()), ((int(size), int(size)), fmt))
+        self.assertFalse(avatars.pending_profiles().exists())
+
+    def original(self):
+        return f'<img src="{self.profile.avatar.url}" alt="Profile picture" width="40" height="40" />'
+
+    def test_template_tag_falls_back_to_the_upload_until_processed(self):
+        self.assertInHTML(self.original(), self.render())
+        avatars.process_profile(self.profile)
+        self.profile.refresh_from_db()
+        html = self.render()
+        variants = self.profile.avatar_variants
+        self.assertIn('<picture>', html)
+        self.assertIn(f'src="{default_storage.url(variants["40.jpeg"])}"', html)
+        self.assertIn(f'{default_storage.url(variants["96.jpeg"])} 2x', html)
+        if 'webp' in avatars.formats():
+            self.assertIn(f'<source type="image/webp" srcset="{default_storage.url(variants["40.webp"])}', html)
+        # A new upload is pending again, so the tag shows it rather than the old variants
+        self.upload('blue')
+        self.assertInHTML(self.original(), self.render())
+
+    def test_replaced_avatar_deletes_its_old_variants(self):
+        avatars.process_profile(self.profile)
+        self.profile.refresh_from_db()
+        old = set(self.profile.avatar_variants.values())
+        self.upload('blue')
+        self.assertTrue(avatars.process_profile(self.profile))
+        self.profile.refresh_from_db()
+        new = set(self.profile.avatar_variants.values())
+        self.assertFalse(old & new)
+        self.assertFalse(any(default_storage.exists(path) for path in old))
+        self.assertTrue(all(default_storage.exists(path) for path in new))
+
+    def test_upload_replaced_while_processing_is_not_recorded(self):
+        stale = UserProfile.objects.get(pk=self.profile.pk)
+        self.upload('blue')
+        self.assertFalse(avatars.process_profile(stale))
+        self.assertEqual(list(avatars.pending_profiles()), [self.profile])
+
+
+class RouteBudgetTests(TestCase):
+    """Every route against the seeded 'tiny' dataset stays within its query budget."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        seeding.seed(seeding.SCALES['tiny'], seed=1)
+
+    def test_routes_within_budget(self):
+        for result in benchmarks.run(repeat=2):
+            with self.subTest(route=result['name']):
+                self.assertTrue(result['status_ok'], f"{result['path']} returned {result['status']}")
+                self.assertLessEqual(result['queries'], result['budget'], result['path'])
+                self.assertTrue(result['within_budget'], f"{result['path']} over its warm budget")
@@ -11,9 +11,12 @@ from .views import (
     SessionViewSet,
     EnrollmentViewSet,
     BookingViewSet,
+    BookingRequestViewSet,
     ResourceViewSet,
     PaymentViewSet,
     create_checkout_session,
+    review_action_requests,
+    ExportView,
 )
 
 router = DefaultRouter()
@@ -22,14 +25,18 @@ router.register(r'tutors', TutorViewSet, basename='tutor')
 router.register(r'sessions', SessionViewSet, basename='session')
 router.register(r'enrollments', EnrollmentViewSet, basename='enrollment')
 router.register(r'bookings', BookingViewSet, basename='booking')
+router.register(r'booking-requests', BookingRequestViewSet, basename='booking-request')
 router.register(r'resources', ResourceViewSet, basename='resource')
 router.register(r'payments', PaymentViewSet, basename='payment')
 
 urlpatterns = [
-    path('', include(router.urls)),
     path('auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    # Before the router, whose payments/<pk>/ route would otherwise shadow it
     path('payments/create-checkout-session/', create_checkout_session, name='create_checkout_session'),
+    path('action-requests/review/', review_action_requests, name='review_action_requests'),
+    path('exports/<slug:name>.<slug:fmt>', ExportView.as_view(), name='export'),
+    path('', include(router.urls)),
 ]
 
 
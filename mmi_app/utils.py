@@ -1,19 +1,70 @@
-from typing import Tuple
+from typing import Optional, Tuple
+from datetime import datetime
 from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from .caching import VersionedValue
 from .models import SiteSetting
 
 
+def _load_site_setting() -> Optional[SiteSetting]:
+    try:
+        return SiteSetting.objects.filter(is_active=True).first()
+    except DatabaseError:
+        # DB may not be migrated yet
+        return None
+
+
+# Invalidated by the SiteSetting save/delete receivers in signals.py
+site_setting_cache = VersionedValue(
+    'site-setting', _load_site_setting, check_interval=getattr(settings, 'SITE_SETTINGS_CHECK_INTERVAL', 5.0)
+)
+
+
+def get_site_setting() -> Optional[SiteSetting]:
+    """The active SiteSetting row (or None), served from process memory."""
+    return site_setting_cache.get()
+
+
 def get_stripe_keys() -> Tuple[str, str]:
     api_key = getattr(settings, 'STRIPE_API_KEY', '') or ''
     webhook_secret = getattr(settings, 'STRIPE_WEBHOOK_SECRET', '') or ''
-    try:
-        s = SiteSetting.objects.filter(is_active=True).first()
-        if s:
-            api_key = s.stripe_api_key or api_key
-            webhook_secret = s.stripe_webhook_secret or webhook_secret
-    except Exception:
-        # DB may not be migrated yet
-        pass
+    s = get_site_setting()
+    if s:
+        api_key = s.stripe_api_key or api_key
+        webhook_secret = s.stripe_webhook_secret or webhook_secret
     return api_key, webhook_secret
 
 
+def encode_keyset_cursor(start_time: datetime, pk: int) -> str:
+    return f"{start_time.isoformat()}_{pk}"
+
+
+def decode_keyset_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    start, _, pk = (cursor or '').rpartition('_')
+    try:
+        start_time = parse_datetime(start)
+        pk = int(pk)
+    except ValueError:
+        return None
+    if start_time is None:
+        return None
+    return start_time, pk
+
+
+def keyset_page(queryset, cursor: str, page_size: int):
+    """
+    Return one page of `queryset` ordered by (start_time, id) after `cursor`,
+    plus the cursor for the next page (None on the last page).
+    """
+    position = decode_keyset_cursor(cursor)
+    if position:
+        start_time, pk = position
+        queryset = queryset.filter(Q(start_time__gt=start_time) | Q(start_time=start_time, id__gt=pk))
+    rows = list(queryset.order_by('start_time', 'id')[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_keyset_cursor(rows[-1].start_time, rows[-1].id)
+    return rows, next_cursor
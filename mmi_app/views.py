@@ -1,26 +1,78 @@
-from rest_framework import viewsets, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework import mixins, viewsets, permissions, status
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from rest_framework.views import APIView
+from rest_framework.authentication import SessionAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.conf import settings
+import hmac
+import math
 import stripe
-from django.shortcuts import render, get_object_or_404, redirect
+from datetime import timedelta
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
-
-from .models import Course, Enrollment, Session, Booking, Resource, Tutor, Payment, ActionRequest
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.core.paginator import Paginator
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from django.db import DatabaseError
+from django.db.models import Exists, OuterRef, Subquery
+from rest_framework.exceptions import ValidationError
+
+from .models import Course, Enrollment, Session, Booking, BookingRequest, Resource, Tutor, Payment, ActionRequest
 from .serializers import (
     CourseSerializer,
     EnrollmentSerializer,
     SessionSerializer,
     BookingSerializer,
+    BookingRequestSerializer,
     ResourceSerializer,
     TutorSerializer,
     PaymentSerializer,
+    CourseValuesReader,
+    TutorValuesReader,
+    SessionValuesReader,
+    SelectionValuesReader,
 )
 from .forms import RegisterForm, EnrollmentForm, BookingForm, ProfileForm, ProfileDetailsForm
-from .utils import get_stripe_keys
+from .utils import get_stripe_keys, keyset_page
+from .pagination import RankedPagination, SessionCursorPagination
+from .caching import cache_anonymous_page, page_cache_stats
+from .authentication import full_user
+from .conditional import ConditionalGetMixin, conditional_page
+from . import admission, approvals, counters, dbpool, downloads, exports, fieldsets, instrumentation, payments, scheduling, search, seats, webhooks
+
+
+def _datetime_param(params, name: str):
+    value = parse_datetime(params.get(name) or '')
+    if value is None:
+        raise ValidationError({name: 'Expected an ISO 8601 datetime.'})
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def _int_param(params, name: str, scale: int = 1, strict: bool = True):
+    raw = params.get(name)
+    if raw in (None, ''):
+        return None
+    try:
+        value = float(raw) * scale
+        if not math.isfinite(value):
+            raise ValueError(raw)
+        return int(round(value))
+    except (ValueError, OverflowError):
+        if strict:
+            raise ValidationError({name: 'Expected a number.'})
+        return None
 
 
 class IsAdminOrReadOnly(permissions.BasePermission):
@@ -30,91 +82,398 @@ class IsAdminOrReadOnly(permissions.BasePermission):
         return request.user and request.user.is_staff
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class SparseFieldsetMixin:
+    """
+    `?fields=` and `?expand=` on reads (mmi_app.fieldsets): the serializers
+    render the selection, list and detail querysets load only the columns
+    and joins it needs, and list fast paths switch to SelectionValuesReader.
+    """
+
+    @cached_property
+    def selection(self):
+        if self.request.method not in permissions.SAFE_METHODS:
+            return None
+        return fieldsets.parse(self.request.query_params)
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'selection': self.selection}
+
+    def pagination_keys(self):
+        # Cursor pagination reads its ordering fields from every page's last row
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return [field.lstrip('-') for field in ordering]
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.selection is None or self.action not in ('list', 'retrieve'):
+            return queryset
+        return fieldsets.restrict(queryset, self.get_serializer(), self.pagination_keys())
+
+    def get_values_reader(self):
+        if self.selection is None:
+            return super().get_values_reader()
+        return SelectionValuesReader.for_serializer(self.get_serializer(), self.pagination_keys())
+
+
+class FastListMixin:
+    """
+    Serve `list` from `.values()` rows through `values_reader` instead of
+    `serializer_class`. Set `values_reader = None` to fall back to the
+    regular serializers; detail and write endpoints always use them.
+    """
+    values_reader = None
+
+    def get_values_reader(self):
+        return self.values_reader() if self.values_reader else None
+
+    def list(self, request, *args, **kwargs):
+        reader = self.get_values_reader()
+        if reader is None:
+            return super().list(request, *args, **kwargs)
+        rows = reader.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(reader.many(page))
+        return Response(reader.many(rows))
+
+
+class CourseViewSet(ConditionalGetMixin, SparseFieldsetMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Course.objects.select_related('tutor__user').all()
     serializer_class = CourseSerializer
+    values_reader = CourseValuesReader
+    change_models = ('course', 'tutor')
     permission_classes = [IsAdminOrReadOnly]
 
+    def search_query(self) -> str:
+        if self.action != 'list':
+            return ''
+        return self.request.query_params.get('q', '').strip()
+
+    @property
+    def paginator(self):
+        # Relevance order has no stable cursor key; page ranked results by number
+        if not hasattr(self, '_paginator'):
+            self._paginator = RankedPagination() if self.search_query() else self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+        params = self.request.query_params
+        return search.search_courses(
+            queryset,
+            self.search_query(),
+            tutor_id=_int_param(params, 'tutor'),
+            min_price_cents=_int_param(params, 'min_price_cents'),
+            max_price_cents=_int_param(params, 'max_price_cents'),
+        )
+
 
-class TutorViewSet(viewsets.ReadOnlyModelViewSet):
+class TutorViewSet(ConditionalGetMixin, SparseFieldsetMixin, FastListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tutor.objects.select_related('user').all()
     serializer_class = TutorSerializer
+    values_reader = TutorValuesReader
+    change_models = ('tutor',)
     permission_classes = [permissions.AllowAny]
 
-
-class SessionViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Session.objects.select_related('course').all()
+    @action(detail=True, url_path='free-slots')
+    def free_slots(self, request, pk=None):
+        tutor = self.get_object()
+        window = (_datetime_param(request.query_params, 'start'), _datetime_param(request.query_params, 'end'))
+        try:
+            minutes = int(request.query_params.get('minutes', 60))
+        except ValueError:
+            raise ValidationError({'minutes': 'Expected a number of minutes.'})
+        if window[1] <= window[0] or minutes <= 0:
+            raise ValidationError({'detail': 'Expected start < end and a positive duration.'})
+        slots = scheduling.find_free_slots(tutor, window, timedelta(minutes=minutes))
+        return Response([{'start_time': start, 'end_time': end} for start, end in slots])
+
+
+class SessionViewSet(ConditionalGetMixin, SparseFieldsetMixin, FastListMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Session.objects.select_related('course__tutor__user').all()
     serializer_class = SessionSerializer
+    values_reader = SessionValuesReader
+    change_models = ('session', 'course', 'tutor')
     permission_classes = [permissions.AllowAny]
+    pagination_class = SessionCursorPagination
 
-
-class EnrollmentViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        # Filters line up with the (course, start_time) index
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        if params.get('course'):
+            try:
+                queryset = queryset.filter(course_id=int(params['course']))
+            except ValueError:
+                raise ValidationError({'course': 'Expected a course id.'})
+        for param, lookup in (('starts_after', 'start_time__gte'), ('starts_before', 'start_time__lt')):
+            if params.get(param):
+                queryset = queryset.filter(**{lookup: _datetime_param(params, param)})
+        return queryset
+
+
+class EnrollmentViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = EnrollmentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Enrollment.objects.filter(student=self.request.user).select_related('course')
+        return Enrollment.objects.filter(student_id=self.request.user.pk).select_related('course')
 
     def perform_create(self, serializer):
-        serializer.save(student=self.request.user)
+        serializer.save(student=full_user(self.request.user))
 
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(
+    SparseFieldsetMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin,
+    mixins.ListModelMixin, viewsets.GenericViewSet,
+):
+    # No update: moving a booking to another session would skip the seat
+    # accounting in create and destroy. Cancel and book again instead.
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Booking.objects.filter(student=self.request.user).select_related('session__course')
+        return Booking.objects.filter(student_id=self.request.user.pk).select_related('session__course')
+
+    def create(self, request, *args, **kwargs):
+        if not admission.QUEUE_ENABLED:
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        queued = admission.enqueue(request.user.pk, serializer.validated_data['session'].id)
+        if queued is None:
+            raise ValidationError({'session': 'Session not found.'})
+        # Accepted, not booked yet: poll the request for the outcome
+        location = reverse('booking-request-detail', args=[queued.id], request=request)
+        return Response(BookingRequestSerializer(queued).data, status=status.HTTP_202_ACCEPTED, headers={'Location': location})
 
     def perform_create(self, serializer):
-        serializer.save(student=self.request.user)
+        session = serializer.validated_data['session']
+        outcome = seats.reserve_seat(full_user(self.request.user), session.id)
+        if outcome == seats.SEAT_FULL:
+            raise ValidationError({'session': 'Session is full.'})
+        if outcome == seats.SEAT_ALREADY_BOOKED:
+            raise ValidationError({'session': 'Session already booked.'})
+        serializer.instance = Booking.objects.get(student_id=self.request.user.pk, session=session)
 
+    def perform_destroy(self, instance):
+        seats.cancel_bookings([instance.id])
+
+
+class BookingRequestViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = BookingRequestSerializer
+    permission_classes = [permissions.IsAuthenticated]
 
-class ResourceViewSet(viewsets.ReadOnlyModelViewSet):
+    def get_queryset(self):
+        return BookingRequest.objects.filter(student_id=self.request.user.pk).order_by('-id')
+
+
+class ResourceViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Resource.objects.select_related('course').all()
     serializer_class = ResourceSerializer
+    change_models = ('resource',)
     permission_classes = [permissions.IsAuthenticated]
 
+    def perform_content_negotiation(self, request, force=False):
+        # Downloads are not rendered by DRF; accept e.g. `Accept: video/mp4`
+        return super().perform_content_negotiation(request, force=force or self.action == 'download')
 
-class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        return downloads.serve_file(request, self.get_object().file)
+
+
+class PaymentViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Payment.objects.filter(enrollment__student=self.request.user)
+        return Payment.objects.filter(enrollment__student_id=self.request.user.pk)
 
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def create_checkout_session(request):
-    stripe.api_key = settings.STRIPE_API_KEY
     enrollment_id = request.data.get('enrollment_id')
-    amount_cents = int(request.data.get('amount_cents', 0))
-    currency = request.data.get('currency', 'usd')
-    if not enrollment_id or amount_cents <= 0:
+    if not enrollment_id:
         return Response({'detail': 'Invalid payload'}, status=400)
-    # Placeholder: in real flow, create Stripe Checkout Session and persist Payment
-    return Response({'status': 'ok', 'message': 'Stripe integration pending configuration'})
+    api_key, _ = get_stripe_keys()
+    if not api_key:
+        return Response({'status': 'ok', 'message': 'Stripe integration pending configuration'})
+    enrollment = get_object_or_404(Enrollment.objects.select_related('course'), id=enrollment_id, student_id=request.user.pk)
+    params = payments.checkout_session_params(
+        enrollment,
+        success_url=request.build_absolute_uri('/checkout/success/'),
+        cancel_url=request.build_absolute_uri(f'/checkout/cancel/?enrollment_id={enrollment.id}'),
+    )
+    attempt = payments.checkout_attempt(request.data.get('checkout_key'))
+    try:
+        session = payments.create_checkout_session(api_key, params, payments.checkout_idempotency_key(enrollment, attempt))
+    except stripe.StripeError as exc:
+        return Response({'detail': f'Payment provider error: {exc.user_message or exc.__class__.__name__}'}, status=502)
+    return Response({'status': 'ok', 'id': session.id, 'url': session.url})
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+def review_action_requests(request):
+    decision = request.data.get('decision')
+    ids = request.data.get('ids')
+    if decision not in ('approve', 'reject') or not isinstance(ids, list):
+        return Response({'detail': 'Expected {"decision": "approve"|"reject", "ids": [...]}.'}, status=400)
+    try:
+        ids = [int(pk) for pk in ids]
+    except (TypeError, ValueError):
+        return Response({'detail': 'ids must be integers.'}, status=400)
+    review = approvals.approve_requests if decision == 'approve' else approvals.reject_requests
+    return Response(review(ids, full_user(request.user)).as_dict())
+
+
+class ExportView(APIView):
+    """Stream /api/exports/<name>.<csv|ndjson>, filtered by ?since=&until= (created_at) and ?course=<slug>."""
+    # Session auth too, so staff can download from the browser while signed in
+    authentication_classes = [JWTAuthentication, SessionAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def perform_content_negotiation(self, request, force=False):
+        # The body is never rendered by DRF, so any Accept header is fine
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, name: str, fmt: str):
+        if name not in exports.EXPORTS or fmt not in exports.FORMATS:
+            raise Http404
+        params = request.query_params
+        queryset = exports.export_queryset(
+            name,
+            since=_datetime_param(params, 'since') if params.get('since') else None,
+            until=_datetime_param(params, 'until') if params.get('until') else None,
+            course=params.get('course') or None,
+        )
+        response = StreamingHttpResponse(exports.stream(name, fmt, queryset), content_type=exports.FORMATS[fmt])
+        filename = f"{name}-{timezone.now():%Y%m%d%H%M}.{fmt}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        # Let nginx pass chunks through instead of buffering the whole export
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
 
-# Page views (server-rendered templates)
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    # Verify and enqueue only; `manage.py process_webhooks` applies the events
+    _, webhook_secret = get_stripe_keys()
+    if not webhook_secret:
+        return HttpResponse('Webhook secret not configured.', status=503)
+    payload = request.body.decode('utf-8')
+    try:
+        event = stripe.Webhook.construct_event(payload, request.headers.get('Stripe-Signature', ''), webhook_secret)
+    except (ValueError, stripe.SignatureVerificationError):
+        return HttpResponse('Invalid payload or signature.', status=400)
+    webhooks.enqueue(event, payload)
+    return HttpResponse(status=200)
+
+
+DB_POOL_METRICS = [
+    ('size', 'gauge', 'Open pooled database connections.'),
+    ('idle', 'gauge', 'Pooled connections waiting to be checked out.'),
+    ('in_use', 'gauge', 'Pooled connections checked out by requests.'),
+    ('waiting', 'gauge', 'Requests waiting for a free pooled connection.'),
+    ('max_size', 'gauge', 'Most connections the pool may open.'),
+    ('created_total', 'counter', 'Database connections the pool opened.'),
+    ('closed_total', 'counter', 'Database connections the pool closed.'),
+    ('timeouts_total', 'counter', 'Checkouts that gave up waiting for a connection.'),
+    ('failed_checks_total', 'counter', 'Idle connections that failed the health check.'),
+    ('wait_seconds_total', 'counter', 'Time requests spent waiting for a connection.'),
+]
+
+
+def metrics_endpoint(request):
+    """Prometheus metrics of this worker; for staff, or scrapers sending `Authorization: Bearer <METRICS_TOKEN>`."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    bearer = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not (request.user.is_staff or (token and hmac.compare_digest(bearer, token))):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    extra = {
+        f'mmi_page_cache_{name}_total': ('counter', f'Anonymous page cache {name}.', value)
+        for name, value in page_cache_stats.items()
+    }
+    try:
+        queue = webhooks.queue_stats()
+    except DatabaseError:
+        queue = None
+    if queue:
+        extra['mmi_webhook_queue_pending'] = ('gauge', 'Stripe webhook events waiting to be applied.', queue['pending'])
+        extra['mmi_webhook_queue_failed'] = ('gauge', 'Stripe webhook events that gave up.', queue['failed'])
+        extra['mmi_webhook_queue_lag_seconds'] = ('gauge', 'Age of the oldest pending webhook event.', queue['lag_seconds'])
+    if admission.QUEUE_ENABLED:
+        try:
+            booking_queue = admission.queue_stats()
+        except DatabaseError:
+            booking_queue = None
+        if booking_queue:
+            extra['mmi_booking_queue_pending'] = ('gauge', 'Booking requests waiting for admission.', booking_queue['pending'])
+            extra['mmi_booking_queue_lag_seconds'] = ('gauge', 'Age of the oldest pending booking request.', booking_queue['lag_seconds'])
+    pools = dbpool.pool_stats()
+    if pools:
+        for stat, kind, help_text in DB_POOL_METRICS:
+            extra[f'mmi_db_pool_{stat}'] = (kind, help_text, {alias: stats[stat] for alias, stats in pools})
+    return HttpResponse(instrumentation.render_prometheus(extra), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Page views (server-rendered templates). The page cache goes first, so
+# its hits (including their 304s) need no queries.
+@cache_anonymous_page('home', lambda: ['courses'])
+@conditional_page('course', 'tutor')
 def home_page(request):
     courses = Course.objects.select_related('tutor__user').filter(is_active=True)[:6]
     return render(request, 'pages/index.html', { 'courses': courses })
 
 
+COURSES_PAGE_SIZE = 24
+
+
+@cache_anonymous_page('courses', lambda: ['courses'])
+@conditional_page('course', 'tutor')
 def courses_page(request):
-    courses = Course.objects.select_related('tutor__user').filter(is_active=True)
-    return render(request, 'pages/courses.html', { 'courses': courses })
+    params = request.GET
+    query = params.get('q', '').strip()
+    courses = search.search_courses(
+        Course.objects.select_related('tutor__user').filter(is_active=True),
+        query,
+        tutor_id=_int_param(params, 'tutor', strict=False),
+        # The page takes prices in dollars
+        min_price_cents=_int_param(params, 'min_price', scale=100, strict=False),
+        max_price_cents=_int_param(params, 'max_price', scale=100, strict=False),
+    )
+    if not query:
+        courses = courses.order_by('id')
+    page = Paginator(courses, COURSES_PAGE_SIZE).get_page(params.get('page'))
+    filters = params.copy()
+    filters.pop('page', None)
+    context = {
+        'courses': page,
+        'page': page,
+        'filters': filters,
+        'tutors': Tutor.objects.select_related('user').order_by('id'),
+    }
+    return render(request, 'pages/courses.html', context)
 
 
+@cache_anonymous_page('course-detail', lambda slug: [f'course:{slug}'])
+@conditional_page('course', 'tutor', 'session', 'resource')
 def course_detail_page(request, slug: str):
     course = get_object_or_404(Course.objects.select_related('tutor__user'), slug=slug, is_active=True)
-    sessions = course.sessions.order_by('start_time')
+    sessions = course.sessions.annotate(seats_left=seats.seats_left_expression()).order_by('start_time')
     resources = course.resources.all()
     return render(request, 'pages/course_detail.html', { 'course': course, 'sessions': sessions, 'resources': resources })
 
 
+@cache_anonymous_page('tutors', lambda: ['tutors'])
+@conditional_page('tutor')
 def tutors_page(request):
     tutors = Tutor.objects.select_related('user').all()
     return render(request, 'pages/tutors.html', { 'tutors': tutors })
@@ -123,52 +482,78 @@ def tutors_page(request):
 def dashboard_page(request):
     if not request.user.is_authenticated:
         return render(request, 'pages/dashboard_anon.html', status=401)
-    enrollments = Enrollment.objects.filter(student=request.user).select_related('course__tutor__user')
-    bookings = list(Booking.objects.filter(student=request.user).select_related('session__course'))
-    paid_enrollment_ids = set(Payment.objects.filter(enrollment__student=request.user, status='paid').values_list('enrollment_id', flat=True))
-    # Build map: booking_id -> latest status
-    booking_status_map = {}
-    for ar in ActionRequest.objects.filter(requested_by=request.user, booking__in=bookings).order_by('created_at'):
-        booking_status_map[ar.booking_id] = ar.status
-    # attach status to each booking for easy template rendering
-    for b in bookings:
-        setattr(b, 'request_status', booking_status_map.get(b.id))
+    paid = Payment.objects.filter(enrollment=OuterRef('pk'), status='paid')
+    enrollments = (
+        Enrollment.objects.filter(student=request.user)
+        .select_related('course__tutor__user')
+        .annotate(is_paid=Exists(paid))
+    )
+    # Latest request status per booking, resolved in the database
+    latest_request = (
+        ActionRequest.objects.filter(booking=OuterRef('pk'), requested_by=request.user)
+        .order_by('-created_at', '-id')
+        .values('status')[:1]
+    )
+    bookings = (
+        Booking.objects.filter(student=request.user)
+        .select_related('session__course')
+        .annotate(request_status=Subquery(latest_request))
+    )
     requests_all = ActionRequest.objects.filter(requested_by=request.user).select_related('booking__session__course').order_by('-created_at')[:25]
-    return render(request, 'pages/dashboard.html', { 'enrollments': enrollments, 'bookings': bookings, 'paid_enrollment_ids': paid_enrollment_ids, 'requests_all': requests_all })
+    context = { 'enrollments': enrollments, 'bookings': bookings, 'requests_all': requests_all }
+    if admission.QUEUE_ENABLED:
+        context['booking_requests'] = (
+            BookingRequest.objects.filter(student=request.user).select_related('session__course').order_by('-id')[:10]
+        )
+    return render(request, 'pages/dashboard.html', context)
+
+
+BOOKINGS_PAGE_SIZE = 50
 
 
 def bookings_page(request):
-    sessions = Session.objects.select_related('course').order_by('start_time')[:50]
-    return render(request, 'pages/bookings.html', { 'sessions': sessions })
+    upcoming = (
+        Session.objects.select_related('course')
+        .filter(start_time__gte=timezone.now())
+        .annotate(seats_left=seats.seats_left_expression())
+    )
+    sessions, next_cursor = keyset_page(upcoming, request.GET.get('after', ''), BOOKINGS_PAGE_SIZE)
+    return render(request, 'pages/bookings.html', { 'sessions': sessions, 'next_cursor': next_cursor })
 
 
-def checkout_page(request):
+async def checkout_page(request):
+    # Async so a slow Stripe round-trip does not hold a worker under ASGI
     enrollment_id = request.GET.get('enrollment_id') or request.POST.get('enrollment_id')
-    api_key, _ = get_stripe_keys()
+    # Resubmitting the same form (or retrying after an error) reuses the Stripe session
+    attempt = payments.checkout_attempt(request.POST.get('checkout_key') or request.GET.get('key'))
+    api_key, _ = await sync_to_async(get_stripe_keys)()
     if request.method == 'POST' and api_key and enrollment_id:
-        stripe.api_key = api_key
-        enrollment = get_object_or_404(Enrollment, id=enrollment_id)
+        enrollment = await aget_object_or_404(Enrollment.objects.select_related('course'), id=enrollment_id)
         price_cents = max(0, int(enrollment.course.price_cents or 0))
         if price_cents <= 0:
             messages.info(request, 'This course is free. No payment required.')
             return redirect('dashboard')
-        session = stripe.checkout.Session.create(
-            mode='payment',
-            payment_method_types=['card'],
-            line_items=[{
-                'price_data': {
-                    'currency': 'usd',
-                    'product_data': { 'name': enrollment.course.title },
-                    'unit_amount': price_cents,
-                },
-                'quantity': 1,
-            }],
-            metadata={ 'enrollment_id': str(enrollment.id) },
+        params = payments.checkout_session_params(
+            enrollment,
             success_url=request.build_absolute_uri('/checkout/success/'),
             cancel_url=request.build_absolute_uri(f'/checkout/cancel/?enrollment_id={enrollment.id}'),
         )
+        idempotency_key = payments.checkout_idempotency_key(enrollment, attempt)
+        # Under WSGI every request runs on a new event loop, which must not
+        # share the pooled httpx client, so the blocking client runs in a thread
+        create = (
+            payments.create_checkout_session_async if isinstance(request, ASGIRequest)
+            else sync_to_async(payments.create_checkout_session, thread_sensitive=False)
+        )
+        try:
+            session = await create(api_key, params, idempotency_key)
+        except stripe.StripeError:
+            messages.error(request, 'The payment provider is not responding. Please try again shortly.')
+            return redirect(f'/checkout/?enrollment_id={enrollment.id}&key={attempt}')
         return redirect(session.url)
-    return render(request, 'pages/checkout.html', { 'enrollment_id': enrollment_id, 'stripe_enabled': bool(api_key) })
+    return await sync_to_async(render)(request, 'pages/checkout.html', {
+        'enrollment_id': enrollment_id, 'checkout_key': attempt, 'stripe_enabled': bool(api_key),
+    })
 
 
 def privacy_page(request):
@@ -212,19 +597,27 @@ def enroll_action(request, slug: str):
 @login_required
 @require_POST
 def book_session_action(request, session_id: int):
-    session = get_object_or_404(Session, id=session_id)
-    current_bookings = session.bookings.count()
-    if current_bookings >= session.capacity:
+    if admission.QUEUE_ENABLED:
+        if admission.enqueue(request.user.pk, session_id) is None:
+            raise Http404('No Session matches the given query.')
+        messages.info(request, 'You are in the queue for this session. Your dashboard will show the result shortly.')
+        return redirect('dashboard')
+    outcome = seats.reserve_seat(request.user, session_id)
+    if outcome == seats.SEAT_MISSING:
+        raise Http404('No Session matches the given query.')
+    if outcome == seats.SEAT_FULL:
         messages.error(request, 'Session is full.')
         return redirect('bookings')
-    Booking.objects.get_or_create(student=request.user, session=session)
-    messages.success(request, 'Session booked.')
+    if outcome == seats.SEAT_ALREADY_BOOKED:
+        messages.info(request, 'You have already booked this session.')
+    else:
+        messages.success(request, 'Session booked.')
     return redirect('dashboard')
 
 
 @login_required
 def pay_enrollment_action(request, enrollment_id: int):
-    enrollment = get_object_or_404(Enrollment, id=enrollment_id, student=request.user)
+    enrollment = get_object_or_404(Enrollment, id=enrollment_id, student_id=request.user.pk)
     amount_cents = enrollment.course.price_cents
     if not amount_cents or amount_cents <= 0:
         messages.info(request, 'This course is free. No payment required.')
@@ -258,6 +651,12 @@ def cancel_booking_action(request, booking_id: int):
     return redirect('dashboard')
 
 
+@login_required
+def resource_download(request, resource_id: int):
+    resource = get_object_or_404(Resource, id=resource_id)
+    return downloads.serve_file(request, resource.file)
+
+
 @login_required
 def profile_page(request):
     # ensure profile exists
@@ -285,15 +684,7 @@ def admin_dashboard_page(request):
     if not request.user.is_staff:
         messages.error(request, 'Admin access required.')
         return redirect('dashboard')
-    metrics = {
-        'users': request.user.__class__.objects.count(),
-        'tutors': Tutor.objects.count(),
-        'courses': Course.objects.count(),
-        'sessions': Session.objects.count(),
-        'enrollments': Enrollment.objects.count(),
-        'bookings': Booking.objects.count(),
-        'payments': Payment.objects.count(),
-    }
+    metrics = counters.read_metrics()
     admin_links = [
         ('Users', '/admin/auth/user/'),
         ('Tutors', '/admin/mmi_app/tutor/'),
@@ -318,6 +709,7 @@ def admin_dashboard_page(request):
         'recent_enrollments': recent_enrollments,
         'recent_bookings': recent_bookings,
         'recent_payments': recent_payments,
+        'page_cache_stats': dict(page_cache_stats),
     }
     return render(request, 'pages/admin_dashboard.html', context)
 
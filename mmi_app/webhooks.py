@@ -0,0 +1,122 @@
+"""
+Stripe webhook ingestion.
+
+The receiver only verifies the signature and stores the raw event; the
+`process_webhooks` command drains the queue. Each batch is claimed and
+applied in one transaction, and the event's status changes in that same
+transaction, so a Payment change is never applied twice. Redeliveries of
+an event id are dropped at intake by the unique constraint. An event whose
+handler raises is retried after an exponentially growing delay, so a
+short outage does not use up its MAX_ATTEMPTS within one drain.
+"""
+
+import json
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import Payment, WebhookEvent
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = getattr(settings, 'WEBHOOK_RETRY_BASE_SECONDS', 30.0)
+RETRY_MAX_SECONDS = getattr(settings, 'WEBHOOK_RETRY_MAX_SECONDS', 3600.0)
+
+
+def enqueue(event, payload: str) -> bool:
+    """Store a verified event's raw body; False if this event id was already queued."""
+    try:
+        with transaction.atomic():
+            WebhookEvent.objects.create(event_id=event['id'], event_type=event['type'], payload=payload)
+    except IntegrityError:
+        return False
+    return True
+
+
+def _checkout_completed(obj) -> bool:
+    enrollment_id = (obj.get('metadata') or {}).get('enrollment_id')
+    if not enrollment_id:
+        return False
+    Payment.objects.update_or_create(
+        stripe_payment_intent=obj.get('payment_intent') or obj['id'],
+        defaults={
+            'enrollment_id': int(enrollment_id),
+            'amount_cents': obj.get('amount_total') or 0,
+            'currency': obj.get('currency') or 'usd',
+            'status': 'paid' if obj.get('payment_status') in ('paid', 'no_payment_required') else 'created',
+        },
+    )
+    return True
+
+
+def _set_status(status: str, key: str = 'id') -> Callable[[dict], bool]:
+    def apply(obj) -> bool:
+        return bool(Payment.objects.filter(stripe_payment_intent=obj.get(key)).update(status=status))
+    return apply
+
+
+# event type -> handler(data.object); handlers return False when nothing matched
+HANDLERS: Dict[str, Callable[[dict], bool]] = {
+    'checkout.session.completed': _checkout_completed,
+    'checkout.session.async_payment_succeeded': _checkout_completed,
+    'payment_intent.succeeded': _set_status('paid'),
+    'payment_intent.payment_failed': _set_status('failed'),
+    'payment_intent.canceled': _set_status('canceled'),
+    'charge.refunded': _set_status('refunded', key='payment_intent'),
+}
+
+
+def _apply(event: WebhookEvent) -> str:
+    handler = HANDLERS.get(event.event_type)
+    if handler is None:
+        return WebhookEvent.STATUS_IGNORED
+    obj = json.loads(event.payload)['data']['object']
+    return WebhookEvent.STATUS_PROCESSED if handler(obj) else WebhookEvent.STATUS_IGNORED
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Wait before the attempt after `attempts` failed ones."""
+    return timedelta(seconds=min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1)))
+
+
+def process_batch(batch_size: int) -> Dict[str, int]:
+    """Claim and apply up to `batch_size` pending events that are due; returns status counts."""
+    outcome: Dict[str, int] = {}
+    now = timezone.now()
+    with transaction.atomic():
+        # skip_locked lets concurrent workers claim disjoint batches
+        events = list(
+            WebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=WebhookEvent.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by('id')[:batch_size]
+        )
+        for event in events:
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    event.status = _apply(event)
+                event.last_error = ''
+                event.processed_at = now
+            except Exception as exc:
+                event.last_error = f'{exc.__class__.__name__}: {exc}'
+                if event.attempts >= MAX_ATTEMPTS:
+                    event.status = WebhookEvent.STATUS_FAILED
+                else:
+                    event.next_attempt_at = now + retry_delay(event.attempts)
+            key = 'retrying' if event.status == WebhookEvent.STATUS_PENDING else event.status
+            outcome[key] = outcome.get(key, 0) + 1
+        WebhookEvent.objects.bulk_update(events, ['status', 'attempts', 'last_error', 'processed_at', 'next_attempt_at'])
+    return outcome
+
+
+def queue_stats() -> Dict[str, Optional[float]]:
+    pending = WebhookEvent.objects.filter(status=WebhookEvent.STATUS_PENDING).aggregate(n=Count('id'), oldest=Min('received_at'))
+    lag = (timezone.now() - pending['oldest']).total_seconds() if pending['oldest'] else 0.0
+    return {
+        'pending': pending['n'],
+        'failed': WebhookEvent.objects.filter(status=WebhookEvent.STATUS_FAILED).count(),
+        'lag_seconds': lag,
+    }